@@ -0,0 +1,70 @@
+import argparse
+import json
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from CL.replay.tree import SegmentTree, _kernels
+
+
+def _time(fn: Callable[[], None], repeats: int) -> float:
+    """Returns the mean duration of a call in microseconds."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def benchmark(backend: str, size: int, batch_size: int, repeats: int, seed: int) -> Dict[str, float]:
+    rng = np.random.default_rng(seed)
+    tree = SegmentTree(size, backend=backend)
+    tree[np.arange(size)] = rng.random(size)
+
+    def update():
+        tree[rng.integers(0, size, batch_size)] = rng.random(batch_size)
+
+    def sample():
+        total = tree.reduce()
+        tree.get_prefix_sum_idx((np.arange(batch_size) + rng.random(batch_size)) * total / batch_size)
+
+    def reduce():
+        tree.reduce(0, size // 2)
+
+    return {
+        'update_us': _time(update, repeats),
+        'sample_us': _time(sample, repeats),
+        'reduce_us': _time(reduce, repeats),
+    }
+
+
+def main(args: argparse.Namespace):
+    backends = [backend for backend in args.backends if backend in _kernels]
+    missing = set(args.backends) - set(backends)
+    if missing:
+        print(f"Skipping unavailable backends: {', '.join(sorted(missing))}")
+    results: List[Dict] = []
+    print(f"{'backend':>8} {'size':>8} {'batch':>6} {'update (us)':>12} {'sample (us)':>12} {'reduce (us)':>12}")
+    for size in args.sizes:
+        for batch_size in args.batch_sizes:
+            for backend in backends:
+                timings = benchmark(backend, size, batch_size, args.repeats, args.seed)
+                results.append({'backend': backend, 'size': size, 'batch_size': batch_size, **timings})
+                print(f"{backend:>8} {size:>8} {batch_size:>6} {timings['update_us']:>12.1f} "
+                      f"{timings['sample_us']:>12.1f} {timings['reduce_us']:>12.1f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the segment tree kernels used by the prioritized replay")
+    parser.add_argument('--backends', type=str, nargs='+', default=['numpy', 'numba'],
+                        help="Kernel implementations to compare")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 500_000, 1_000_000],
+                        help="Replay buffer sizes")
+    parser.add_argument('--batch_sizes', type=int, nargs='+', default=[128, 256, 512, 1024], help="Batch sizes")
+    parser.add_argument('--repeats', type=int, default=1000, help="Number of timed calls per operation")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the random priorities and queries")
+    parser.add_argument('--output', type=str, default=None, help="Optional path of a JSON file to store the results")
+    main(parser.parse_args())
@@ -0,0 +1,340 @@
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import gymnasium
+import numpy as np
+
+from CL.config import get_arg_parser, update_wrapper_config
+from CL.methods.agem import AGEM_SAC
+from CL.methods.clonex import ClonExSAC
+from CL.methods.ewc import EWC_SAC
+from CL.methods.owl import OWL_SAC
+from CL.methods.packnet import PackNet_SAC
+from CL.methods.vcl import VCL_SAC, VclMlpActor
+from CL.rl.models import MlpActor
+from CL.rl.sac import SAC
+from CL.utils.logging import EpochLogger
+from CL.utils.running import get_activation_from_str
+from COOM.env.base import BaseEnv
+from COOM.env.builder import build_multi_discrete_actions
+from COOM.env.continual import ContinualLearningEnv
+from COOM.utils.config import Sequence, sequence_scenarios, sequence_tasks, default_wrapper_config, scenario_config
+
+# The class, the actor and the method arguments of every method, with the coefficients of the CL/README.md commands.
+# The arguments without a value are taken from the command line.
+METHODS = {
+    'sac': (SAC, MlpActor, {}),
+    'ewc': (EWC_SAC, MlpActor, {'cl_reg_coef': 250.0, 'regularize_critic': None}),
+    'packnet': (PackNet_SAC, MlpActor, {'regularize_critic': None, 'packnet_retrain_steps': None}),
+    'agem': (AGEM_SAC, MlpActor, {'episodic_mem_per_task': None, 'episodic_batch_size': 128}),
+    'clonex': (ClonExSAC, MlpActor, {'episodic_mem_per_task': None, 'episodic_batch_size': 128,
+                                     'regularize_critic': None, 'cl_reg_coef': 100.0,
+                                     'episodic_memory_from_buffer': None}),
+    'vcl': (VCL_SAC, VclMlpActor, {'cl_reg_coef': 1.0, 'regularize_critic': None, 'vcl_first_task_kl': False}),
+    'owl': (OWL_SAC, MlpActor, {'cl_reg_coef': 250.0, 'regularize_critic': None}),
+}
+
+# The metrics compared against a baseline, and whether a higher value is better
+METRICS = {'env_steps_per_sec': True, 'updates_per_sec': True, 'task_switch_s': False, 'peak_rss_mb': False}
+
+# The fields identifying a benchmark configuration, used to match the results of different reports
+CONFIG_KEYS = ['method', 'env', 'num_tasks', 'steps_per_env']
+
+
+class _StubGame:
+
+    def __init__(self, episode_timeout: int):
+        self.episode_timeout = episode_timeout
+
+    def get_episode_timeout(self) -> int:
+        return self.episode_timeout
+
+
+class StubEnv(BaseEnv):
+    """
+    An environment with the interface of a wrapped DoomEnv, which produces random observations at almost no cost, so
+    that the benchmark of a method measures the agent rather than the game.
+
+    Args:
+        task_idx (int): Index of the task in the sequence.
+        num_tasks (int): Number of tasks in the sequence.
+        obs_shape (Tuple[int, ...]): Shape of the observations, by default that of the stacked and resized frames.
+        num_actions (int): Number of discrete actions.
+        episode_length (int): Number of steps after which an episode ends.
+        seed (int): Seed of the observations and rewards.
+    """
+
+    def __init__(self, task_idx: int, num_tasks: int, obs_shape: Tuple[int, ...] = (4, 84, 84, 3),
+                 num_actions: int = 12, episode_length: int = 250, seed: int = 0):
+        self.task_idx = task_idx
+        self._num_tasks = num_tasks
+        self._observation_space = gymnasium.spaces.Box(-np.inf, np.inf, obs_shape, dtype=np.float32)
+        self._action_space = gymnasium.spaces.Discrete(num_actions)
+        self.game = _StubGame(episode_length)
+        self.episode_timeout = episode_length
+        self.rng = np.random.default_rng(seed + task_idx)
+        # A small bank of observations is cycled through instead of drawing new ones at every step
+        self.observations = self.rng.standard_normal((16, *obs_shape), dtype=np.float32)
+        self.episode_step = 0
+        self.episode_return = 0.0
+
+    def _observation(self) -> np.ndarray:
+        return self.observations[self.rng.integers(len(self.observations))]
+
+    def step(self, action: int) -> Tuple[np.ndarray, float, bool, bool, Dict[str, Any]]:
+        reward = float(self.rng.standard_normal())
+        self.episode_step += 1
+        self.episode_return += reward
+        return self._observation(), reward, self.episode_step >= self.episode_timeout, False, {}
+
+    def reset(self, *, seed: Optional[int] = None, options: Optional[dict] = None) -> Tuple[np.ndarray, Dict]:
+        self.episode_step = 0
+        return self._observation(), {}
+
+    def render(self, mode="rgb_array"):
+        pass
+
+    @property
+    def task(self) -> str:
+        return self.name
+
+    @property
+    def name(self) -> str:
+        return f'stub-{self.task_idx}'
+
+    @property
+    def task_id(self) -> int:
+        return self.task_idx
+
+    @property
+    def num_tasks(self) -> int:
+        return self._num_tasks
+
+    @property
+    def action_space(self) -> gymnasium.spaces.Discrete:
+        return self._action_space
+
+    @property
+    def observation_space(self) -> gymnasium.Space:
+        return self._observation_space
+
+    def get_statistics(self, mode: str = '') -> Dict[str, float]:
+        return {f'{mode}/stub_return': self.episode_return}
+
+    def clear_episode_statistics(self) -> None:
+        self.episode_return = 0.0
+
+    def get_active_env(self):
+        return self
+
+
+def _make_env(args: argparse.Namespace) -> ContinualLearningEnv:
+    if args.env == 'stub':
+        env_fns = [partial(StubEnv, task_idx, args.num_tasks, episode_length=args.episode_length, seed=args.seed)
+                   for task_idx in range(args.num_tasks)]
+        return ContinualLearningEnv(None, args.steps_per_env, env_fns=env_fns)
+    sequence = Sequence[args.sequence.upper()]
+    scenarios = sequence_scenarios[sequence]
+    doom_kwargs = dict(num_tasks=len(scenarios) * len(sequence_tasks[sequence]), frame_skip=args.frame_skip,
+                       record_every=args.record_every, seed=args.seed, render=False, render_sleep=args.render_sleep,
+                       resolution=args.resolution, variable_queue_length=args.variable_queue_length,
+                       native_capture=args.native_capture, grayscale=args.grayscale,
+                       action_space_fn=build_multi_discrete_actions)
+    scenario_kwargs = [{key: vars(args)[key] for key in scenario_config[scenario]['args']} for scenario in scenarios]
+    wrapper_config = update_wrapper_config(dict(default_wrapper_config), args)
+    return ContinualLearningEnv(sequence, args.steps_per_env, 0, False, scenario_kwargs, doom_kwargs, wrapper_config)
+
+
+def _timed(fn: Callable, durations: List[float]) -> Callable:
+    def timed_fn(*args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        durations.append(time.perf_counter() - start)
+        return result
+
+    return timed_fn
+
+
+def _peak_rss_mb() -> float:
+    # The maximum resident set size is reported in kilobytes on Linux and in bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss / 1024 ** 2 if sys.platform == 'darwin' else peak_rss / 1024
+
+
+def benchmark(method: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Trains a method for a fixed budget and measures its throughput.
+
+    The evaluation is disabled, so that only the collection of experience, the updates and the task switches are
+    measured. The cost of a task switch covers the end of the finished task and the start of the next one, e.g. the
+    Fisher information of EWC, the pruning and retraining of PackNet or the memory gathering of ClonEx. The first update
+    phase of every task also traces the update graph anew.
+    """
+    env = _make_env(args)
+    sac_class, actor_cl, method_kwargs = METHODS[method]
+    method_kwargs = {key: vars(args)[key] if value is None else value for key, value in method_kwargs.items()}
+    with tempfile.TemporaryDirectory() as experiment_dir:
+        logger = EpochLogger([], config=vars(args), group_id='benchmark', output_dir=f'{experiment_dir}/logs')
+        policy_kwargs = dict(
+            hidden_sizes=args.hidden_sizes,
+            activation=get_activation_from_str(args.activation),
+            use_layer_norm=args.use_layer_norm,
+            use_lstm=args.use_lstm,
+            num_heads=env.num_tasks if args.multihead_archs else 1,
+            hide_task_id=args.hide_task_id,
+        )
+        sac = sac_class(
+            **method_kwargs,
+            env=env,
+            test_envs=[],
+            test=False,
+            logger=logger,
+            scenarios=[],
+            cl_method=method,
+            seed=args.seed,
+            steps_per_env=args.steps_per_env,
+            start_steps=args.start_steps,
+            log_every=args.steps_per_env,
+            update_after=args.update_after,
+            update_every=args.update_every,
+            n_updates=args.n_updates,
+            replay_size=args.steps_per_env,
+            batch_size=args.batch_size,
+            actor_cl=actor_cl,
+            policy_kwargs=policy_kwargs,
+            prefetch_batches=args.prefetch_batches,
+            in_graph_updates=args.in_graph_updates,
+            async_updates=args.async_updates,
+            save_freq_epochs=env.num_tasks + 1,
+            experiment_dir=experiment_dir,
+            timestamp='benchmark',
+        )
+
+        env_durations, update_durations, task_end_durations, task_start_durations = [], [], [], []
+        env.step = _timed(env.step, env_durations)
+        sac._update_phase = _timed(sac._update_phase, update_durations)
+        sac.on_task_end = _timed(sac.on_task_end, task_end_durations)
+        sac._handle_task_change = _timed(sac._handle_task_change, task_start_durations)
+
+        start = time.perf_counter()
+        sac.run()
+        elapsed = time.perf_counter() - start
+        logger.close()
+    env.close()
+
+    # A switch spans the end of a task and the start of the following one
+    switches = [end + start for end, start in zip(task_end_durations, task_start_durations[1:])]
+    return {
+        'method': method,
+        'env': args.env if args.env == 'stub' else args.sequence,
+        'num_tasks': env.num_tasks,
+        'steps_per_env': args.steps_per_env,
+        'walltime_s': elapsed,
+        'env_steps_per_sec': len(env_durations) / elapsed,
+        'env_step_ms': float(np.mean(env_durations)) * 1e3,
+        'updates_per_sec': len(update_durations) * args.n_updates / sum(update_durations) if update_durations else 0.0,
+        'task_switch_s': float(np.mean(switches)) if switches else 0.0,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _key(result: Dict[str, Any]) -> Tuple:
+    return tuple(result[key] for key in CONFIG_KEYS)
+
+
+def find_regressions(results: List[Dict[str, Any]], baseline_path: str, threshold: float) -> List[str]:
+    """Compares the metrics of every configuration with its result in a baseline report and describes those which
+    got worse by more than the threshold, given as a fraction of the baseline value."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    baseline_results = {_key(result): result for result in baseline['results']}
+    print(f"\nComparison with {baseline_path} (commit {baseline.get('commit')})")
+    regressions = []
+    for result in results:
+        reference = baseline_results.get(_key(result))
+        if reference is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if not reference[metric]:
+                continue
+            change = result[metric] / reference[metric] - 1
+            regressed = -change > threshold if higher_is_better else change > threshold
+            print(f"{result['method']:>8} {metric:>18} {reference[metric]:>10.2f} -> {result[metric]:>10.2f} "
+                  f"{change:>+8.1%}{'  REGRESSION' if regressed else ''}")
+            if regressed:
+                regressions.append(f"{result['method']} {metric}: {reference[metric]:.2f} -> {result[metric]:.2f}")
+    return regressions
+
+
+def main(args: argparse.Namespace):
+    results = []
+    print(f"{'method':>8} {'env steps/s':>12} {'env ms/step':>12} {'updates/s':>10} {'switch (s)':>10} "
+          f"{'peak RSS (MB)':>14}")
+    for method in args.methods:
+        # Every method runs in a fresh process, so that its peak memory usage is measured separately
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            result = executor.submit(benchmark, method, args).result()
+        results.append(result)
+        print(f"{method:>8} {result['env_steps_per_sec']:>12.1f} {result['env_step_ms']:>12.3f} "
+              f"{result['updates_per_sec']:>10.1f} {result['task_switch_s']:>10.2f} {result['peak_rss_mb']:>14.1f}")
+
+    report = {
+        'commit': _commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'platform': {'python': platform.python_version(), 'machine': platform.machine(),
+                     'processor': platform.processor()},
+        'config': {key: value for key, value in vars(args).items() if isinstance(value, (int, float, str, list))},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        regressions = find_regressions(results, args.baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}:\n" + '\n'.join(regressions))
+            sys.exit(1)
+
+
+def get_benchmark_parser() -> argparse.ArgumentParser:
+    """Extends the training arguments, so that the benchmarked runs share the defaults of CL/run_cl.py."""
+    parser = get_arg_parser()
+    parser.description = "Benchmark the training throughput of the continual learning methods"
+    parser.add_argument('--methods', type=str, nargs='+', default=list(METHODS), choices=list(METHODS),
+                        help="Methods to benchmark")
+    parser.add_argument('--env', type=str, default='stub', choices=['stub', 'real'],
+                        help="Train on stub environments, which isolate the cost of the agent, or on the --sequence")
+    parser.add_argument('--num_tasks', type=int, default=2, help="Number of stub tasks")
+    parser.add_argument('--episode_length', type=int, default=250, help="Number of steps of a stub episode")
+    parser.add_argument('--output', type=str, default=None, help="Optional path of a JSON file to store the report")
+    parser.add_argument('--baseline', type=str, default=None,
+                        help="Optional path of a previous report to check the results for regressions against")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="Relative deterioration of a metric over the baseline which is flagged as a regression")
+    # A short fixed budget, the remaining training arguments keep their defaults
+    parser.set_defaults(steps_per_env=2000, start_steps=500, update_after=500, update_every=250, n_updates=50,
+                        episodic_mem_per_task=500, packnet_retrain_steps=100)
+    return parser
+
+
+if __name__ == "__main__":
+    main(get_benchmark_parser().parse_args())
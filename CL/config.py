@@ -21,6 +21,8 @@ def get_arg_parser():
     arg('--seed', type=int, default=0, help='Seed for randomness')
     arg('--gpu', '-g', default=None, type=int, help='Which GPU to use')
     arg("--sparse_rewards", default=False, action='store_true', help="Whether to use the sparse reward setting")
+    arg("--compile_rewards", default=False, action='store_true',
+        help="Whether to evaluate the reward wrappers of a scenario within a single wrapper")
 
     # Continual learning
     arg("--sequence", type=str, default=None, choices=['CD4', 'CD8', 'CD16', 'CO4', 'CO8', 'CO16', 'COC', 'MIXED'],
@@ -30,6 +32,10 @@ def get_arg_parser():
     arg('--start_from', type=int, default=0, help='Which task to start/continue the training from')
     arg('--num_repeats', type=int, default=1, help='How many times to repeat the sequence')
     arg('--random_order', default=False, action='store_true', help='Whether to randomize the order of the tasks')
+    arg('--warm_pool_size', type=int, default=0,
+        help='Number of upcoming task environments to start in the background before they are needed')
+    arg('--share_envs', default=False, action='store_true',
+        help='Whether to share a pool of game instances between the training and the test environments')
 
     # DOOM
     arg('--render', default=False, action='store_true', help='Render the environment')
@@ -38,6 +44,9 @@ def get_arg_parser():
     arg('--frame_skip', type=int, default=4, help='Number of frames to skip')
     arg('--resolution', type=str, default=None, choices=['800X600', '640X480', '320X240', '160X120'],
         help='Screen resolution of the game')
+    arg('--native_capture', default=False, action='store_true',
+        help='Capture channel-last frames at the smallest resolution fitting the frame size')
+    arg('--grayscale', default=False, action='store_true', help='Capture grayscale frames. Requires --native_capture')
 
     # Save/Load
     arg("--save_freq_epochs", type=int, default=25, help="Save the model parameters after n epochs")
@@ -45,20 +54,26 @@ def get_arg_parser():
 
     # Recording
     arg("--record", default=False, action='store_true', help="Whether to record gameplay videos")
+    arg("--record_actions", default=False, action='store_true',
+        help="Whether to record the seeds and actions of the episodes, from which videos can be rendered offline")
     arg("--record_every", type=int, default=100, help="Record gameplay video every n episodes")
     arg("--video_folder", type=str, default='videos', help="Path to save the gameplay videos")
 
     # Logging
     arg('--with_wandb', default=False, action='store_true', help='Enables Weights and Biases')
-    arg("--logger_output", type=str, nargs="+", choices=["neptune", "tensorboard", "tsv"],
+    arg("--logger_output", type=str, nargs="+", choices=["neptune", "tensorboard", "tsv", "npy"],
         default=["tsv", "tensorboard"], help="Types of logger used.")
     arg("--group_id", type=str, default="default_group",
         help="Group ID, for grouping logs from different experiments into common directory")
     arg("--log_every", type=sci2int, default=int(1000),
         help="Number of steps between subsequent evaluations and logging")
+    arg("--profile_epochs", type=int, nargs="*", default=[],
+        help="Epochs to capture a TensorFlow profiler trace of, stored with the TensorBoard logs")
 
     # Model
     arg("--use_lstm", default=False, action='store_true', help="Whether to use an LSTM after the CNN encoder head")
+    arg("--shared_encoder", default=False, action='store_true',
+        help="Whether the actor and the critics share a single CNN encoder")
     arg("--hidden_sizes", type=int, nargs="+", default=[256, 256], help="Hidden sizes list for the MLP models")
     arg("--activation", type=str, default="lrelu", help="Activation kind for the models")
     arg("--use_layer_norm", type=str2bool, default=True, help="Whether to use layer normalization")
@@ -77,6 +92,10 @@ def get_arg_parser():
     arg("--buffer_type", type=str, default="fifo", choices=[b.value for b in BufferType],
         help="Strategy of inserting examples into the buffer")
     arg("--episodic_memory_from_buffer", type=str2bool, default=True)
+    arg("--compact_replay", default=False, action='store_true',
+        help="Store raw uint8 frames in the replay buffer and normalize them only when they are sampled")
+    arg("--deduplicate_frames", default=False, action='store_true',
+        help="Store every frame of the stacked observations only once in the replay buffer")
 
     # Training
     arg("--steps_per_env", type=sci2int, default=int(2e5),
@@ -87,6 +106,14 @@ def get_arg_parser():
     arg("--n_updates", type=sci2int, default=int(50),
         help="Number of consecutive policy gradient descent updates to perform")
     arg("--batch_size", type=int, default=128, help="Minibatch size for the optimization")
+    arg("--prefetch_batches", type=int, default=0,
+        help="Number of batches to sample ahead in a background thread during the updates. 0 samples synchronously")
+    arg("--batch_augmentation", type=str, default=None, choices=['conv', 'shift', 'noise'],
+        help="Type of image augmentation applied to the sampled batches with random parameters per sample")
+    arg("--in_graph_updates", default=False, action='store_true',
+        help="Run all updates of an update phase in a single compiled graph sampling from a device copy of the buffer")
+    arg("--async_updates", default=False, action='store_true',
+        help="Perform the updates in a learner thread while the experience is collected")
     arg("--gamma", type=float, default=0.99, help="Discount factor")
     arg("--alpha", type=float_or_str, default="auto",
         help="Entropy regularization coefficient. "
@@ -102,6 +129,10 @@ def get_arg_parser():
     arg("--test", type=str2bool, default=True, help="Whether to test the model")
     arg("--test_only", default=False, action='store_true', help="Whether to only test the model")
     arg("--test_episodes", default=3, type=int, help="Number of episodes to test the model")
+    arg("--parallel_test", default=False, action='store_true',
+        help="Whether to play all the test episodes concurrently in worker processes")
+    arg("--background_test", default=False, action='store_true',
+        help="Whether to test snapshots of the actor in a separate process while the training continues")
 
     # Exploration
     arg("--start_steps", type=sci2int, default=int(10000),
@@ -137,6 +168,8 @@ def get_arg_parser():
     arg('--frame_stack', type=int, default=4, help='Number of frames to stack')
     arg('--frame_height', type=int, default=84, help='Height of the frame')
     arg('--frame_width', type=int, default=84, help='Width of the frame')
+    arg('--fused_pipeline', default=False, action='store_true',
+        help='Whether to resize, rescale, normalize and stack the frames in a single wrapper with reused buffers')
     arg("--augment", default=False, action='store_true', help="Whether to use image augmentation")
     arg("--augmentation", type=str, default=None, choices=['conv', 'shift', 'noise'], help="Type of image augmentation")
 
@@ -6,6 +6,8 @@ from CL.rl.sac import SAC
 
 
 class AGEM_SAC(SAC):
+    update_log_keys = dict(SAC.update_log_keys, agem_violation="train/agem_violation")
+
     def __init__(
             self, episodic_mem_per_task: int = 0, episodic_batch_size: int = 0, **vanilla_sac_kwargs
     ):
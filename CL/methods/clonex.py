@@ -59,7 +59,7 @@ class ClonExSAC(SAC):
                 critic_loss = critic1_loss + critic2_loss
                 critic_loss *= self.cl_reg_coef
 
-        actor_gradients = g.gradient(actor_loss, self.actor.trainable_variables)
+        actor_gradients = g.gradient(actor_loss, self.actor_variables)
         critic_gradients = g.gradient(critic_loss, self.critic_variables) if self.regularize_critic else None
 
         return actor_gradients, critic_gradients, actor_loss
@@ -101,13 +101,17 @@ class ClonExSAC(SAC):
         return final_grads
 
     def gather_buffer(self, task_idx):
-        tmp_replay_buffer = ReplayBuffer(self.obs_shape, self.episodic_mem_per_task, self.num_tasks)
+        normalizer_key = f'train/{task_idx}'
+        tmp_replay_buffer = ReplayBuffer(self.obs_shape, self.episodic_mem_per_task, self.num_tasks,
+                                         **self._buffer_kwargs(self.get_obs_normalizer(normalizer_key)))
         one_hot_vec = create_one_hot_vec(self.env.num_tasks, self.env.task_id)
-        env_to_gather = self.env.envs[task_idx]
+        env_to_gather = self.env.get_env(task_idx)
         obs, _ = env_to_gather.reset()
         episode_len = 0
         for step_idx in range(self.episodic_mem_per_task):
-            action = self.get_action(tf.convert_to_tensor(obs), tf.convert_to_tensor(one_hot_vec, dtype=tf.float32))
+            obs_input = self.process_observation(obs, normalizer_key)
+            action = self.get_action(tf.convert_to_tensor(obs_input),
+                                     tf.convert_to_tensor(one_hot_vec, dtype=tf.float32))
             action = action.numpy()[0]
             next_obs, reward, done, truncated, info = env_to_gather.step(action)
 
@@ -120,6 +124,8 @@ class ClonExSAC(SAC):
                 episode_len = 0
             else:
                 obs = next_obs
+        # The environment of a finished task is only created again for the gathering
+        self.env.close_task(task_idx)
         return tmp_replay_buffer.sample_batch(self.episodic_mem_per_task)
 
     def on_task_start(self, current_task_idx: int) -> None:
@@ -40,7 +40,7 @@ class EWC_SAC(Regularization_SAC):
     def _get_importance_weights(self, **batch) -> List[tf.Tensor]:
         actor_gs, q1_gs, q2_gs = self._get_grads(batch['obs'], batch['one_hot'])
 
-        reg_weights = []
+        actor_weights = []
         for gs in actor_gs:
             if gs is None:
                 raise ValueError("Actor gradients are None!")
@@ -52,15 +52,9 @@ class EWC_SAC(Regularization_SAC):
             fisher = tf.clip_by_value(fisher, 1e-5, np.inf)
 
             # Average over the examples in the batch
-            reg_weights += [tf.reduce_mean(fisher, 0)]
+            actor_weights += [tf.reduce_mean(fisher, 0)]
 
-        critic_coef = 1.0 if self.regularize_critic else 0.0
-        for q_g in q1_gs:
-            fisher = q_g**2
-            reg_weights += [critic_coef * tf.reduce_mean(fisher, 0)]
+        q1_weights = [tf.reduce_mean(q_g**2, 0) for q_g in q1_gs]
+        q2_weights = [tf.reduce_mean(q_g**2, 0) for q_g in q2_gs]
 
-        for q_g in q2_gs:
-            fisher = q_g**2
-            reg_weights += [critic_coef * tf.reduce_mean(fisher, 0)]
-
-        return reg_weights
+        return self._collect_importance_weights(actor_weights, q1_weights, q2_weights)
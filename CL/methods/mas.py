@@ -43,15 +43,8 @@ class MAS_SAC(Regularization_SAC):
     def _get_importance_weights(self, **batch) -> List[tf.Tensor]:
         actor_gs, q1_gs, q2_gs = self._get_grads(batch['obs'], batch['one_hot'])
 
-        reg_weights = []
-        for g in actor_gs:
-            reg_weights += [tf.reduce_mean(tf.abs(g), 0)]
+        actor_weights = [tf.reduce_mean(tf.abs(g), 0) for g in actor_gs]
+        q1_weights = [tf.reduce_mean(tf.abs(g), 0) for g in q1_gs]
+        q2_weights = [tf.reduce_mean(tf.abs(g), 0) for g in q2_gs]
 
-        critic_coef = 1.0 if self.regularize_critic else 0.0
-        for g in q1_gs:
-            reg_weights += [critic_coef * tf.reduce_mean(tf.abs(g), 0)]
-
-        for g in q2_gs:
-            reg_weights += [critic_coef * tf.reduce_mean(tf.abs(g), 0)]
-
-        return reg_weights
+        return self._collect_importance_weights(actor_weights, q1_weights, q2_weights)
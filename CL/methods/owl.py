@@ -70,6 +70,9 @@ class OWL_SAC(EWC_SAC):
 
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
+        if self.background_test:
+            raise ValueError("OWL selects the task heads during the test episodes, so it cannot be tested in the "
+                             "background")
 
     def test_agent(self, deterministic: bool, num_episodes: int) -> None:
         mode = "deterministic" if deterministic else "stochastic"
@@ -98,8 +101,9 @@ class OWL_SAC(EWC_SAC):
             (n_tasks, n_arms, num_episodes, episode_max_steps + 1))
         bandit_probs[:], bandit_p[:] = np.nan, np.nan
 
-        for seq_idx, test_env in enumerate(self.test_envs):
+        for seq_idx in range(n_tasks):
             start_time = time.time()
+            test_env = self.acquire_test_env(seq_idx)
             key_prefix = f"test/{mode}/{seq_idx}/{test_env.name}"
             one_hot_vec = create_one_hot_vec(n_tasks, test_env.task_id)
 
@@ -119,7 +123,8 @@ class OWL_SAC(EWC_SAC):
                         one_hot_vec = create_one_hot_vec(n_tasks, idx)
                     arm[test_env.task_id, j, iter_episode] = idx
                     bandit_p[test_env.task_id, :, j, iter_episode] = bandit.p
-                    action = self.get_action_test(tf.convert_to_tensor(obs),
+                    obs_input = self.process_observation(obs, f"test/{seq_idx}")
+                    action = self.get_action_test(tf.convert_to_tensor(obs_input),
                                                   tf.convert_to_tensor(one_hot_vec, dtype=tf.dtypes.float32),
                                                   tf.constant(deterministic))
                     next_obs, reward, done, _, _ = test_env.step(
@@ -140,7 +145,8 @@ class OWL_SAC(EWC_SAC):
                     # next_actions = self.get_action_test(tf.convert_to_tensor(next_obs),
                     #                           tf.convert_to_tensor(one_hot_vec, dtype=tf.dtypes.float32),
                     #                           tf.constant(deterministic))
-                    q_target = self.critic1(tf.convert_to_tensor([next_obs]),
+                    next_obs_input = self.process_observation(next_obs, f"test/{seq_idx}", update=False)
+                    q_target = self.critic1(tf.convert_to_tensor([next_obs_input]),
                                             tf.convert_to_tensor([one_hot_vec], dtype=tf.dtypes.float32))
                     # q_target = next_actions_probs.gather(1, next_actions)
                     q_target = tf.stop_gradient(q_target)
@@ -150,7 +156,7 @@ class OWL_SAC(EWC_SAC):
                         # iterate through the arms/heads to get feedback for the bandit
                         # Don't need to reset the agent with idx as it is not used, until the next round
                         # state_action_values = action_probs.gather(1, torch.Tensor(np.array([action])).long().view(1, -1).to(self.device))
-                        state_values = self.critic1(tf.convert_to_tensor([obs]),
+                        state_values = self.critic1(tf.convert_to_tensor([obs_input]),
                                                     tf.convert_to_tensor([one_hot_vec], dtype=tf.dtypes.float32))
 
                         # MSE feedback
@@ -179,6 +185,7 @@ class OWL_SAC(EWC_SAC):
                 total_action_counts = {i: total_action_counts[i] + action_counts[i] for i in range(num_actions)}
 
             self.on_test_end(seq_idx)
+            self.release_test_env(seq_idx, test_env)
             self.logger.log(f"Finished testing {key_prefix} in {time.time() - start_time:.2f} seconds", color='yellow')
 
             self.logger.log_tabular(key_prefix + "/return", with_min_and_max=True)
@@ -1,4 +1,5 @@
 import time
+from functools import partial
 from typing import Dict, List, Tuple
 
 import tensorflow as tf
@@ -8,6 +9,8 @@ from CL.utils.running import reset_optimizer
 
 
 class PackNet_SAC(SAC):
+    test_view_per_task = True
+
     def __init__(
         self, regularize_critic: bool = False, retrain_steps: int = 0, **vanilla_sac_kwargs
     ) -> None:
@@ -15,7 +18,7 @@ class PackNet_SAC(SAC):
 
         Args:
           regularize_critic: If True, both actor and critic are regularized; if False, only actor
-            is regularized.
+            is regularized. A shared encoder is always regularized, since the actor depends on it.
           retrain_steps: Number of retrain steps after network pruning, which occurs after
             each task.
         """
@@ -23,27 +26,27 @@ class PackNet_SAC(SAC):
         self.regularize_critic = regularize_critic
         self.retrain_steps = retrain_steps
 
-        packnet_models = [self.actor]
+        packnet_variables = list(self.actor.common_variables)
+        if self.encoder is not None:
+            packnet_variables.extend(self.encoder.trainable_variables)
         if self.regularize_critic:
-            packnet_models.extend([self.critic1, self.critic2])
+            packnet_variables.extend(self.critic1.common_variables + self.critic2.common_variables)
 
         self.owner = {}
         self.saved_variables = {}
         self.current_view = tf.Variable(-1, trainable=False)
         self.managed_variable_refs = set()
-        for model in packnet_models:
-            if model.num_heads == 1:
-                variables_to_manage = model.trainable_variables
-            else:
-                # If there are more heads, do not touch them with PackNet.
-                variables_to_manage = model.core.trainable_variables
-            for v in variables_to_manage:
-                self.managed_variable_refs.add(v.ref())
-                if "kernel" in v.name:
-                    self.owner[v.ref()] = tf.Variable(
-                        tf.zeros_like(v, dtype=tf.int32), trainable=False
-                    )
-                    self.saved_variables[v.ref()] = tf.Variable(tf.zeros_like(v), trainable=False)
+        # If there are more heads, do not touch them with PackNet, hence only the common variables are managed.
+        # A shared encoder is managed even if the critics, which train it, are not.
+        for v in packnet_variables:
+            if v.ref() in self.managed_variable_refs:
+                continue
+            self.managed_variable_refs.add(v.ref())
+            if "kernel" in v.name:
+                self.owner[v.ref()] = tf.Variable(
+                    tf.zeros_like(v, dtype=tf.int32), trainable=False
+                )
+                self.saved_variables[v.ref()] = tf.Variable(tf.zeros_like(v), trainable=False)
         self.freeze_biases_and_normalization = tf.Variable(False, trainable=False)
 
     def adjust_gradients(
@@ -56,9 +59,9 @@ class PackNet_SAC(SAC):
         episodic_batch: Dict[str, tf.Tensor] = None,
     ) -> Tuple[List[tf.Tensor], List[tf.Tensor], List[tf.Tensor]]:
         actor_gradients = self._adjust_gradients_list(
-            actor_gradients, self.actor.trainable_variables, tf.convert_to_tensor(current_task_idx)
+            actor_gradients, self.actor_variables, tf.convert_to_tensor(current_task_idx)
         )
-        if self.regularize_critic:
+        if self.regularize_critic or self.encoder is not None:
             critic_gradients = self._adjust_gradients_list(
                 critic_gradients, self.critic_variables, tf.convert_to_tensor(current_task_idx)
             )
@@ -86,8 +89,9 @@ class PackNet_SAC(SAC):
             self.logger.log(f"Retraining for {self.retrain_steps} steps", color='cyan')
             time_start = time.time()
 
-            for _ in range(self.retrain_steps):
-                batch = self.replay_buffer.sample_batch(self.batch_size)
+            batches = self.batch_prefetcher.prefetch(partial(self.replay_buffer.sample_batch, self.batch_size),
+                                                     self.retrain_steps)
+            for batch in batches:
                 self.learn_on_batch(tf.convert_to_tensor(current_task_idx), batch)
 
             self.logger.log(f"Retraining completed in {time.time() - time_start:.2f} seconds", color='cyan')
@@ -3,6 +3,7 @@ from typing import List
 
 from CL.replay.buffers import ReplayBuffer
 from CL.rl.sac import SAC
+from CL.utils.running import unique_variables
 
 
 class Regularization_SAC(SAC):
@@ -13,7 +14,7 @@ class Regularization_SAC(SAC):
           cl_reg_coef: Regularization strength for continual learning methods.
             Valid for 'l2', 'ewc', 'mas' continual learning methods.
           regularize_critic: If True, both actor and critic are regularized; if False, only actor
-            is regularized.
+            is regularized. A shared encoder is always regularized, since the actor depends on it.
         """
         super().__init__(**vanilla_sac_kwargs)
         self.cl_reg_coef = cl_reg_coef
@@ -23,7 +24,12 @@ class Regularization_SAC(SAC):
         )
 
         self.actor_common_variables = self.actor.common_variables
-        self.critic_common_variables = self.critic1.common_variables + self.critic2.common_variables
+        self.critic_common_variables = unique_variables(self.critic1.common_variables + self.critic2.common_variables)
+        encoder_variables = [] if self.encoder is None else self.encoder.trainable_variables
+        self.regularized_variable_refs = {
+            v.ref() for v in self.actor_common_variables + encoder_variables
+            + (self.critic_common_variables if regularize_critic else [])
+        }
 
         self.reg_weights = list(
             tf.Variable(tf.zeros_like(param), trainable=False)
@@ -84,5 +90,18 @@ class Regularization_SAC(SAC):
             reg_loss += tf.reduce_sum(weighted_diffs)
         return reg_loss
 
+    def _collect_importance_weights(
+            self, actor_weights: List[tf.Tensor], critic1_weights: List[tf.Tensor], critic2_weights: List[tf.Tensor]
+    ) -> List[tf.Tensor]:
+        """Orders the importance weights computed for the common variables of each model as all_common_variables.
+        The weights of a shared encoder are summed over the critics, and the ones of the variables which are not
+        regularized are zeroed."""
+        variables = self.actor_common_variables + self.critic1.common_variables + self.critic2.common_variables
+        weights = {}
+        for v, weight in zip(variables, actor_weights + critic1_weights + critic2_weights):
+            weights[v.ref()] = weights[v.ref()] + weight if v.ref() in weights else weight
+        return [weights[v.ref()] if v.ref() in self.regularized_variable_refs else tf.zeros_like(weights[v.ref()])
+                for v in self.all_common_variables]
+
     def _get_importance_weights(self, **batch) -> List[tf.Tensor]:
         raise NotImplementedError
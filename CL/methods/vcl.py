@@ -1,4 +1,4 @@
-from typing import Callable, List, Tuple
+from typing import Callable, List, Optional, Tuple
 
 import gymnasium
 import tensorflow as tf
@@ -8,7 +8,7 @@ from keras.initializers.initializers_v2 import GlorotUniform
 from keras.layers import Concatenate, Activation, Layer
 from keras.layers import LayerNormalization
 
-from CL.rl.models import _choose_head, build_conv_head
+from CL.rl.models import ConvEncoder, _choose_head, build_input_head, encode
 from CL.rl.sac import SAC
 
 
@@ -30,6 +30,8 @@ class VCL_SAC(SAC):
           first_task_kl: If True, use KL regularization also for the first task in 'vcl'
             continual learning method.
         """
+        if vanilla_sac_kwargs.get("shared_encoder"):
+            raise ValueError("VCL does not support a shared encoder, since only the actor has a prior distribution")
         super().__init__(**vanilla_sac_kwargs)
         self.cl_reg_coef = cl_reg_coef
         self.regularize_critic = regularize_critic
@@ -172,10 +174,10 @@ class BayesianDense(Layer):
 
 
 def variational_mlp(state_shape: Tuple[int], num_tasks: int, hidden_sizes: Tuple[int], activation: Callable,
-                    use_layer_norm: bool = False, use_lstm: bool = False, hide_task_id: bool = False) -> Model:
+                    use_layer_norm: bool = False, use_lstm: bool = False, hide_task_id: bool = False,
+                    feature_dim: Optional[int] = None) -> Model:
     task_input = Input(shape=num_tasks, name='task_input', dtype=tf.float32)
-    conv_in = Input(shape=state_shape, name='conv_head_in')
-    conv_head = build_conv_head(conv_in, use_lstm)
+    conv_in, conv_head = build_input_head(state_shape, use_lstm, feature_dim)
 
     model = conv_head if hide_task_id else Concatenate()([conv_head, task_input])
     model = BayesianDense(model.shape[-1], hidden_sizes[0])(model)
@@ -204,14 +206,17 @@ class VclMlpActor(Model):
             use_lstm: bool = False,
             num_heads: int = 1,
             hide_task_id: bool = False,
+            encoder: Optional[ConvEncoder] = None,
     ) -> None:
         super(VclMlpActor, self).__init__()
 
         self.num_heads = num_heads
         self.hide_task_id = hide_task_id
+        self.encoder = encoder
 
+        feature_dim = None if encoder is None else encoder.output_dim
         self.core = variational_mlp(state_space.shape, num_tasks, hidden_sizes, activation, use_layer_norm, use_lstm,
-                                    hide_task_id)
+                                    hide_task_id, feature_dim)
 
         self.head_mu = Sequential(
             [
@@ -227,10 +232,14 @@ class VclMlpActor(Model):
     def common_variables(self) -> List[tf.Variable]:
         return self.core.trainable_variables + self.head_mu.trainable_variables
 
-    def call(self, obs: tf.Tensor, one_hot_task_id: tf.Tensor, samples_num: int = 1) -> Tuple[tf.Tensor]:
+    def call(self, obs: tf.Tensor, one_hot_task_id: tf.Tensor, samples_num: int = 1,
+             features: Optional[tf.Tensor] = None) -> Tuple[tf.Tensor]:
+        inputs = encode(self.encoder, obs, features)
+        if self.encoder is not None:
+            inputs = tf.stop_gradient(inputs)
         mus = []
         for sample_idx in range(samples_num):
-            logits = self.core(obs) if self.hide_task_id else self.core((obs, one_hot_task_id))
+            logits = self.core(inputs) if self.hide_task_id else self.core((inputs, one_hot_task_id))
             mu = self.head_mu(logits)
 
             if self.num_heads > 1:
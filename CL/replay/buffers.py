@@ -2,10 +2,10 @@ import numpy as np
 import random
 import tensorflow as tf
 from enum import Enum
-from typing import Dict, Tuple, Optional
+from typing import Callable, Dict, Tuple, Optional
 from typing import Union
 
-from CL.replay.tree import SumTree, SegmentTree
+from CL.replay.tree import ExtremumTree, SegmentTree
 
 
 class BufferType(Enum):
@@ -16,11 +16,16 @@ class BufferType(Enum):
 
 
 class ReplayBuffer:
-    """A simple FIFO experience replay buffer for SAC agents."""
+    """A simple FIFO experience replay buffer for SAC agents.
 
-    def __init__(self, obs_shape: Optional[Tuple[int, ...]], size: int, num_tasks: int) -> None:
-        self.obs_buf = np.zeros([size, *obs_shape], dtype=np.float32)
-        self.next_obs_buf = np.zeros([size, *obs_shape], dtype=np.float32)
+    The observations can be kept in a compact form, e.g. as raw uint8 frames, by setting obs_dtype. The obs_transform
+    is then applied to the sampled observations to convert them to the input of the networks.
+    """
+
+    def __init__(self, obs_shape: Optional[Tuple[int, ...]], size: int, num_tasks: int,
+                 obs_dtype: np.dtype = np.float32, obs_transform: Optional[Callable] = None) -> None:
+        self._init_observation_storage(obs_shape, size, obs_dtype)
+        self.obs_transform = obs_transform
         self.actions_buf = np.zeros(size, dtype=np.int32)
         self.rewards_buf = np.zeros(size, dtype=np.float32)
         self.done_buf = np.zeros(size, dtype=np.float32)
@@ -31,8 +36,7 @@ class ReplayBuffer:
             self, obs: np.ndarray, action: np.ndarray, reward: float, next_obs: np.ndarray, done: bool,
             one_hot: np.ndarray
     ) -> None:
-        self.obs_buf[self.ptr] = obs
-        self.next_obs_buf[self.ptr] = next_obs
+        self._store_observations(self.ptr, obs, next_obs)
         self.actions_buf[self.ptr] = action
         self.rewards_buf[self.ptr] = reward
         self.done_buf[self.ptr] = done
@@ -40,11 +44,29 @@ class ReplayBuffer:
         self.ptr = (self.ptr + 1) % self.max_size
         self.size = min(self.size + 1, self.max_size)
 
+    def end_episode(self) -> None:
+        """Signals that the next stored transition does not continue the episode of the previously stored one."""
+
+    def _init_observation_storage(self, obs_shape: Tuple[int, ...], size: int, obs_dtype: np.dtype) -> None:
+        self.obs_buf = np.zeros([size, *obs_shape], dtype=obs_dtype)
+        self.next_obs_buf = np.zeros([size, *obs_shape], dtype=obs_dtype)
+
+    def _store_observations(self, idx: int, obs: np.ndarray, next_obs: np.ndarray) -> None:
+        self.obs_buf[idx] = obs
+        self.next_obs_buf[idx] = next_obs
+
+    def _sample_observations(self, idxs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return self.obs_buf[idxs], self.next_obs_buf[idxs]
+
+    def transform_obs(self, obs: np.ndarray) -> np.ndarray:
+        return obs if self.obs_transform is None else self.obs_transform(obs)
+
     def sample_batch(self, batch_size: int) -> Dict[str, tf.Tensor]:
         idxs = np.random.randint(0, self.size, size=batch_size)
+        obs, next_obs = self._sample_observations(idxs)
         return dict(
-            obs=tf.convert_to_tensor(self.obs_buf[idxs]),
-            next_obs=tf.convert_to_tensor(self.next_obs_buf[idxs]),
+            obs=tf.convert_to_tensor(self.transform_obs(obs)),
+            next_obs=tf.convert_to_tensor(self.transform_obs(next_obs)),
             actions=tf.convert_to_tensor(self.actions_buf[idxs]),
             rewards=tf.convert_to_tensor(self.rewards_buf[idxs]),
             done=tf.convert_to_tensor(self.done_buf[idxs]),
@@ -52,6 +74,64 @@ class ReplayBuffer:
         )
 
 
+class TensorReplayMirror:
+    """Device-resident copy of a FIFO replay buffer, from which batches can be sampled inside a compiled graph.
+
+    The rows stored since the previous call of sync() are uploaded incrementally, so sync() has to be called at least
+    once every max_size stores. Compact uint8 observations are normalized on the device with the given statistics.
+    """
+
+    def __init__(self, obs_shape: Tuple[int, ...], size: int, num_tasks: int, obs_dtype: np.dtype = np.float32) -> None:
+        self.obs_buf = tf.Variable(tf.zeros([size, *obs_shape], dtype=obs_dtype), trainable=False)
+        self.next_obs_buf = tf.Variable(tf.zeros([size, *obs_shape], dtype=obs_dtype), trainable=False)
+        self.actions_buf = tf.Variable(tf.zeros(size, dtype=tf.int32), trainable=False)
+        self.rewards_buf = tf.Variable(tf.zeros(size, dtype=tf.float32), trainable=False)
+        self.done_buf = tf.Variable(tf.zeros(size, dtype=tf.float32), trainable=False)
+        self.one_hot_buf = tf.Variable(tf.zeros([size, num_tasks], dtype=tf.float32), trainable=False)
+        self.source, self.ptr, self.size = None, 0, 0
+
+    def sync(self, buffer: ReplayBuffer) -> int:
+        """Uploads the new transitions of the buffer and returns the number of transitions available for sampling."""
+        if buffer is not self.source:
+            self.source, self.ptr, self.size = buffer, 0, 0
+        if buffer.ptr == self.ptr and buffer.size == self.size:
+            return self.size
+        start, end = self.ptr, buffer.ptr
+        for range_start, range_end in [(start, end)] if start < end else [(start, buffer.max_size), (0, end)]:
+            if range_end > range_start:
+                self._upload(buffer, range_start, range_end)
+        self.ptr, self.size = buffer.ptr, buffer.size
+        return self.size
+
+    def _upload(self, buffer: ReplayBuffer, start: int, end: int) -> None:
+        self.obs_buf[start:end].assign(buffer.obs_buf[start:end])
+        self.next_obs_buf[start:end].assign(buffer.next_obs_buf[start:end])
+        self.actions_buf[start:end].assign(buffer.actions_buf[start:end])
+        self.rewards_buf[start:end].assign(buffer.rewards_buf[start:end])
+        self.done_buf[start:end].assign(buffer.done_buf[start:end])
+        self.one_hot_buf[start:end].assign(buffer.one_hot_buf[start:end])
+
+    def sample_batch(self, batch_size: int, size: tf.Tensor,
+                     obs_stats: Optional[Tuple[tf.Tensor, tf.Tensor]] = None) -> Dict[str, tf.Tensor]:
+        idxs = tf.random.uniform([batch_size], maxval=size, dtype=tf.int32)
+        obs = tf.gather(self.obs_buf, idxs)
+        next_obs = tf.gather(self.next_obs_buf, idxs)
+        if obs_stats is not None:
+            obs, next_obs = self._normalize(obs, *obs_stats), self._normalize(next_obs, *obs_stats)
+        return dict(
+            obs=obs,
+            next_obs=next_obs,
+            actions=tf.gather(self.actions_buf, idxs),
+            rewards=tf.gather(self.rewards_buf, idxs),
+            done=tf.gather(self.done_buf, idxs),
+            one_hot=tf.gather(self.one_hot_buf, idxs)
+        )
+
+    @staticmethod
+    def _normalize(obs: tf.Tensor, mean: tf.Tensor, std: tf.Tensor) -> tf.Tensor:
+        return (tf.cast(obs, tf.float32) / 255. * 2 - 1 - mean) / std
+
+
 class EpisodicMemory:
     """Buffer which does not support overwriting old samples."""
 
@@ -126,8 +206,8 @@ class EpisodicMemory:
 class ReservoirReplayBuffer(ReplayBuffer):
     """Buffer for SAC agents implementing reservoir sampling."""
 
-    def __init__(self, obs_shape: Optional[Tuple[int, ...]], size: int, num_tasks: int) -> None:
-        super().__init__(obs_shape, size, num_tasks)
+    def __init__(self, obs_shape: Optional[Tuple[int, ...]], size: int, num_tasks: int, **kwargs) -> None:
+        super().__init__(obs_shape, size, num_tasks, **kwargs)
         self.timestep = 0
 
     def store(
@@ -144,8 +224,7 @@ class ReservoirReplayBuffer(ReplayBuffer):
             if buffer_idx >= self.max_size:
                 return
 
-        self.obs_buf[buffer_idx] = obs
-        self.next_obs_buf[buffer_idx] = next_obs
+        self._store_observations(buffer_idx, obs, next_obs)
         self.actions_buf[buffer_idx] = action
         self.rewards_buf[buffer_idx] = reward
         self.done_buf[buffer_idx] = done
@@ -154,6 +233,12 @@ class ReservoirReplayBuffer(ReplayBuffer):
 
 
 class PrioritizedReplayBuffer(ReplayBuffer):
+    """Proportional prioritized replay with stratified sampling. arXiv:1511.05952.
+
+    The transitions are kept in the same preallocated arrays as in the FIFO buffer, while their priorities are
+    stored in a sum segment tree, so that sampling and priority updates are performed for the whole batch at once.
+    The minimum and maximum of the stored priorities are kept in a separate tree, so they are not scanned for.
+    """
     PER_e = 0.01  # Avoid some experiences to have 0 probability of being taken
     PER_a = 0.6  # Make a trade-off between random sampling and only taking high priority exp
     PER_b = 0.4  # Importance-sampling, from initial value increasing to 1
@@ -161,99 +246,61 @@ class PrioritizedReplayBuffer(ReplayBuffer):
 
     absolute_error_upper = 1.  # clipped abs error
 
-    def __init__(self, obs_shape: Optional[Tuple[int, ...]], size: int, num_tasks: int) -> None:
-        super().__init__(obs_shape, size, num_tasks)
-        self.buffer = SumTree(size)
+    def __init__(self, obs_shape: Optional[Tuple[int, ...]], size: int, num_tasks: int, **kwargs) -> None:
+        super().__init__(obs_shape, size, num_tasks, **kwargs)
+        self.priorities = SegmentTree(size)
+        self.extrema = ExtremumTree(size)
 
     def store(
             self, obs: np.ndarray, action: np.ndarray, reward: float, next_obs: np.ndarray, done: bool,
             one_hot: np.ndarray
     ) -> None:
         """
-        Store the transitions of the designated previous n steps in a replay buffer
-        Pop the leftmost transitions as the oldest in case the experience replay capacity is breached
-        In case of prioritized replay find the max priority of the SumTree and add the experiences
-        to the tree buffer with that priority value
+        Store the transition in the arrays of the FIFO buffer, overwriting the oldest one if the capacity is breached.
+        New experiences are given the maximum priority in the buffer, so that they are sampled at least once.
         """
-        # Find the maximum priority of the tree
-        max_priority = np.max(self.buffer.tree[-self.buffer.capacity:])
-
-        # Use minimum priority if the priority is 0, otherwise this experience will never have a chance to be selected
-        if max_priority == 0:
-            max_priority = self.absolute_error_upper
-
-        experience = (obs, next_obs, action, reward, done, one_hot)
-
-        # Add the new experience to the tree with the maximum priority
-        self.buffer.add(max_priority, experience)
-        self.ptr = (self.ptr + 1) % self.max_size
-        self.size = min(self.size + 1, self.max_size)
+        idx = self.ptr
+        # Use the upper bound while the buffer is empty, otherwise this experience will never be selected
+        max_priority = self.extrema.max() if self.size > 0 else self.absolute_error_upper
+        super().store(obs, action, reward, next_obs, done, one_hot)
+        self.priorities[idx] = max_priority
+        self.extrema[idx] = max_priority
 
     def sample_batch(self, batch_size: int) -> Dict[str, tf.Tensor]:
-        # Create a sample array that will contain the mini-batch
-        memory_b = []
-
-        # Create placeholders for the tree indexes and importance sampling weights
-        b_idx = np.empty((batch_size,), dtype=np.int32)
-        b_ISWeights = np.empty((batch_size, 1), dtype=np.float32)
+        # Increase the PER_b each time a new mini-batch is sampled
+        self.PER_b = min(1., self.PER_b + self.PER_b_increment)
 
-        # Calculate the priority segment
+        # Divide the range [0, p_total) into batch_size segments and uniformly sample a value from each of them
+        total_priority = self.priorities.reduce()
+        values = (np.arange(batch_size) + np.random.rand(batch_size)) * (total_priority / batch_size)
+        idxs = np.minimum(self.priorities.get_prefix_sum_idx(values), self.size - 1)
 
-        # Divide the Range[0, p_total] into n ranges
-        priority_segment = self.buffer.total_priority / batch_size  # Priority segment
+        # IS = (1/N * 1/P(i))**b / max wi == (p_i / p_min)**-b
+        weights = np.power(self.priorities[idxs] / self.extrema.min(), -self.PER_b)
 
-        # Increase the PER_b each time a new mini-batch is sampled
-        self.PER_b = np.min([1., self.PER_b + self.PER_b_increment])  # Max = 1
-
-        # Calculate the max_weight. Set it to a small value to avoid division by zero
-        p_min = np.min(self.buffer.tree[-self.buffer.capacity:]) / self.buffer.total_priority
-        max_weight = 1e-7 if p_min == 0 else (p_min * batch_size)**(-self.PER_b)
-
-        for i in range(batch_size):
-            """
-            Uniformly sample a value from each range
-            """
-            a, b = priority_segment * i, priority_segment * (i + 1)
-            value = np.random.uniform(a, b)
-
-            """
-            Experience that corresponds to each value that is retrieved
-            """
-            index, priority, data = self.buffer.get_leaf(value)
-
-            # P(j)
-            sampling_probabilities = priority / self.buffer.total_priority
-
-            #  IS = (1/N * 1/P(i))**b /max wi == (N*P(i))**-b  /max wi
-            b_ISWeights[i, 0] = np.power(batch_size * sampling_probabilities, -self.PER_b) / max_weight
-
-            b_idx[i] = index
-
-            memory_b.append(data)
-
-        memory_b = np.array(memory_b)
-        batch = dict(
-            obs=tf.convert_to_tensor(memory_b[:, 0].tolist(), dtype=tf.float32),
-            next_obs=tf.convert_to_tensor(memory_b[:, 1].tolist(), dtype=tf.float32),
-            actions=tf.convert_to_tensor(memory_b[:, 2].tolist(), dtype=tf.int32),
-            rewards=tf.convert_to_tensor(memory_b[:, 3].tolist(), dtype=tf.float32),
-            done=tf.convert_to_tensor(memory_b[:, 4].tolist(), dtype=tf.float32),
-            one_hot=tf.convert_to_tensor(memory_b[:, 5].tolist(), dtype=tf.float32),
-            idxs=tf.convert_to_tensor(b_idx, dtype=tf.int32),
-            weights=tf.convert_to_tensor(b_ISWeights, dtype=tf.float32)
+        obs, next_obs = self._sample_observations(idxs)
+        return dict(
+            obs=tf.convert_to_tensor(self.transform_obs(obs)),
+            next_obs=tf.convert_to_tensor(self.transform_obs(next_obs)),
+            actions=tf.convert_to_tensor(self.actions_buf[idxs]),
+            rewards=tf.convert_to_tensor(self.rewards_buf[idxs]),
+            done=tf.convert_to_tensor(self.done_buf[idxs]),
+            one_hot=tf.convert_to_tensor(self.one_hot_buf[idxs]),
+            idxs=tf.convert_to_tensor(idxs, dtype=tf.int32),
+            weights=tf.convert_to_tensor(weights[:, np.newaxis], dtype=tf.float32),
         )
-        return batch
 
-    def update_weights(self, tree_idx: np.ndarray, abs_errors: tf.Tensor) -> None:
+    def update_weights(self, idxs: np.ndarray, abs_errors: Union[np.ndarray, tf.Tensor]) -> None:
         """
-        Update the priorities in the tree
+        Update the priorities of the sampled transitions
         """
-        abs_errors += self.PER_e  # Avoid 0
+        abs_errors = np.asarray(abs_errors, dtype=np.float64) + self.PER_e  # Avoid 0
         clipped_errors = np.minimum(abs_errors, self.absolute_error_upper)
-        ps = np.power(clipped_errors, self.PER_a)
+        priorities = np.power(clipped_errors, self.PER_a)
 
-        for ti, p in zip(tree_idx, ps):
-            self.buffer.update(ti, p)
+        idxs = np.asarray(idxs, dtype=np.int64)
+        self.priorities[idxs] = priorities
+        self.extrema[idxs] = priorities
 
     @property
     def buffer_size(self):
@@ -261,7 +308,7 @@ class PrioritizedReplayBuffer(ReplayBuffer):
         Retrieve the number of gathered experience
         :return: Current size of the buffer
         """
-        return self.buffer.data_pointer
+        return self.size
 
 
 class PrioritizedExperienceReplay(ReplayBuffer):
@@ -281,8 +328,9 @@ class PrioritizedExperienceReplay(ReplayBuffer):
             alpha: float = 0.6,
             beta: float = 0.4,
             weight_norm: bool = True,
+            **kwargs,
     ) -> None:
-        ReplayBuffer.__init__(self, obs_shape, size, num_tasks)
+        ReplayBuffer.__init__(self, obs_shape, size, num_tasks, **kwargs)
         assert alpha > 0.0 and beta >= 0.0
         self._alpha, self._beta = alpha, beta
         self._max_prio = self._min_prio = 1.0
@@ -298,10 +346,9 @@ class PrioritizedExperienceReplay(ReplayBuffer):
             self, obs: np.ndarray, action: np.ndarray, reward: float, next_obs: np.ndarray, done: bool,
             one_hot: np.ndarray
     ) -> None:
+        idx = self.ptr
         super().store(obs, action, reward, next_obs, done, one_hot)
-        self.init_weight(self.ptr)
-        self.ptr = (self.ptr + 1) % self.max_size
-        self.size = min(self.size + 1, self.max_size)
+        self.init_weight(idx)
 
     def sample_batch(self, batch_size: int) -> Dict[str, tf.Tensor]:
         scalar = np.random.rand(batch_size) * self.weight.reduce()
@@ -309,9 +356,10 @@ class PrioritizedExperienceReplay(ReplayBuffer):
         weight = self.get_weight(idxs)
         # ref: https://github.com/Kaixhin/Rainbow/blob/master/memory.py L154
         weight = weight / np.max(weight) if self._weight_norm else weight
+        obs, next_obs = self._sample_observations(idxs)
         return dict(
-            obs=tf.convert_to_tensor(self.obs_buf[idxs]),
-            next_obs=tf.convert_to_tensor(self.next_obs_buf[idxs]),
+            obs=tf.convert_to_tensor(self.transform_obs(obs)),
+            next_obs=tf.convert_to_tensor(self.transform_obs(next_obs)),
             actions=tf.convert_to_tensor(self.actions_buf[idxs]),
             rewards=tf.convert_to_tensor(self.rewards_buf[idxs]),
             done=tf.convert_to_tensor(self.done_buf[idxs]),
@@ -345,3 +393,107 @@ class PrioritizedExperienceReplay(ReplayBuffer):
 
     def set_beta(self, beta: float) -> None:
         self._beta = beta
+
+
+class FrameReplayBuffer(ReplayBuffer):
+    """FIFO replay buffer which stores every frame of the stacked observations only once.
+
+    Consecutive observations of a frame stack share all but one of their frames, so instead of whole stacks the
+    buffer keeps single frames in a pool and each transition only holds the indices of its frames. The stacks are
+    reassembled when sampling. An observation which is the next_obs of the previously stored transition reuses its
+    frames, whereas any other observation, e.g. the first one of an episode or of a new task, has all of its frames
+    stored anew. The end of every episode has to be signalled with end_episode, since the observation arrays of the
+    environment may be reused across its resets. The frames are reference counted and returned to the pool once no transition refers to them.
+
+    Both the stacked [n_stack, h, w, c] and the channel-concatenated [h, w, n_stack * c] layouts are supported.
+    """
+
+    def __init__(self, obs_shape: Optional[Tuple[int, ...]], size: int, num_tasks: int, frame_channels: int = 3,
+                 **kwargs) -> None:
+        self.frame_channels = frame_channels
+        super().__init__(obs_shape, size, num_tasks, **kwargs)
+
+    def _init_observation_storage(self, obs_shape: Tuple[int, ...], size: int, obs_dtype: np.dtype) -> None:
+        self.stacked = len(obs_shape) == 4
+        if self.stacked:
+            self.n_stack, self.frame_shape = obs_shape[0], tuple(obs_shape[1:])
+        else:
+            self.n_stack = obs_shape[2] // self.frame_channels
+            self.frame_shape = tuple(obs_shape[:2]) + (self.frame_channels,)
+
+        # Apart from one frame per transition, each episode requires n_stack - 1 additional frames
+        capacity = size + size // 64 + 2 * self.n_stack
+        self.frame_buf = np.zeros([capacity, *self.frame_shape], dtype=obs_dtype)
+        self.frame_refs = np.zeros(capacity, dtype=np.int32)
+        self.free_frames = list(range(capacity - 1, -1, -1))
+        self.obs_idx_buf = np.zeros([size, self.n_stack], dtype=np.int32)
+        self.next_obs_idx_buf = np.zeros([size, self.n_stack], dtype=np.int32)
+        self.occupied = np.zeros(size, dtype=bool)
+        self._last_next_obs, self._last_next_idx = None, None
+
+    def _grow_frame_pool(self) -> None:
+        capacity = len(self.frame_buf)
+        extra = max(capacity // 16, 2 * self.n_stack)
+        self.frame_buf = np.concatenate([self.frame_buf, np.zeros([extra, *self.frame_shape], self.frame_buf.dtype)])
+        self.frame_refs = np.concatenate([self.frame_refs, np.zeros(extra, dtype=np.int32)])
+        self.free_frames.extend(range(capacity + extra - 1, capacity - 1, -1))
+
+    def _add_frame(self, frame: np.ndarray) -> int:
+        if not self.free_frames:
+            self._grow_frame_pool()
+        frame_idx = self.free_frames.pop()
+        self.frame_buf[frame_idx] = frame
+        return frame_idx
+
+    def _frame(self, obs: np.ndarray, i: int) -> np.ndarray:
+        if self.stacked:
+            return obs[i]  # Avoids materializing the whole stack of LazyFrames
+        i = i % self.n_stack
+        return np.asarray(obs)[..., i * self.frame_channels:(i + 1) * self.frame_channels]
+
+    def _release(self, idx: int) -> None:
+        frame_idxs = np.concatenate([self.obs_idx_buf[idx], self.next_obs_idx_buf[idx]])
+        np.subtract.at(self.frame_refs, frame_idxs, 1)
+        self.free_frames.extend(np.unique(frame_idxs[self.frame_refs[frame_idxs] == 0]).tolist())
+
+    def end_episode(self) -> None:
+        self._last_next_obs, self._last_next_idx = None, None
+
+    def _store_observations(self, idx: int, obs: np.ndarray, next_obs: np.ndarray) -> None:
+        if obs is self._last_next_obs:
+            obs_idx = self._last_next_idx
+        else:
+            obs_idx = np.array([self._add_frame(self._frame(obs, i)) for i in range(self.n_stack)], dtype=np.int32)
+        next_obs_idx = np.append(obs_idx[1:], np.int32(self._add_frame(self._frame(next_obs, -1))))
+
+        # Reference the new frames before releasing the old ones, as they might be shared
+        np.add.at(self.frame_refs, obs_idx, 1)
+        np.add.at(self.frame_refs, next_obs_idx, 1)
+        if self.occupied[idx]:
+            self._release(idx)
+        self.obs_idx_buf[idx] = obs_idx
+        self.next_obs_idx_buf[idx] = next_obs_idx
+        self.occupied[idx] = True
+        self._last_next_obs, self._last_next_idx = next_obs, next_obs_idx
+
+    def _stack(self, frames: np.ndarray) -> np.ndarray:
+        if self.stacked:
+            return frames
+        # [batch, n_stack, h, w, c] -> [batch, h, w, n_stack * c]
+        return np.moveaxis(frames, 1, 3).reshape(*frames.shape[:1], *frames.shape[2:4], -1)
+
+    def _sample_observations(self, idxs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return (self._stack(self.frame_buf[self.obs_idx_buf[idxs]]),
+                self._stack(self.frame_buf[self.next_obs_idx_buf[idxs]]))
+
+
+class FrameReservoirReplayBuffer(FrameReplayBuffer, ReservoirReplayBuffer):
+    """Reservoir sampling buffer which stores every frame only once."""
+
+
+class FramePrioritizedExperienceReplay(FrameReplayBuffer, PrioritizedExperienceReplay):
+    """Prioritized Experience Replay which stores every frame only once."""
+
+
+class FramePrioritizedReplayBuffer(FrameReplayBuffer, PrioritizedReplayBuffer):
+    """Proportional prioritized replay which stores every frame only once."""
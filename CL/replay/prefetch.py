@@ -0,0 +1,72 @@
+import queue
+import threading
+from typing import Any, Callable, Iterator
+
+
+class _Failure:
+    """Carries an exception raised in the sampling thread over to the consumer."""
+
+    def __init__(self, exception: BaseException) -> None:
+        self.exception = exception
+
+
+class BatchPrefetcher:
+    """Prepares the training batches in a background thread while the gradient steps are running.
+
+    The batches of an update phase are sampled into a bounded queue, which holds at most `depth` batches ahead of
+    the consumer. The sampling, i.e. the fancy indexing of the buffers and the conversion to tensors, thus overlaps
+    with the execution of the previous gradient step. A depth of 0 samples the batches synchronously instead.
+
+    Any modification of the replay buffer while a phase is in progress, such as the priority updates or the storing of
+    transitions by a concurrent collector, has to be performed while holding the `lock`. With a prioritized buffer the
+    prefetched batches are therefore sampled with priorities that are up to `depth` updates old.
+    """
+
+    def __init__(self, depth: int = 0) -> None:
+        self.depth = depth
+        self.lock = threading.Lock()
+
+    def prefetch(self, sample_fn: Callable[[], Any], num_batches: int) -> Iterator[Any]:
+        """Yields the results of calling sample_fn num_batches times.
+
+        Exceptions raised by sample_fn are re-raised in the consuming thread.
+        """
+        if self.depth <= 0:
+            for _ in range(num_batches):
+                with self.lock:
+                    batch = sample_fn()
+                yield batch
+            return
+
+        batches = queue.Queue(maxsize=self.depth)
+        stop = threading.Event()
+
+        def produce():
+            for _ in range(num_batches):
+                if stop.is_set():
+                    return
+                try:
+                    with self.lock:
+                        batch = sample_fn()
+                except BaseException as e:
+                    batches.put(_Failure(e))
+                    return
+                batches.put(batch)
+
+        thread = threading.Thread(target=produce, name='BatchPrefetcher', daemon=True)
+        thread.start()
+        try:
+            for _ in range(num_batches):
+                batch = batches.get()
+                if isinstance(batch, _Failure):
+                    raise batch.exception
+                yield batch
+        finally:
+            # Unblock the producer if the consumer stops early
+            stop.set()
+            while thread.is_alive():
+                try:
+                    batches.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            thread.join()
@@ -0,0 +1,92 @@
+from typing import Callable, Dict, Tuple
+
+import tensorflow as tf
+
+
+def _to_frames(obs: tf.Tensor, stacked: bool, frame_channels: int) -> tf.Tensor:
+    """Brings a batch of stacked [b, n_stack, h, w, c] or concatenated [b, h, w, n_stack * c] observations to the
+    stacked layout, so that the frames of an observation can share the parameters of its augmentation."""
+    if stacked:
+        return obs
+    height, width = tf.shape(obs)[1], tf.shape(obs)[2]
+    frames = tf.reshape(obs, [-1, height, width, obs.shape[-1] // frame_channels, frame_channels])
+    return tf.transpose(frames, [0, 3, 1, 2, 4])
+
+
+def _from_frames(frames: tf.Tensor, stacked: bool) -> tf.Tensor:
+    if stacked:
+        return frames
+    frames = tf.transpose(frames, [0, 2, 3, 1, 4])
+    shape = tf.shape(frames)
+    return tf.reshape(frames, [shape[0], shape[1], shape[2], frames.shape[3] * frames.shape[4]])
+
+
+def random_conv(frames: tf.Tensor, prob: float = 0.5) -> tf.Tensor:
+    """Convolves every sample with its own random 3x3 kernel, as in https://arxiv.org/abs/1910.05396
+
+    The kernels are drawn with the Glorot normal scale, which roughly preserves the variance of the normalized input.
+    Every sample is convolved with probability prob and left untouched otherwise.
+    """
+    batch_size, channels = tf.shape(frames)[0], frames.shape[-1]
+    fan_in = 9 * channels
+    kernels = tf.random.normal([batch_size, fan_in, channels], stddev=tf.sqrt(2. / (fan_in + channels)))
+    padded = tf.pad(frames, [[0, 0], [0, 0], [1, 1], [1, 1], [0, 0]], mode='SYMMETRIC')
+    n_stack, height, width = tf.shape(padded)[1], tf.shape(padded)[2], tf.shape(padded)[3]
+    # Patches of all the frames are extracted at once, the kernel of a sample is then shared by its frames
+    patches = tf.image.extract_patches(tf.reshape(padded, [-1, height, width, channels]), sizes=[1, 3, 3, 1],
+                                       strides=[1, 1, 1, 1], rates=[1, 1, 1, 1], padding='VALID')
+    patches = tf.reshape(patches, [batch_size, n_stack, height - 2, width - 2, fan_in])
+    convolved = tf.einsum('bshwk,bkc->bshwc', patches, kernels)
+    mask = tf.random.uniform([batch_size, 1, 1, 1, 1]) < prob
+    return tf.where(mask, convolved, frames)
+
+
+def random_shift(frames: tf.Tensor, pad: int = 4) -> tf.Tensor:
+    """Shifts every sample by its own random offset of up to pad pixels, padding the borders symmetrically."""
+    batch_size, height, width = tf.shape(frames)[0], tf.shape(frames)[2], tf.shape(frames)[3]
+    padded = tf.pad(frames, [[0, 0], [0, 0], [pad, pad], [pad, pad], [0, 0]], mode='SYMMETRIC')
+    offsets = tf.random.uniform([batch_size, 2], maxval=2 * pad + 1, dtype=tf.int32)
+    rows = offsets[:, :1] + tf.range(height)[tf.newaxis]
+    cols = offsets[:, 1:] + tf.range(width)[tf.newaxis]
+    shifted = tf.gather(padded, rows, axis=2, batch_dims=1)
+    return tf.gather(shifted, cols, axis=3, batch_dims=1)
+
+
+def random_noise(frames: tf.Tensor, std: float = 0.1) -> tf.Tensor:
+    """Adds Gaussian noise to every sample, with its own standard deviation drawn uniformly from [0, std]."""
+    scale = tf.random.uniform([tf.shape(frames)[0], 1, 1, 1, 1], maxval=std)
+    return frames + scale * tf.random.normal(tf.shape(frames))
+
+
+BATCH_AUGMENTATIONS: Dict[str, Callable[[tf.Tensor], tf.Tensor]] = {
+    'conv': random_conv,
+    'shift': random_shift,
+    'noise': random_noise,
+}
+
+
+class BatchAugmenter:
+    """Learner-side counterpart of the Augment wrapper.
+
+    Augments whole sampled batches inside the training graph instead of every frame in the environment loop. The
+    parameters of the augmentation are drawn per sample and shared by the stacked frames of an observation. The
+    observations and the next observations of the transitions are augmented independently, as in DrQ.
+
+    Args:
+        augmentation (str): The kind of augmentation, one of BATCH_AUGMENTATIONS.
+        obs_shape (Tuple[int, ...]): The shape of a single observation, either stacked or channel-concatenated.
+        frame_channels (int): Number of channels of a frame in the channel-concatenated layout.
+    """
+
+    def __init__(self, augmentation: str, obs_shape: Tuple[int, ...], frame_channels: int = 3):
+        assert augmentation in BATCH_AUGMENTATIONS, f"Unknown batch augmentation: {augmentation}"
+        self.augmentation = BATCH_AUGMENTATIONS[augmentation]
+        self.stacked = len(obs_shape) == 4
+        self.frame_channels = frame_channels
+
+    def augment(self, obs: tf.Tensor) -> tf.Tensor:
+        frames = _to_frames(tf.cast(obs, tf.float32), self.stacked, self.frame_channels)
+        return _from_frames(self.augmentation(frames), self.stacked)
+
+    def __call__(self, batch: Dict[str, tf.Tensor]) -> Dict[str, tf.Tensor]:
+        return dict(batch, obs=self.augment(batch['obs']), next_obs=self.augment(batch['next_obs']))
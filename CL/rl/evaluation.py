@@ -0,0 +1,284 @@
+import multiprocessing as mp
+import traceback
+from functools import partial
+from typing import Any, Callable, Dict, List, Sequence, Type
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.python.framework import dtypes
+from tensorflow_probability.python.distributions import Categorical
+
+from CL.rl import models
+from CL.utils.normalization import ObservationNormalizer
+from CL.utils.running import create_one_hot_vec
+from COOM.env.vector import VectorDoomEnv
+
+
+def make_actor(actor_cl: Type[tf.keras.Model], policy_kwargs: Dict[str, Any], shared_encoder: bool) -> tf.keras.Model:
+    """Creates an actor with the same architecture, and hence the same weight layout, as the one of the agent."""
+    encoder = models.ConvEncoder(policy_kwargs["state_space"], policy_kwargs.get("use_lstm", False)) \
+        if shared_encoder else None
+    return actor_cl(**dict(policy_kwargs, encoder=encoder))
+
+
+def _evaluation_worker(pipe, parent_pipe, actor_fn: Callable[[], tf.keras.Model], env_fns: List[Callable[..., Any]],
+                       num_episodes: int, seed: int, compact_replay: bool, frame_channels: int) -> None:
+    """
+    Plays the test episodes with the received snapshots of the actor weights and sends back their results.
+    The observation normalization statistics of the test environments are kept by the worker.
+    """
+    parent_pipe.close()
+    envs = []
+    try:
+        tf.random.set_seed(seed)
+        np.random.seed(seed)
+        actor = actor_fn()
+        envs = [env_fn() for env_fn in env_fns]
+        normalizers = {}
+
+        @tf.function
+        def get_action(obs: tf.Tensor, one_hot_task_id: tf.Tensor, deterministic: tf.Tensor) -> tf.Tensor:
+            logits = actor(tf.expand_dims(obs, 0), tf.expand_dims(one_hot_task_id, 0))
+            dist = Categorical(logits=logits)
+            return tf.math.argmax(logits, axis=-1, output_type=dtypes.int32) if deterministic else dist.sample()
+
+        def preprocess(obs: np.ndarray, seq_idx: int) -> np.ndarray:
+            if not compact_replay:
+                return obs
+            if seq_idx not in normalizers:
+                normalizers[seq_idx] = ObservationNormalizer(obs.shape, frame_channels)
+            normalizers[seq_idx].update(obs)
+            return normalizers[seq_idx].normalize(obs)
+
+        while True:
+            command, data = pipe.recv()
+            if command == 'evaluate':
+                weights, deterministic, statistics_prefixes = data
+                results = {}
+                for seq_idx, env in enumerate(envs):
+                    actor.set_weights(weights[seq_idx])
+                    one_hot_vec = tf.convert_to_tensor(create_one_hot_vec(env.num_tasks, env.task_id),
+                                                       dtype=tf.float32)
+                    results[seq_idx] = []
+                    for _ in range(num_episodes):
+                        obs, _ = env.reset()
+                        done, episode_return, episode_len = False, 0, 0
+                        action_counts = np.zeros(env.action_space.n, dtype=np.int64)
+                        while not done:
+                            obs = preprocess(obs, seq_idx)
+                            action = get_action(tf.convert_to_tensor(obs), one_hot_vec,
+                                                tf.constant(deterministic)).numpy()[0]
+                            obs, reward, done, truncated, _ = env.step(action)
+                            done = done or truncated
+                            episode_return += reward
+                            episode_len += 1
+                            action_counts[action] += 1
+                        results[seq_idx].append({
+                            'return': float(episode_return),
+                            'ep_length': episode_len,
+                            'action_counts': action_counts,
+                            'statistics': env.get_statistics(statistics_prefixes[seq_idx]),
+                        })
+                pipe.send(('ok', results))
+            elif command == 'close':
+                pipe.send(('ok', None))
+                break
+            else:
+                raise RuntimeError(f'Unknown command {command} received by the evaluation worker')
+    except KeyboardInterrupt:
+        pass
+    except Exception:
+        pipe.send(('error', traceback.format_exc()))
+    finally:
+        for env in envs:
+            env.close()
+        pipe.close()
+
+
+class EnvMetadata:
+    """Lightweight stand-in for a test environment, which holds the properties used to log its evaluation.
+
+    Used when the test episodes are played in worker processes, so that the main process does not keep a game of every
+    test environment alive. The environment is created once to read the properties and is closed right away.
+
+    Args:
+        env_fn (Callable): Function creating the test environment.
+    """
+
+    def __init__(self, env_fn: Callable[..., Any]):
+        env = env_fn()
+        try:
+            env.reset()
+            self.name = env.name
+            self.num_tasks = env.num_tasks
+            self.task_id = env.task_id
+            self.action_space = env.action_space
+            # The statistics are keyed by the mode followed by their name
+            self.statistics_names = list(env.get_statistics().keys())
+        finally:
+            env.close()
+
+    def get_statistics(self, mode: str = '') -> Dict[str, float]:
+        """Returns the keys of the statistics of the environment for the given mode, with placeholder values."""
+        return {mode + name: 0.0 for name in self.statistics_names}
+
+
+class ParallelEvaluator:
+    """Runs the test episodes of several environments concurrently in worker processes.
+
+    Every test episode gets its own worker, so all the episodes of all the test environments can be played at the same
+    time. The observations of the running episodes are batched, so the policy is queried once per step for all of them.
+    The workers are kept alive between the evaluations. The i-th episode of every test environment is played with the
+    seed `seed + i`.
+
+    Args:
+        env_fns (List[Callable]): Picklable functions creating the test environments, accepting a seed keyword.
+        num_episodes (int): Number of episodes to play in each test environment.
+        num_actions (int): Size of the discrete action space.
+        seed (int): Seed of the first episode of every test environment.
+        obs_dtype (np.dtype): Data type of the observations returned by the environments.
+    """
+
+    def __init__(self, env_fns: List[Callable[..., Any]], num_episodes: int, num_actions: int, seed: int = 0,
+                 obs_dtype: np.dtype = np.float32):
+        self.num_envs = len(env_fns)
+        self.num_episodes = num_episodes
+        self.num_actions = num_actions
+        slot_fns = [partial(env_fn, seed=seed + episode) for env_fn in env_fns for episode in range(num_episodes)]
+        self.slot_env_idx = np.repeat(np.arange(self.num_envs), num_episodes)
+        self.vector_env = VectorDoomEnv(slot_fns, obs_dtype=obs_dtype, autoreset=False, statistics_mode=None)
+
+    def run(self,
+            env_indices: Sequence[int],
+            policy: Callable[[np.ndarray, np.ndarray], np.ndarray],
+            preprocess: Callable[[np.ndarray, int], np.ndarray],
+            statistics_prefixes: Dict[int, str]) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Plays the test episodes of the given environments until all of them are finished.
+
+        Args:
+            env_indices (Sequence[int]): Indices of the test environments to evaluate.
+            policy (Callable): Maps a batch of preprocessed observations and the indices of the test environments they
+                come from to an array of actions. The batch always contains all the episodes of env_indices, as the
+                finished episodes keep their last observation, so the batch size does not change within a run.
+            preprocess (Callable): Converts an observation of the given test environment to the input of the policy.
+            statistics_prefixes (Dict[int, str]): Mode used to collect the episode statistics of each environment.
+
+        Returns:
+            Dict[int, List[Dict[str, Any]]]: For each test environment, the return, length, action counts and
+                statistics of its episodes.
+        """
+        slots = [slot for slot in range(len(self.slot_env_idx)) if self.slot_env_idx[slot] in env_indices]
+        env_idx = self.slot_env_idx[slots]
+        raw_obs, _ = self.vector_env.reset(slots)
+        obs = np.stack([preprocess(raw_obs[i], env_idx[i]) for i in range(len(slots))])
+        returns = np.zeros(len(slots))
+        lengths = np.zeros(len(slots), dtype=np.int64)
+        action_counts = np.zeros((len(slots), self.num_actions), dtype=np.int64)
+        statistics = [None] * len(slots)
+
+        active = np.ones(len(slots), dtype=bool)
+        while active.any():
+            positions = np.flatnonzero(active)
+            actions = np.asarray(policy(obs, env_idx))[positions]
+            raw_obs, rewards, dones, truncated, _ = self.vector_env.step(actions, [slots[i] for i in positions])
+            for j, i in enumerate(positions):
+                returns[i] += rewards[j]
+                lengths[i] += 1
+                action_counts[i, actions[j]] += 1
+                if dones[j] or truncated[j]:
+                    active[i] = False
+                    prefix = statistics_prefixes[env_idx[i]]
+                    statistics[i] = self.vector_env.call('get_statistics', prefix, indices=[slots[i]])[0]
+                else:
+                    obs[i] = preprocess(raw_obs[j], env_idx[i])
+
+        results = {idx: [] for idx in env_indices}
+        for i in range(len(slots)):
+            results[env_idx[i]].append({
+                'return': float(returns[i]),
+                'ep_length': int(lengths[i]),
+                'action_counts': action_counts[i],
+                'statistics': statistics[i],
+            })
+        return results
+
+    def close(self) -> None:
+        self.vector_env.close()
+
+
+class BackgroundEvaluator:
+    """Evaluates snapshots of the actor weights in a separate process, while the training continues.
+
+    The worker process owns its own copy of the actor and of the test environments. A snapshot holds the weights to
+    test each of the environments with, so methods which alter the networks for the evaluated task, like PackNet, can
+    provide a different view per environment. Only one snapshot can be evaluated at a time.
+
+    Args:
+        actor_fn (Callable): Picklable function creating an actor with the same weight layout as the agent's.
+        env_fns (List[Callable]): Picklable functions creating the test environments.
+        num_episodes (int): Number of episodes to play in each test environment.
+        seed (int): Seed of the random operations of the worker.
+        compact_replay (bool): Whether the environments return raw frames, which the worker has to normalize.
+        frame_channels (int): Number of channels of a single frame of the observations.
+        context (str): The multiprocessing start method. Defaults to spawn, as in VectorDoomEnv.
+    """
+
+    def __init__(self, actor_fn: Callable[[], tf.keras.Model], env_fns: List[Callable[..., Any]], num_episodes: int,
+                 seed: int = 0, compact_replay: bool = False, frame_channels: int = 3, context: str = 'spawn'):
+        ctx = mp.get_context(context)
+        self.pipe, child_pipe = ctx.Pipe()
+        self.process = ctx.Process(target=_evaluation_worker, name='BackgroundEvaluator', daemon=True,
+                                   args=(child_pipe, self.pipe, actor_fn, env_fns, num_episodes, seed, compact_replay,
+                                         frame_channels))
+        self.process.start()
+        child_pipe.close()
+        self.pending = False
+        self.closed = False
+
+    def submit(self, weights: List[List[np.ndarray]], deterministic: bool, statistics_prefixes: Dict[int, str]) -> None:
+        """
+        Starts the evaluation of a snapshot.
+
+        Args:
+            weights (List[List[np.ndarray]]): The actor weights to test each of the environments with.
+            deterministic (bool): Whether to act greedily instead of sampling the actions.
+            statistics_prefixes (Dict[int, str]): Mode used to collect the episode statistics of each environment.
+        """
+        assert not self.pending, 'The previous snapshot has to be collected first'
+        self.pipe.send(('evaluate', (weights, deterministic, statistics_prefixes)))
+        self.pending = True
+
+    def result(self) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Waits for the evaluation of the submitted snapshot to finish.
+
+        Returns:
+            Dict[int, List[Dict[str, Any]]]: For each test environment, the return, length, action counts and
+                statistics of its episodes, as returned by ParallelEvaluator.run.
+        """
+        assert self.pending, 'No snapshot has been submitted'
+        status, result = self.pipe.recv()
+        self.pending = False
+        if status == 'error':
+            self.close(terminate=True)
+            raise RuntimeError(f'Evaluation worker:\n{result}')
+        return result
+
+    def close(self, terminate: bool = False) -> None:
+        """Shuts down the worker process once the evaluation in progress, if any, is finished."""
+        if self.closed:
+            return
+        self.closed = True
+        if not terminate:
+            try:
+                if self.pending:
+                    self.pipe.recv()
+                self.pipe.send(('close', None))
+                self.pipe.recv()
+            except (BrokenPipeError, EOFError):
+                pass
+        else:
+            self.process.terminate()
+        self.process.join()
+        self.pipe.close()
@@ -1,4 +1,4 @@
-from typing import Callable, Iterable, List, Tuple
+from typing import Callable, Iterable, List, Optional, Tuple
 
 import gymnasium
 import tensorflow as tf
@@ -9,10 +9,10 @@ from keras.layers import LayerNormalization, TimeDistributed
 
 
 def mlp(state_shape: Tuple[int], num_tasks: int, hidden_sizes: Iterable[int], activation: Callable,
-        use_layer_norm: bool = False, use_lstm: bool = False, hide_task_id: bool = False) -> Model:
+        use_layer_norm: bool = False, use_lstm: bool = False, hide_task_id: bool = False,
+        feature_dim: Optional[int] = None) -> Model:
     task_input = Input(shape=num_tasks, name='task_input', dtype=tf.float32)
-    conv_in = Input(shape=state_shape, name='conv_head_in')
-    conv_head = build_conv_head(conv_in, use_lstm)
+    conv_in, conv_head = build_input_head(state_shape, use_lstm, feature_dim)
 
     model = conv_head if hide_task_id else Concatenate()([conv_head, task_input])
     model = Dense(hidden_sizes[0])(model)
@@ -28,6 +28,16 @@ def mlp(state_shape: Tuple[int], num_tasks: int, hidden_sizes: Iterable[int], ac
     return model
 
 
+def build_input_head(state_shape: Tuple[int], use_lstm: bool, feature_dim: Optional[int] = None):
+    """Returns the input layer and its encoding. If feature_dim is given, the model receives the features of a
+    shared encoder instead of the observations."""
+    if feature_dim is not None:
+        features_in = Input(shape=feature_dim, name='features_in')
+        return features_in, features_in
+    conv_in = Input(shape=state_shape, name='conv_head_in')
+    return conv_in, build_conv_head(conv_in, use_lstm)
+
+
 def build_conv_head(conv_head, use_lstm):
     for filters, kernel, stride in zip((32, 64, 64), (8, 4, 3), (4, 2, 1)):
         conv_layer = Conv2D(filters, kernel, stride, activation="relu")
@@ -40,6 +50,28 @@ def build_conv_head(conv_head, use_lstm):
     return conv_head
 
 
+class ConvEncoder(Model):
+    """Convolutional encoder, which can be shared by the actor and the critics instead of each of them having their
+    own. The actor does not propagate its gradients into the shared encoder, which is thus trained by the critics."""
+
+    def __init__(self, state_space: gymnasium.spaces.Box, use_lstm: bool = False) -> None:
+        super(ConvEncoder, self).__init__()
+        conv_in = Input(shape=state_space.shape, name='conv_head_in')
+        self.net = Model(inputs=conv_in, outputs=build_conv_head(conv_in, use_lstm))
+        self.output_dim = self.net.output_shape[-1]
+
+    def call(self, obs: tf.Tensor) -> tf.Tensor:
+        return self.net(obs)
+
+
+def encode(encoder: Optional[ConvEncoder], obs: tf.Tensor, features: Optional[tf.Tensor] = None) -> tf.Tensor:
+    """Returns the input of a model core: the observations, or their features if the model uses a shared encoder.
+    Precomputed features can be passed in order to run the encoder only once for several models."""
+    if encoder is None:
+        return obs
+    return encoder(obs) if features is None else features
+
+
 def _choose_head(out: tf.Tensor, num_heads: int, one_hot_task_id: tf.Tensor) -> tf.Tensor:
     """For multi-head output, choose appropriate head.
 
@@ -70,13 +102,17 @@ class MlpActor(Model):
             use_lstm: bool = False,
             num_heads: int = 1,
             hide_task_id: bool = False,
+            encoder: Optional[ConvEncoder] = None,
     ) -> None:
         super(MlpActor, self).__init__()
         self.num_heads = num_heads
         # if True, one-hot encoding of the task will not be appended to observation.
         self.hide_task_id = hide_task_id
+        self.encoder = encoder
 
-        self.core = mlp(state_space.shape, num_tasks, hidden_sizes, activation, use_layer_norm, use_lstm, hide_task_id)
+        feature_dim = None if encoder is None else encoder.output_dim
+        self.core = mlp(state_space.shape, num_tasks, hidden_sizes, activation, use_layer_norm, use_lstm, hide_task_id,
+                        feature_dim)
         self.head_mu = Sequential(
             [
                 InputLayer(input_shape=(hidden_sizes[-1],)),
@@ -85,8 +121,11 @@ class MlpActor(Model):
         )
         self.action_space = action_space
 
-    def call(self, obs: tf.Tensor, one_hot_task_id: tf.Tensor) -> tf.Tensor:
-        logits = self.core(obs) if self.hide_task_id else self.core([obs, one_hot_task_id])
+    def call(self, obs: tf.Tensor, one_hot_task_id: tf.Tensor, features: Optional[tf.Tensor] = None) -> tf.Tensor:
+        inputs = encode(self.encoder, obs, features)
+        if self.encoder is not None:
+            inputs = tf.stop_gradient(inputs)
+        logits = self.core(inputs) if self.hide_task_id else self.core([inputs, one_hot_task_id])
         mu = self.head_mu(logits)
 
         if self.num_heads > 1:
@@ -116,20 +155,25 @@ class MlpCritic(Model):
             use_lstm: bool = False,
             num_heads: int = 1,
             hide_task_id: bool = False,
+            encoder: Optional[ConvEncoder] = None,
     ) -> None:
         super(MlpCritic, self).__init__()
         self.hide_task_id = hide_task_id
         self.num_heads = (
             num_heads  # if True, one-hot encoding of the task will not be appended to observation.
         )
+        self.encoder = encoder
 
-        self.core = mlp(state_space.shape, num_tasks, hidden_sizes, activation, use_layer_norm, use_lstm, hide_task_id)
+        feature_dim = None if encoder is None else encoder.output_dim
+        self.core = mlp(state_space.shape, num_tasks, hidden_sizes, activation, use_layer_norm, use_lstm, hide_task_id,
+                        feature_dim)
         self.head = Sequential(
             [InputLayer(input_shape=(hidden_sizes[-1],)), Dense(num_heads * action_space.n)]
         )
 
-    def call(self, obs: tf.Tensor, one_hot_task_id: tf.Tensor) -> tf.Tensor:
-        logits = self.core(obs) if self.hide_task_id else self.core([obs, one_hot_task_id])
+    def call(self, obs: tf.Tensor, one_hot_task_id: tf.Tensor, features: Optional[tf.Tensor] = None) -> tf.Tensor:
+        inputs = encode(self.encoder, obs, features)
+        logits = self.core(inputs) if self.hide_task_id else self.core([inputs, one_hot_task_id])
         value = self.head(logits)
         if self.num_heads > 1:
             value = _choose_head(value, self.num_heads, one_hot_task_id)
@@ -138,8 +182,10 @@ class MlpCritic(Model):
     @property
     def common_variables(self) -> List[tf.Variable]:
         """Get model parameters which are shared for each task. This excludes head parameters
-        in the multi-head setting, as they are separate for each task."""
+        in the multi-head setting, as they are separate for each task. The shared encoder is trained by the critics,
+        hence its parameters are included."""
+        encoder_variables = [] if self.encoder is None else self.encoder.trainable_variables
         if self.num_heads > 1:
-            return self.core.trainable_variables
+            return encoder_variables + self.core.trainable_variables
         elif self.num_heads == 1:
-            return self.core.trainable_variables + self.head.trainable_variables
+            return encoder_variables + self.core.trainable_variables + self.head.trainable_variables
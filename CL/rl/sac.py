@@ -1,8 +1,12 @@
 import math
 import os
+import queue
+import threading
 import time
+from contextlib import contextmanager
+from functools import partial
 from pathlib import Path
-from typing import Callable, Dict, List, Optional, Tuple, Union
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
 
 import numpy as np
 import tensorflow as tf
@@ -12,15 +16,33 @@ from tensorflow.python.framework import dtypes
 from tensorflow_probability.python.distributions import Categorical
 
 from CL.rl import models
+from CL.rl.evaluation import BackgroundEvaluator, ParallelEvaluator, make_actor
 from CL.rl.exploration import ExplorationHelper
 from CL.replay.buffers import ReplayBuffer, ReservoirReplayBuffer, PrioritizedReplayBuffer, BufferType, \
-    PrioritizedExperienceReplay
+    PrioritizedExperienceReplay, FrameReplayBuffer, FrameReservoirReplayBuffer, FramePrioritizedExperienceReplay, \
+    FramePrioritizedReplayBuffer, TensorReplayMirror
+from CL.replay.prefetch import BatchPrefetcher
+from CL.rl.augmentations import BatchAugmenter
 from CL.utils.logging import EpochLogger
-from CL.utils.running import reset_optimizer, reset_weights, set_seed, create_one_hot_vec
+from CL.utils.normalization import ObservationNormalizer
+from CL.utils.profiling import PhaseProfiler
+from CL.utils.running import reset_optimizer, reset_weights, set_seed, create_one_hot_vec, unique_variables
 from COOM.env.base import BaseEnv
+from COOM.env.registry import EnvRegistry
 
 
 class SAC:
+    # Whether on_test_start has to be called for a single test environment at a time, since it alters the networks
+    test_view_per_task = False
+    # The metrics of the gradient steps which are logged after every epoch, by the keys they are stored under
+    update_log_keys = {
+        "kl_loss": "train/loss_kl",
+        "pi_loss": "train/loss_pi",
+        "q1_loss": "train/loss_q1",
+        "q2_loss": "train/loss_q2",
+        "reg_loss": "train/loss_reg",
+    }
+
     def __init__(
             self,
             env: BaseEnv,
@@ -51,9 +73,21 @@ class SAC:
             update_every: int = 1000,
             n_updates: int = 50,
             num_test_eps: int = 3,
+            test_env_fns: Optional[List[Callable[..., BaseEnv]]] = None,
+            parallel_test: bool = False,
+            background_test: bool = False,
+            env_registry: Optional[EnvRegistry] = None,
             save_freq_epochs: int = 25,
             reset_buffer_on_task_change: bool = True,
             buffer_type: BufferType = BufferType.FIFO,
+            compact_replay: bool = False,
+            deduplicate_frames: bool = False,
+            prefetch_batches: int = 0,
+            batch_augmentation: Optional[str] = None,
+            frame_channels: int = 3,
+            in_graph_updates: bool = False,
+            shared_encoder: bool = False,
+            async_updates: bool = False,
             reset_optimizer_on_task_change: bool = False,
             reset_actor_on_task_change: bool = False,
             reset_critic_on_task_change: bool = False,
@@ -64,6 +98,7 @@ class SAC:
             model_path: str = None,
             timestamp: str = None,
             exploration_kind: str = None,
+            profile_epochs: Optional[List[int]] = None,
     ):
         """A class for SAC training, for single task or continual learning
         After the instance is created, use run() function to actually run the training.
@@ -98,11 +133,41 @@ class SAC:
           update_every: Number of env interactions that should elapse between gradient descent updates.
           n_updates: Number of consecutive policy gradient descent updates to perform.
           num_test_eps: Number of episodes to test the stochastic policy in each evaluation.
+          test_env_fns: Picklable functions creating the test_envs, accepting a seed keyword. Required by
+            parallel_test and background_test, in which case the test_envs are only used for their metadata and are
+            not rendered.
+          parallel_test: If True, all the test episodes are played concurrently in worker processes and the policy
+            is queried for all of them in a single batch.
+          background_test: If True, the tests during training are run in a separate process on a snapshot of the actor
+            weights, while the training continues. The results are logged one epoch later, except in the first and
+            the last epoch, which wait for the evaluation of their own snapshot.
+          env_registry: Optional pool of environments shared with the training environment. If provided, the test
+            episodes are played on instances leased from it with the test_env_fns, forking a separate instance of
+            the active training task, so the test_envs are only used for their metadata.
           save_freq_epochs: How often, in epochs, to save the current policy and value function.
             (Epoch is defined as time between two subsequent evaluations, lasting log_every steps)
           reset_buffer_on_task_change: If True, replay buffer will be cleared after every task
             change (in continual learning).
           buffer_type: Type of the replay buffer. Either 'fifo' for regular FIFO buffer or 'reservoir' for reservoir sampling.
+          compact_replay: If True, the environments are expected to return raw uint8 frames, which are stored as such
+            in the replay buffer. The rescaling and normalization is then performed by the agent, when the
+            observations are fed to the networks.
+          deduplicate_frames: If True, the replay buffer stores every frame of the stacked observations only once.
+          prefetch_batches: Number of batches to sample ahead in a background thread during the policy updates.
+            If 0, the batches are sampled synchronously.
+          batch_augmentation: Kind of augmentation applied to the observations of the sampled batches inside the
+            training graph, with random parameters per sample. Either 'conv', 'shift', 'noise' or None.
+          frame_channels: Number of channels of a single frame of the observations, i.e. 1 for grayscale and 3 for
+            RGB frames. Used to split the channel-concatenated frames for the deduplication, the normalization and
+            the augmentation of the observations.
+          in_graph_updates: If True, all n_updates gradient steps of an update phase are run in a single compiled
+            graph, which samples the batches from a device-resident copy of the replay buffer. Only supported with
+            a FIFO buffer and without episodic memory. The copy doubles the memory used by the replay buffer.
+          shared_encoder: If True, the actor and the critics share a single convolutional encoder, which is trained
+            by the critics, and the target critics share its Polyak-averaged copy.
+          async_updates: If True, the updates are performed by a learner thread while the experience is collected.
+            The learner publishes the actor weights to an acting copy of the actor after every update phase. It runs
+            the same n_updates per update_every steps, and may lag behind the collection by at most one phase.
           reset_optimizer_on_task_change: If True, optimizer will be reset after every task change (in continual learning).
           reset_actor_on_task_change: If True, actor weights are randomly re-initialized after each task change.
           reset_critic_on_task_change: If True, critic weights are randomly re-initialized after each task change.
@@ -112,6 +177,8 @@ class SAC:
           agent_policy_exploration: If True, uniform exploration for start_steps steps is used only
             in the first task (in continual learning). Otherwise, it is used in every task.
           exploration_kind: Kind of exploration to use at the beginning of a new task.
+          profile_epochs: Epochs to capture a TensorFlow profiler trace of, which is stored with the TensorBoard logs.
+            The time spent in each phase of the training loop is logged in every epoch regardless.
           upload_weights: Whether to send weight to neptune after each task.
         """
         set_seed(seed, env=env)
@@ -143,9 +210,26 @@ class SAC:
         self.update_every = update_every
         self.n_updates = n_updates
         self.num_test_eps = num_test_eps
+        self.test_env_fns = test_env_fns
+        self.parallel_test = parallel_test
+        self.background_test = background_test
+        self.parallel_evaluator = None
+        self.background_evaluator = None
+        self.env_registry = env_registry
+        if (parallel_test or background_test or env_registry is not None) and test_env_fns is None:
+            raise ValueError("Parallel, background and pooled testing require the functions creating the test "
+                             "environments")
         self.save_freq_epochs = save_freq_epochs
         self.reset_buffer_on_task_change = reset_buffer_on_task_change
         self.buffer_type = buffer_type
+        self.compact_replay = compact_replay
+        self.deduplicate_frames = deduplicate_frames
+        self.batch_prefetcher = BatchPrefetcher(prefetch_batches)
+        self.profiler = PhaseProfiler(profile_epochs, logger.output_dir)
+        self.frame_channels = frame_channels
+        self.batch_augmenter = BatchAugmenter(batch_augmentation, env.observation_space.shape, frame_channels) \
+            if batch_augmentation else None
+        self.in_graph_updates = in_graph_updates
         self.reset_optimizer_on_task_change = reset_optimizer_on_task_change
         self.reset_actor_on_task_change = reset_actor_on_task_change
         self.reset_critic_on_task_change = reset_critic_on_task_change
@@ -154,7 +238,7 @@ class SAC:
         self.experiment_dir = experiment_dir
         self.model_path = model_path
         self.timestamp = timestamp
-        self.test_threads = []
+        self.seed = seed
         self.obs_shape = env.observation_space.shape
         self.act_dim = env.action_space.n
         self.max_episode_len = env.get_active_env().game.get_episode_timeout()
@@ -166,24 +250,13 @@ class SAC:
         policy_kwargs["action_space"] = env.action_space
         policy_kwargs["num_tasks"] = env.num_tasks
 
+        # Observation normalization statistics are kept per environment, as the NormalizeObservation wrapper would
+        self.obs_normalizers = {}
+        self.replay_normalizer = self.get_obs_normalizer(f'train/{start_from_task}') if compact_replay else None
+
         # Create experience buffer
-        if buffer_type == BufferType.FIFO:
-            self.replay_buffer = ReplayBuffer(
-                obs_shape=self.obs_shape, size=replay_size, num_tasks=self.num_tasks
-            )
-        elif buffer_type == BufferType.RESERVOIR:
-            self.replay_buffer = ReservoirReplayBuffer(
-                obs_shape=self.obs_shape, size=replay_size, num_tasks=self.num_tasks
-            )
-        elif buffer_type == BufferType.PRIORITY:
-            self.replay_buffer = PrioritizedReplayBuffer(
-                obs_shape=self.obs_shape, size=replay_size, num_tasks=self.num_tasks
-            )
-        elif buffer_type == BufferType.PER:
-            self.replay_buffer = PrioritizedExperienceReplay(
-                obs_shape=self.obs_shape, size=self.replay_size, num_tasks=self.num_tasks)
-        else:
-            raise ValueError(f"Unknown buffer type: {buffer_type}")
+        self.replay_buffer = self._create_replay_buffer()
+        self.replay_mirror = self._create_replay_mirror() if in_graph_updates else None
 
         # Exploration
         self.exploration_kind = exploration_kind
@@ -191,25 +264,41 @@ class SAC:
         self.exploration_actor = None
 
         # Create actor and critic networks
-        self.actor = actor_cl(**policy_kwargs)
-
-        self.critic1 = critic_cl(**policy_kwargs)
-        self.target_critic1 = critic_cl(**policy_kwargs)
+        self.shared_encoder = shared_encoder
+        self.encoder, self.target_encoder = None, None
+        self.encoder_kwargs = dict(state_space=env.observation_space, use_lstm=policy_kwargs.get("use_lstm", False))
+        if shared_encoder:
+            self.encoder = models.ConvEncoder(**self.encoder_kwargs)
+            self.target_encoder = models.ConvEncoder(**self.encoder_kwargs)
+        self.actor_cl = actor_cl
+        self.actor_kwargs = dict(policy_kwargs, encoder=self.encoder)
+        self.critic_kwargs = dict(policy_kwargs, encoder=self.encoder)
+        target_critic_kwargs = dict(policy_kwargs, encoder=self.target_encoder)
+
+        self.actor = actor_cl(**self.actor_kwargs)
+
+        self.critic1 = critic_cl(**self.critic_kwargs)
+        self.target_critic1 = critic_cl(**target_critic_kwargs)
         self.target_critic1.set_weights(self.critic1.get_weights())
 
-        self.critic2 = critic_cl(**policy_kwargs)
-        self.target_critic2 = critic_cl(**policy_kwargs)
+        self.critic2 = critic_cl(**self.critic_kwargs)
+        self.target_critic2 = critic_cl(**target_critic_kwargs)
         self.target_critic2.set_weights(self.critic2.get_weights())
 
         if model_path is not None:
             self.load_model(model_path)
 
-        self.critic_variables = self.critic1.trainable_variables + self.critic2.trainable_variables
-        self.all_common_variables = (
-                self.actor.common_variables
-                + self.critic1.common_variables
-                + self.critic2.common_variables
-        )
+        self._collect_variables()
+
+        # In the asynchronous mode, the experience is collected with a copy of the actor, whose weights are
+        # published by the learner thread
+        self.async_updates = async_updates
+        self.acting_actor = None
+        self.acting_lock = threading.Lock()
+        if async_updates:
+            acting_encoder = models.ConvEncoder(**self.encoder_kwargs) if shared_encoder else None
+            self.acting_actor = actor_cl(**dict(policy_kwargs, encoder=acting_encoder))
+            self.acting_actor.set_weights(self.actor.get_weights())
 
         # Learning rate schedule
         if lr_decay_steps is None:
@@ -248,6 +337,78 @@ class SAC:
                         np.prod(env.action_space.n).astype(np.float32) * target_1d_entropy
                 )
 
+    def _buffer_kwargs(self, normalizer: Optional[ObservationNormalizer] = None) -> Dict:
+        if not self.compact_replay:
+            return {}
+        obs_transform = normalizer.normalize if normalizer is not None else self._normalize_replay_obs
+        return dict(obs_dtype=np.uint8, obs_transform=obs_transform)
+
+    def _normalize_replay_obs(self, obs: np.ndarray) -> np.ndarray:
+        return self.replay_normalizer.normalize(obs)
+
+    def _create_replay_buffer(self) -> ReplayBuffer:
+        if self.deduplicate_frames:
+            buffer_classes = {
+                BufferType.FIFO: FrameReplayBuffer,
+                BufferType.RESERVOIR: FrameReservoirReplayBuffer,
+                BufferType.PRIORITY: FramePrioritizedReplayBuffer,
+                BufferType.PER: FramePrioritizedExperienceReplay,
+            }
+        else:
+            buffer_classes = {
+                BufferType.FIFO: ReplayBuffer,
+                BufferType.RESERVOIR: ReservoirReplayBuffer,
+                BufferType.PRIORITY: PrioritizedReplayBuffer,
+                BufferType.PER: PrioritizedExperienceReplay,
+            }
+        if self.buffer_type not in buffer_classes:
+            raise ValueError(f"Unsupported buffer type: {self.buffer_type}")
+        frame_kwargs = dict(frame_channels=self.frame_channels) if self.deduplicate_frames else {}
+        return buffer_classes[self.buffer_type](obs_shape=self.obs_shape, size=self.replay_size,
+                                                num_tasks=self.num_tasks, **frame_kwargs, **self._buffer_kwargs())
+
+    def _create_replay_mirror(self) -> TensorReplayMirror:
+        if self.buffer_type != BufferType.FIFO or self.deduplicate_frames:
+            raise ValueError("In-graph updates are only supported with a FIFO buffer without frame deduplication")
+        if type(self).get_episodic_batch is not SAC.get_episodic_batch:
+            raise ValueError("In-graph updates are not supported by methods which sample from an episodic memory")
+        return TensorReplayMirror(obs_shape=self.obs_shape, size=self.replay_size, num_tasks=self.num_tasks,
+                                  obs_dtype=self.replay_buffer.obs_buf.dtype)
+
+    def _collect_variables(self) -> None:
+        """Collects the variables optimized by the actor and the critic losses, and the ones regularized by the CL
+        methods. A shared encoder appears only once among the critic and the common variables and is not optimized by
+        the actor."""
+        encoder_refs = set() if self.encoder is None else {v.ref() for v in self.encoder.trainable_variables}
+        self.actor_variables = [v for v in self.actor.trainable_variables if v.ref() not in encoder_refs]
+        self.critic_variables = unique_variables(self.critic1.trainable_variables + self.critic2.trainable_variables)
+        self.target_critic_variables = unique_variables(
+            self.target_critic1.trainable_variables + self.target_critic2.trainable_variables
+        )
+        self.all_common_variables = unique_variables(
+                self.actor.common_variables
+                + self.critic1.common_variables
+                + self.critic2.common_variables
+        )
+
+    def get_obs_normalizer(self, key: str) -> ObservationNormalizer:
+        if key not in self.obs_normalizers:
+            self.obs_normalizers[key] = ObservationNormalizer(self.obs_shape, self.frame_channels)
+        return self.obs_normalizers[key]
+
+    def process_observation(self, obs: np.ndarray, normalizer_key: str, update: bool = True) -> np.ndarray:
+        """Converts an environment observation to the input of the networks.
+
+        Only has an effect with a compact replay buffer, in which case the raw frames are rescaled and normalized
+        with the statistics of the environment identified by normalizer_key.
+        """
+        if not self.compact_replay:
+            return obs
+        normalizer = self.get_obs_normalizer(normalizer_key)
+        if update:
+            normalizer.update(obs)
+        return normalizer.normalize(obs)
+
     def adjust_gradients(
             self,
             actor_gradients: List[tf.Tensor],
@@ -274,11 +435,18 @@ class SAC:
 
     def on_task_end(self, current_task_idx: int) -> None:
         self.logger.log(f'Task {current_task_idx} finished', color='white')
-        self.env.envs[current_task_idx].close()
+        # The environment of the final task remains active until the end of the run and is closed with the env
+        if current_task_idx < self.env.num_tasks - 1:
+            self.env.close_task(current_task_idx)
 
     def get_episodic_batch(self, current_task_idx: int) -> Optional[Dict[str, tf.Tensor]]:
         return None
 
+    def sample_update_batches(
+            self, current_task_idx: int
+    ) -> Tuple[Dict[str, tf.Tensor], Optional[Dict[str, tf.Tensor]]]:
+        return self.replay_buffer.sample_batch(self.batch_size), self.get_episodic_batch(current_task_idx)
+
     def get_log_alpha(self, one_hot: tf.Tensor) -> tf.Tensor:
         return tf.squeeze(tf.linalg.matmul(tf.expand_dims(tf.convert_to_tensor(one_hot), 1), self.all_log_alpha))
 
@@ -290,6 +458,18 @@ class SAC:
         dist = Categorical(logits=logits)
         return tf.math.argmax(logits, axis=-1, output_type=dtypes.int32) if deterministic else dist.sample()
 
+    @tf.function
+    def get_actions(self, obs: tf.Tensor, one_hot_task_ids: tf.Tensor,
+                    deterministic: tf.Tensor = tf.constant(False)) -> tf.Tensor:
+        logits = self.actor(obs, one_hot_task_ids)
+        dist = Categorical(logits=logits)
+        return tf.math.argmax(logits, axis=-1, output_type=dtypes.int32) if deterministic else dist.sample()
+
+    @tf.function
+    def get_acting_action(self, obs: tf.Tensor, one_hot_task_id: tf.Tensor) -> tf.Tensor:
+        logits = self.acting_actor(tf.expand_dims(obs, 0), tf.expand_dims(one_hot_task_id, 0))
+        return Categorical(logits=logits).sample()
+
     @tf.function
     def get_exploration_action(self, obs: tf.Tensor, one_hot_task_id: tf.Tensor,
                                deterministic: tf.Tensor = tf.constant(False)) -> tf.Tensor:
@@ -309,27 +489,71 @@ class SAC:
                 batch: Dict[str, tf.Tensor],
                 episodic_batch: Dict[str, tf.Tensor] = None,
         ) -> Dict:
-            gradients, metrics = self.get_gradients(seq_idx, **batch)
-            # Warning: we refer here to the int task_idx in the parent function, not the passed seq_idx.
-            gradients = self.adjust_gradients(
-                *gradients,
-                current_task_idx=current_task_idx,
-                metrics=metrics,
-                episodic_batch=episodic_batch,
-            )
+            metrics = self.learn_step(seq_idx, batch, current_task_idx, episodic_batch)
+            return dict(metrics, log_values=self._update_log_values(metrics))
 
-            if self.clipnorm is not None:
-                actor_gradients, critic_gradients, alpha_gradient = gradients
-                gradients = (
-                    tf.clip_by_global_norm(actor_gradients, self.clipnorm)[0],
-                    tf.clip_by_global_norm(critic_gradients, self.clipnorm)[0],
-                    tf.clip_by_norm(alpha_gradient, self.clipnorm),
-                )
+        return learn_on_batch
 
-            self.apply_update(*gradients)
-            return metrics
+    def get_learn_on_buffer(self, current_task_idx: int) -> Callable:
+        @tf.function
+        def learn_on_buffer(
+                seq_idx: tf.Tensor,
+                size: tf.Tensor,
+                obs_stats: Tuple[tf.Tensor, tf.Tensor] = None,
+        ) -> Dict:
+            def step():
+                batch = self.replay_mirror.sample_batch(self.batch_size, size, obs_stats)
+                metrics = self.learn_step(seq_idx, batch, current_task_idx)
+                return {key: tf.reduce_mean(tf.cast(value, tf.float32)) for key, value in metrics.items()}
+
+            # The first step is taken outside the loop, as the optimizer might still have to create its slots.
+            # The metrics are averaged over the update steps on the device.
+            totals = step()
+            for _ in tf.range(self.n_updates - 1):
+                metrics = step()
+                totals = {key: totals[key] + metrics[key] for key in totals}
+            metrics = {key: total / self.n_updates for key, total in totals.items()}
+            return dict(metrics, log_values=self._update_log_values(metrics))
+
+        return learn_on_buffer
+
+    def _update_log_values(self, metrics: Dict[str, tf.Tensor]) -> tf.Tensor:
+        """Stacks the logged metrics and the temperatures of the tasks into a single tensor, which is fetched from the
+        device at once. Meant to be traced inside a tf.function."""
+        values = tf.stack([tf.reduce_mean(tf.cast(metrics[key], tf.float32)) for key in self.update_log_keys])
+        if self.auto_alpha:
+            values = tf.concat([values, tf.math.exp(self.all_log_alpha[:, 0])], 0)
+        return values
 
-        return learn_on_batch
+    def learn_step(
+            self,
+            seq_idx: tf.Tensor,
+            batch: Dict[str, tf.Tensor],
+            current_task_idx: int,
+            episodic_batch: Dict[str, tf.Tensor] = None,
+    ) -> Dict:
+        """Performs a single gradient step. Meant to be traced inside a tf.function."""
+        if self.batch_augmenter is not None:
+            batch = self.batch_augmenter(batch)
+        gradients, metrics = self.get_gradients(seq_idx, **batch)
+        # Warning: we refer here to the int task_idx in the parent function, not the passed seq_idx.
+        gradients = self.adjust_gradients(
+            *gradients,
+            current_task_idx=current_task_idx,
+            metrics=metrics,
+            episodic_batch=episodic_batch,
+        )
+
+        if self.clipnorm is not None:
+            actor_gradients, critic_gradients, alpha_gradient = gradients
+            gradients = (
+                tf.clip_by_global_norm(actor_gradients, self.clipnorm)[0],
+                tf.clip_by_global_norm(critic_gradients, self.clipnorm)[0],
+                tf.clip_by_norm(alpha_gradient, self.clipnorm),
+            )
+
+        self.apply_update(*gradients)
+        return metrics
 
     def get_gradients(
             self,
@@ -349,24 +573,31 @@ class SAC:
                 log_alpha = tf.math.log(self.alpha)
             log_alpha_exp = tf.math.exp(log_alpha)
 
-            logits = self.actor(obs, one_hot)
+            # With a shared encoder, the observations are encoded only once for all models
+            features, next_features, target_next_features = None, None, None
+            if self.encoder is not None:
+                features = self.encoder(obs)
+                next_features = self.encoder(next_obs)
+                target_next_features = self.target_encoder(next_obs)
+
+            logits = self.actor(obs, one_hot, features=features)
             dist = Categorical(logits=logits)
             entropy = dist.entropy()
 
-            logits_next = self.actor(next_obs, one_hot)
+            logits_next = self.actor(next_obs, one_hot, features=next_features)
             dist_next = Categorical(logits=logits_next)
             entropy_next = dist_next.entropy()
 
-            q1 = self.critic1(obs, one_hot)
-            q2 = self.critic2(obs, one_hot)
+            q1 = self.critic1(obs, one_hot, features=features)
+            q2 = self.critic2(obs, one_hot, features=features)
 
             # Q values of actions taken
             q1_vals = tf.gather(q1, actions, axis=1, batch_dims=1)
             q2_vals = tf.gather(q2, actions, axis=1, batch_dims=1)
 
             # Target Q values
-            target_q1 = self.target_critic1(next_obs, one_hot)
-            target_q2 = self.target_critic2(next_obs, one_hot)
+            target_q1 = self.target_critic1(next_obs, one_hot, features=target_next_features)
+            target_q2 = self.target_critic2(next_obs, one_hot, features=target_next_features)
 
             # Min Double-Q:
             min_q = dist.probs_parameter() * tf.stop_gradient(tf.minimum(q1, q2))
@@ -411,7 +642,7 @@ class SAC:
             value_loss += auxiliary_loss
 
         # Compute gradients
-        actor_gradients = g.gradient(actor_loss, self.actor.trainable_variables)
+        actor_gradients = g.gradient(actor_loss, self.actor_variables)
         critic_gradients = g.gradient(value_loss, self.critic_variables)
         if self.auto_alpha:
             alpha_gradient = g.gradient(alpha_loss, self.all_log_alpha)
@@ -428,7 +659,7 @@ class SAC:
             critic_gradients: List[tf.Tensor],
             alpha_gradient: List[tf.Tensor],
     ) -> None:
-        self.optimizer.apply_gradients(zip(actor_gradients, self.actor.trainable_variables))
+        self.optimizer.apply_gradients(zip(actor_gradients, self.actor_variables))
 
         self.optimizer.apply_gradients(zip(critic_gradients, self.critic_variables))
 
@@ -436,21 +667,19 @@ class SAC:
             self.optimizer.apply_gradients([(alpha_gradient, self.all_log_alpha)])
 
         # Polyak averaging for target variables
-        for v, target_v in zip(
-                self.critic1.trainable_variables, self.target_critic1.trainable_variables
-        ):
-            target_v.assign(self.polyak * target_v + (1 - self.polyak) * v)
-        for v, target_v in zip(
-                self.critic2.trainable_variables, self.target_critic2.trainable_variables
-        ):
+        for v, target_v in zip(self.critic_variables, self.target_critic_variables):
             target_v.assign(self.polyak * target_v + (1 - self.polyak) * v)
 
     def test_agent(self, deterministic: bool, num_episodes: int) -> None:
+        if self.parallel_test:
+            self._test_agent_parallel(deterministic, num_episodes)
+            return
         mode = "deterministic" if deterministic else "stochastic"
         num_actions = self.test_envs[0].action_space.n
-        total_action_counts = {i: 0 for i in range(num_actions)}
-        for seq_idx, test_env in enumerate(self.test_envs):
+        total_action_counts = np.zeros(num_actions, dtype=np.int64)
+        for seq_idx in range(len(self.test_envs)):
             start_time = time.time()
+            test_env = self.acquire_test_env(seq_idx)
             key_prefix = f"test/{mode}/{seq_idx}/{test_env.name}"
             one_hot_vec = create_one_hot_vec(test_env.num_tasks, test_env.task_id)
 
@@ -459,9 +688,10 @@ class SAC:
             for j in range(num_episodes):
                 obs, _ = test_env.reset()
                 done, episode_return, episode_len = False, 0, 0
-                # Initialize a dictionary to count the number of times each action is selected
-                action_counts = {i: 0 for i in range(num_actions)}
+                # Count the number of times each action is selected
+                action_counts = np.zeros(num_actions, dtype=np.int64)
                 while not done:
+                    obs = self.process_observation(obs, f"test/{seq_idx}")
                     action = self.get_action_test(tf.convert_to_tensor(obs),
                                                   tf.convert_to_tensor(one_hot_vec, dtype=tf.dtypes.float32),
                                                   tf.constant(deterministic))
@@ -474,48 +704,149 @@ class SAC:
 
                     # Increment the count of the selected action
                     action_counts[action] += 1
-                # Log the number of times each action was selected
-                actions_dict = {f"{key_prefix}/actions/{i}": action_counts[i] for i in range(num_actions)}
-                self.logger.store({
-                    **actions_dict,
-                    key_prefix + "/return": episode_return,
-                    key_prefix + "/ep_length": episode_len,
-                })
-                self.logger.store(test_env.get_statistics(key_prefix))
-                total_action_counts = {i: total_action_counts[i] + action_counts[i] for i in range(num_actions)}
+                self._store_test_episode(key_prefix, episode_return, episode_len, action_counts,
+                                         test_env.get_statistics(key_prefix))
+                total_action_counts += action_counts
 
             self.on_test_end(seq_idx)
+            self.release_test_env(seq_idx, test_env)
             self.logger.log(f"Finished testing {key_prefix} in {time.time() - start_time:.2f} seconds", color='yellow')
+            self._log_test_env(key_prefix, test_env)
+
+        # Log the number of times each action was selected across all episodes and test environments
+        for i in range(num_actions):
+            self.logger.log_tabular(f"test/actions/" + str(i), total_action_counts[i])
+
+    def acquire_test_env(self, seq_idx: int) -> BaseEnv:
+        """
+        Returns an instance of the test environment, which is not stepped by the training in the meantime.
+        With a registry, an idle instance is leased, or a state-isolated one is forked if the training holds it.
+        """
+        if self.env_registry is None:
+            return self.test_envs[seq_idx]
+        return self.env_registry.acquire(self.test_env_fns[seq_idx])
+
+    def release_test_env(self, seq_idx: int, test_env: BaseEnv) -> None:
+        if self.env_registry is not None:
+            self.env_registry.release(self.test_env_fns[seq_idx], test_env)
+
+    def _test_key_prefixes(self, deterministic: bool) -> Dict[int, str]:
+        mode = "deterministic" if deterministic else "stochastic"
+        return {seq_idx: f"test/{mode}/{seq_idx}/{test_env.name}" for seq_idx, test_env in enumerate(self.test_envs)}
 
-            self.logger.log_tabular(key_prefix + "/return", with_min_and_max=True)
-            self.logger.log_tabular(key_prefix + "/ep_length", average_only=True)
-            for stat in test_env.get_statistics(key_prefix).keys():
-                self.logger.log_tabular(stat, average_only=True)
-            for i in range(num_actions):
-                self.logger.log_tabular(f"{key_prefix}/actions/{i}", average_only=True)
+    def _test_agent_parallel(self, deterministic: bool, num_episodes: int) -> None:
+        """Plays the test episodes concurrently in worker processes, logging the same keys as test_agent."""
+        num_actions = self.test_envs[0].action_space.n
+        if self.parallel_evaluator is None:
+            obs_dtype = np.uint8 if self.compact_replay else np.float32
+            self.parallel_evaluator = ParallelEvaluator(self.test_env_fns, num_episodes, num_actions, self.seed,
+                                                        obs_dtype)
+        key_prefixes = self._test_key_prefixes(deterministic)
+        one_hots = np.stack([create_one_hot_vec(test_env.num_tasks, test_env.task_id)
+                             for test_env in self.test_envs]).astype(np.float32)
+
+        def policy(obs: np.ndarray, env_idx: np.ndarray) -> np.ndarray:
+            return self.get_actions(tf.convert_to_tensor(obs), tf.convert_to_tensor(one_hots[env_idx]),
+                                    tf.constant(deterministic)).numpy()
+
+        def preprocess(obs: np.ndarray, seq_idx: int) -> np.ndarray:
+            return self.process_observation(obs, f"test/{seq_idx}")
+
+        # Methods altering the networks for the evaluated task can only test one environment at a time
+        seq_indices = list(range(len(self.test_envs)))
+        groups = [[seq_idx] for seq_idx in seq_indices] if self.test_view_per_task else [seq_indices]
+        results = {}
+        for group in groups:
+            start_time = time.time()
+            for seq_idx in group:
+                self.on_test_start(seq_idx)
+            results.update(self.parallel_evaluator.run(group, policy, preprocess, key_prefixes))
+            for seq_idx in group:
+                self.on_test_end(seq_idx)
+            self.logger.log(f"Finished testing {len(group)} environment(s) in {time.time() - start_time:.2f} seconds",
+                            color='yellow')
+        self._log_test_results(key_prefixes, results)
+
+    def _test_agent_background(self, deterministic: bool, num_episodes: int, wait: bool) -> None:
+        """Submits a snapshot of the actor to the background evaluator and logs the results of the previous one.
+
+        The results of the previous snapshot are dropped if wait is True, in which case the current snapshot is
+        evaluated right away instead.
+        """
+        if self.background_evaluator is None:
+            actor_fn = partial(make_actor, self.actor_cl, self.policy_kwargs, self.shared_encoder)
+            self.background_evaluator = BackgroundEvaluator(actor_fn, self.test_env_fns, num_episodes, self.seed,
+                                                            self.compact_replay, self.frame_channels)
+            # Establish the logged keys with the very first snapshot
+            wait = True
+        evaluator = self.background_evaluator
+        key_prefixes = self._test_key_prefixes(deterministic)
+        results = evaluator.result() if evaluator.pending else None
+        evaluator.submit(self.get_test_snapshot(), deterministic, key_prefixes)
+        if wait:
+            results = evaluator.result()
+        if results is not None:
+            self._log_test_results(key_prefixes, results)
+
+    def get_test_snapshot(self) -> List[List[np.ndarray]]:
+        """Returns the actor weights to test each of the test environments with."""
+        if not self.test_view_per_task:
+            return [self.actor.get_weights()] * len(self.test_envs)
+        snapshot = []
+        for seq_idx in range(len(self.test_envs)):
+            self.on_test_start(seq_idx)
+            snapshot.append(self.actor.get_weights())
+            self.on_test_end(seq_idx)
+        return snapshot
+
+    def _log_test_results(self, key_prefixes: Dict[int, str], results: Dict[int, List[Dict]]) -> None:
+        num_actions = self.test_envs[0].action_space.n
+        total_action_counts = np.zeros(num_actions, dtype=np.int64)
+        for seq_idx in sorted(results):
+            for episode in results[seq_idx]:
+                self._store_test_episode(key_prefixes[seq_idx], episode['return'], episode['ep_length'],
+                                         episode['action_counts'], episode['statistics'])
+                total_action_counts += episode['action_counts']
+            self._log_test_env(key_prefixes[seq_idx], self.test_envs[seq_idx])
 
         # Log the number of times each action was selected across all episodes and test environments
         for i in range(num_actions):
             self.logger.log_tabular(f"test/actions/" + str(i), total_action_counts[i])
 
+    def _store_test_episode(self, key_prefix: str, episode_return: float, episode_len: int, action_counts: np.ndarray,
+                            statistics: Dict[str, float]) -> None:
+        # Log the number of times each action was selected
+        actions_dict = {f"{key_prefix}/actions/{i}": action_counts[i] for i in range(len(action_counts))}
+        self.logger.store({
+            **actions_dict,
+            key_prefix + "/return": episode_return,
+            key_prefix + "/ep_length": episode_len,
+        })
+        self.logger.store(statistics)
+
+    def _log_test_env(self, key_prefix: str, test_env: BaseEnv) -> None:
+        self.logger.log_tabular(key_prefix + "/return", with_min_and_max=True)
+        self.logger.log_tabular(key_prefix + "/ep_length", average_only=True)
+        for stat in test_env.get_statistics(key_prefix).keys():
+            self.logger.log_tabular(stat, average_only=True)
+        for i in range(test_env.action_space.n):
+            self.logger.log_tabular(f"{key_prefix}/actions/{i}", average_only=True)
+
+    def _close_evaluators(self) -> None:
+        if self.parallel_evaluator is not None:
+            self.parallel_evaluator.close()
+            self.parallel_evaluator = None
+        if self.background_evaluator is not None:
+            self.background_evaluator.close()
+            self.background_evaluator = None
+
     def _log_after_update(self, results):
-        self.logger.store(
-            {
-                "train/q1_vals": results["q1"],
-                "train/q2_vals": results["q2"],
-                "train/entropy": results["entropy"],
-                "train/loss_kl": results["kl_loss"],
-                "train/loss_pi": results["pi_loss"],
-                "train/loss_q1": results["q1_loss"],
-                "train/loss_q2": results["q2_loss"],
-                "train/loss_reg": results["reg_loss"],
-                "train/agem_violation": results["agem_violation"],
-            }
-        )
+        values = results["log_values"].numpy()
+        num_metrics = len(self.update_log_keys)
+        self.logger.store(dict(zip(self.update_log_keys.values(), values[:num_metrics])))
 
-        for task_idx in range(self.num_tasks):
-            if self.auto_alpha:
-                self.logger.store({f"train/alpha/{task_idx}": float(tf.math.exp(self.all_log_alpha[task_idx][0]))})
+        if self.auto_alpha:
+            self.logger.store({f"train/alpha/{task_idx}": alpha for task_idx, alpha in enumerate(values[num_metrics:])})
 
     def _log_after_epoch(self, epoch, current_task_timestep, global_timestep, info, learning_rate):
         # Log info about epoch
@@ -526,9 +857,6 @@ class SAC:
         self.logger.log_tabular("total_env_steps", global_timestep + 1)
         self.logger.log_tabular("current_task_steps", current_task_timestep + 1)
         self.logger.log_tabular("buffer_capacity", average_only=True)
-        # self.logger.log_tabular("train/q1_vals", with_min_and_max=True)
-        # self.logger.log_tabular("train/q2_vals", with_min_and_max=True)
-        # self.logger.log_tabular("train/entropy", with_min_and_max=True)
         self.logger.log_tabular("train/loss_kl", average_only=True)
         self.logger.log_tabular("train/loss_pi", average_only=True)
         self.logger.log_tabular("train/loss_q1", average_only=True)
@@ -544,6 +872,7 @@ class SAC:
         if "seq_idx" in info:
             self.logger.log_tabular("train/active_env", info["seq_idx"])
 
+        self.profiler.log_tabular(self.logger)
         self.logger.log_tabular("walltime", time.time() - self.start_time)
         self.logger.dump_tabular()
 
@@ -578,19 +907,12 @@ class SAC:
         if self.start_from_task != current_task_idx:
             self.on_task_start(current_task_idx)
 
-        if self.reset_buffer_on_task_change:
-            if self.buffer_type == BufferType.FIFO:
-                self.replay_buffer = ReplayBuffer(
-                    obs_shape=self.obs_shape, size=self.replay_size, num_tasks=self.num_tasks
-                )
-            elif self.buffer_type == BufferType.PRIORITY:
-                self.replay_buffer = PrioritizedReplayBuffer(
-                    obs_shape=self.obs_shape, size=self.replay_size, num_tasks=self.num_tasks
-                )
-            elif self.buffer_type == BufferType.PER:
-                self.replay_buffer = PrioritizedExperienceReplay(
-                    obs_shape=self.obs_shape, size=self.replay_size, num_tasks=self.num_tasks
-                )
+        if self.compact_replay:
+            self.replay_normalizer = self.get_obs_normalizer(f'train/{current_task_idx}')
+
+        # The reservoir buffer is meant to retain the experience of the previous tasks
+        if self.reset_buffer_on_task_change and self.buffer_type != BufferType.RESERVOIR:
+            self.replay_buffer = self._create_replay_buffer()
 
         if self.reset_actor_on_task_change:
             if self.exploration_kind is not None:
@@ -598,9 +920,13 @@ class SAC:
             reset_weights(self.actor, self.actor_cl, self.actor_kwargs)
 
         if self.reset_critic_on_task_change:
-            reset_weights(self.critic1, self.critic_cl, self.policy_kwargs)
+            # The shared encoder is trained by the critics, but their dummy copies are built around the same encoder,
+            # so it has to be re-initialized on its own. Resetting only the actor keeps the encoder.
+            if self.encoder is not None:
+                reset_weights(self.encoder, models.ConvEncoder, self.encoder_kwargs)
+            reset_weights(self.critic1, self.critic_cl, self.critic_kwargs)
             self.target_critic1.set_weights(self.critic1.get_weights())
-            reset_weights(self.critic2, self.critic_cl, self.policy_kwargs)
+            reset_weights(self.critic2, self.critic_cl, self.critic_kwargs)
             self.target_critic2.set_weights(self.critic2.get_weights())
 
         if self.reset_optimizer_on_task_change:
@@ -611,23 +937,136 @@ class SAC:
         # E.g: For VCL after the first task we set trainable=False for layer
         # normalization. We need to recompute the graph in order for TensorFlow
         # to notice this change.
+        self._collect_variables()
         self.learn_on_batch = self.get_learn_on_batch(current_task_idx)
-        self.all_common_variables = (
-                self.actor.common_variables
-                + self.critic1.common_variables
-                + self.critic2.common_variables
-        )
+        if self.in_graph_updates:
+            self.learn_on_buffer = self.get_learn_on_buffer(current_task_idx)
 
         if self.exploration_kind is not None and current_task_idx > 0:
             self.exploration_helper = ExplorationHelper(self.exploration_kind, num_available_heads=current_task_idx + 1,
                                                         num_tasks=self.num_tasks)
 
+    def _update_phase(self, current_task_idx: int, log_results: Callable[[Dict], None]) -> None:
+        """Performs n_updates gradient steps and passes the metrics of each of them to log_results."""
+        if self.in_graph_updates:
+            with self.profiler.phase('sample'), self.batch_prefetcher.lock:
+                size = self.replay_mirror.sync(self.replay_buffer)
+            obs_stats = self.replay_normalizer.statistics() if self.compact_replay else None
+            with self.profiler.phase('learn'):
+                results = self.learn_on_buffer(tf.convert_to_tensor(current_task_idx), tf.convert_to_tensor(size),
+                                               obs_stats)
+            log_results(results)
+            return
+
+        batches = self.batch_prefetcher.prefetch(partial(self.sample_update_batches, current_task_idx), self.n_updates)
+        # With prefetching, only the time spent waiting for a batch is attributed to the sampling
+        for batch, episodic_batch in self.profiler.iterate('sample', batches):
+
+            with self.profiler.phase('learn'):
+                results = self.learn_on_batch(
+                    tf.convert_to_tensor(current_task_idx), batch, episodic_batch
+                )
+                # Fetching the errors waits for the gradient step to complete
+                abs_errors = results['abs_error'].numpy()
+
+            # Update priority in the tree
+            if self.buffer_type == BufferType.PER or self.buffer_type == BufferType.PRIORITY:
+                with self.profiler.phase('priority_update'), self.batch_prefetcher.lock:
+                    self.replay_buffer.update_weights(batch['idxs'].numpy(), abs_errors)
+
+            log_results(results)
+
+    def _schedule_updates(self) -> None:
+        """Allows the learner thread to perform another update phase. Blocks the collection of experience while the
+        learner lags behind by more than one phase, which keeps the update-to-data ratio of the synchronous mode."""
+        with self.update_condition:
+            self.scheduled_updates += self.n_updates
+            self.update_condition.notify_all()
+            self.update_condition.wait_for(
+                lambda: self.completed_updates >= self.scheduled_updates - self.n_updates or self.learner_error
+            )
+        self._check_learner()
+
+    def _learner_loop(self) -> None:
+        """Performs the scheduled update phases and publishes the actor weights to the acting copy after each."""
+        try:
+            while True:
+                with self.update_condition:
+                    self.update_condition.wait_for(
+                        lambda: self.stop_learner or self.completed_updates < self.scheduled_updates
+                    )
+                    if self.stop_learner:
+                        return
+                with self.learner_lock:
+                    self._update_phase(self.learner_task_idx, self.update_results.put)
+                    self._publish_actor_weights()
+                with self.update_condition:
+                    self.completed_updates += self.n_updates
+                    self.update_condition.notify_all()
+        except BaseException as e:
+            with self.update_condition:
+                self.learner_error = e
+                self.update_condition.notify_all()
+
+    def _publish_actor_weights(self) -> None:
+        with self.acting_lock:
+            self.acting_actor.set_weights(self.actor.get_weights())
+
+    def _check_learner(self) -> None:
+        if self.learner_error is not None:
+            raise RuntimeError("The learner thread has failed") from self.learner_error
+
+    @contextmanager
+    def _learner_paused(self) -> Iterator[None]:
+        """Waits for the learner to complete the scheduled updates and keeps it idle within the context, so that the
+        models and the replay buffer can be safely used or replaced."""
+        if not self.async_updates:
+            yield
+            return
+        with self.update_condition:
+            self.update_condition.wait_for(
+                lambda: self.completed_updates >= self.scheduled_updates or self.learner_error
+            )
+        self._check_learner()
+        with self.learner_lock:
+            yield
+
+    def _drain_update_results(self) -> None:
+        while not self.update_results.empty():
+            self._log_after_update(self.update_results.get_nowait())
+
+    def _start_learner(self) -> None:
+        self.update_condition = threading.Condition()
+        self.learner_lock = threading.Lock()
+        self.update_results = queue.Queue()
+        self.scheduled_updates, self.completed_updates = 0, 0
+        self.learner_task_idx = -1
+        self.stop_learner = False
+        self.learner_error = None
+        self.learner_thread = threading.Thread(target=self._learner_loop, name='Learner', daemon=True)
+        self.learner_thread.start()
+
+    def _stop_learner(self) -> None:
+        with self.update_condition:
+            self.stop_learner = True
+            self.update_condition.notify_all()
+        self.learner_thread.join()
+
+    def act(self, obs: tf.Tensor, one_hot_task_id: tf.Tensor) -> tf.Tensor:
+        """Samples an action for the experience collection. In the asynchronous mode, the acting copy of the actor
+        is used, whose weights are published by the learner."""
+        if self.acting_actor is None:
+            return self.get_action(obs, one_hot_task_id)
+        with self.acting_lock:
+            return self.get_acting_action(obs, one_hot_task_id)
+
     def run(self):
         """A method to run the SAC training, after the object has been created."""
         self.start_time = time.time()
 
         if self.test_only:
             self.test_agent(deterministic=True, num_episodes=self.num_test_eps)
+            self._close_evaluators()
             return
 
         obs, info = self.env.reset()
@@ -645,37 +1084,49 @@ class SAC:
         num_actions = self.env.action_space.n
         action_counts = {i: 0 for i in range(num_actions)}
 
+        if self.async_updates:
+            self._start_learner()
+
+        self.profiler.begin_epoch(1)
         for global_timestep in range(self.steps):
             # On task change
             if current_task_idx != getattr(self.env, "cur_seq_idx", -1):
                 current_task_timestep = 0
                 current_task_idx = getattr(self.env, "cur_seq_idx")
-                self._handle_task_change(current_task_idx)
+                with self._learner_paused():
+                    self._handle_task_change(current_task_idx)
+                    if self.async_updates:
+                        with self.update_condition:
+                            self.scheduled_updates, self.completed_updates = 0, 0
+                            self.learner_task_idx = current_task_idx
+                        self._publish_actor_weights()
                 one_hot_vec = create_one_hot_vec(self.env.num_tasks, self.env.task_id)
 
-            obs_tensor = tf.convert_to_tensor(obs)
-            if current_task_timestep > self.start_steps or (
-                    self.agent_policy_exploration and current_task_idx > 0) or self.model_path:
-                action = self.get_action(obs_tensor, tf.convert_to_tensor(one_hot_vec, dtype=tf.dtypes.float32))
-            else:
-                # Exploration
-                if self.exploration_helper is not None:
-                    # Use strategy provided by exploration helper.
-                    if exploration_head_one_hot is None:
-                        exploration_head_one_hot = self.exploration_helper.get_exploration_head_one_hot()
-                    task_id_tensor = tf.convert_to_tensor(exploration_head_one_hot, dtype=tf.dtypes.float32)
-
-                    if self.exploration_actor is not None:
-                        action = self.get_exploration_action(obs_tensor, task_id_tensor)
-                    else:
-                        action = self.get_action(obs_tensor, task_id_tensor)
+            with self.profiler.phase('act'):
+                obs_tensor = tf.convert_to_tensor(self.process_observation(obs, f'train/{current_task_idx}'))
+                if current_task_timestep > self.start_steps or (
+                        self.agent_policy_exploration and current_task_idx > 0) or self.model_path:
+                    action = self.act(obs_tensor, tf.convert_to_tensor(one_hot_vec, dtype=tf.dtypes.float32))
                 else:
-                    # Just pure random exploration.
-                    action = self.env.action_space.sample()
+                    # Exploration
+                    if self.exploration_helper is not None:
+                        # Use strategy provided by exploration helper.
+                        if exploration_head_one_hot is None:
+                            exploration_head_one_hot = self.exploration_helper.get_exploration_head_one_hot()
+                        task_id_tensor = tf.convert_to_tensor(exploration_head_one_hot, dtype=tf.dtypes.float32)
+
+                        if self.exploration_actor is not None:
+                            action = self.get_exploration_action(obs_tensor, task_id_tensor)
+                        else:
+                            action = self.act(obs_tensor, task_id_tensor)
+                    else:
+                        # Just pure random exploration.
+                        action = self.env.action_space.sample()
+                action = action.numpy()[0] if isinstance(action, tf.Tensor) else action
 
             # Environment step
-            action = action.numpy()[0] if isinstance(action, tf.Tensor) else action
-            next_obs, reward, done, _, info = self.env.step(action)
+            with self.profiler.phase('env_step'):
+                next_obs, reward, done, _, info = self.env.step(action)
             if self.exploration_helper is not None and exploration_head_one_hot is not None:
                 self.exploration_helper.update_reward(reward)
             episode_return += reward
@@ -686,7 +1137,10 @@ class SAC:
             done_to_store = False if episode_len == self.max_episode_len else done
 
             # Store experience to replay buffer
-            self.replay_buffer.store(obs, action, reward, next_obs, done_to_store, one_hot_vec)
+            with self.profiler.phase('store'), self.batch_prefetcher.lock:
+                self.replay_buffer.store(obs, action, reward, next_obs, done_to_store, one_hot_vec)
+                if done:
+                    self.replay_buffer.end_episode()
 
             # Update the most recent observation
             obs = next_obs
@@ -709,58 +1163,60 @@ class SAC:
             # Update handling
             if current_task_timestep >= self.update_after and current_task_timestep % self.update_every == 0:
 
-                time_update_start = time.time()
-
-                for j in range(self.n_updates):
-
-                    batch = self.replay_buffer.sample_batch(self.batch_size)
-                    episodic_batch = self.get_episodic_batch(current_task_idx)
-
-                    results = self.learn_on_batch(
-                        tf.convert_to_tensor(current_task_idx), batch, episodic_batch
-                    )
-
-                    # Update priority in the tree
-                    abs_errors = results['abs_error'].numpy()
-                    if self.buffer_type == BufferType.PER or self.buffer_type == BufferType.PRIORITY:
-                        self.replay_buffer.update_weights(batch['idxs'].numpy(), abs_errors)
-
-                    self._log_after_update(results)
-
-                self.logger.log(f"Time elapsed for a policy update: {time.time() - time_update_start}")
+                if self.async_updates:
+                    self._schedule_updates()
+                else:
+                    self._update_phase(current_task_idx, self._log_after_update)
 
             if self.env.name == "ContinualLearningEnv" and current_task_timestep + 1 == self.env.steps_per_env:
                 episodes = 0
-                self.on_task_end(current_task_idx)
+                with self._learner_paused():
+                    self.on_task_end(current_task_idx)
+                    if self.async_updates:
+                        self._publish_actor_weights()
 
             # End of epoch wrap-up
             if ((global_timestep + 1) % self.log_every == 0) or (global_timestep + 1 == self.steps):
-                epoch = (global_timestep + 1 + self.log_every - 1) // self.log_every
-
-                # Save model
-                if (epoch % self.save_freq_epochs == 0) or (global_timestep + 1 == self.steps):
-                    self.save_model(current_task_idx)
-
-                # Test the performance of stochastic and deterministic version of the agent.
-                if self.test and self.test_envs:
-                    test_start_time = time.time()
-                    self.test_agent(deterministic=False, num_episodes=self.num_test_eps)
-                    self.logger.log(f"Time elapsed for the testing procedure: {time.time() - test_start_time}")
-
-                # Determine the current learning rate of the optimizer
-                lr = self.optimizer.lr
-                if issubclass(type(lr), LearningRateSchedule):
-                    lr = self.optimizer._decayed_lr('float32').numpy()
-
-                log_start_time = time.time()
-                # Log the action counts and reset them
-                for i in range(num_actions):
-                    self.logger.log_tabular("train/actions/" + str(i), action_counts[i])
-                    action_counts[i] = 0
-                self._log_after_epoch(epoch, current_task_timestep, global_timestep, info, lr)
-                self.logger.log(f"Time elapsed for logging: {time.time() - log_start_time}")
+                with self._learner_paused():
+                    if self.async_updates:
+                        self._drain_update_results()
+
+                    epoch = (global_timestep + 1 + self.log_every - 1) // self.log_every
+
+                    # Save model
+                    if (epoch % self.save_freq_epochs == 0) or (global_timestep + 1 == self.steps):
+                        with self.profiler.phase('checkpoint'):
+                            self.save_model(current_task_idx)
+
+                    # Test the performance of stochastic and deterministic version of the agent.
+                    if self.test and self.test_envs:
+                        with self.profiler.phase('test'):
+                            if self.background_test:
+                                self._test_agent_background(deterministic=False, num_episodes=self.num_test_eps,
+                                                            wait=global_timestep + 1 == self.steps)
+                            else:
+                                self.test_agent(deterministic=False, num_episodes=self.num_test_eps)
+
+                    # Determine the current learning rate of the optimizer
+                    lr = self.optimizer.lr
+                    if issubclass(type(lr), LearningRateSchedule):
+                        lr = self.optimizer._decayed_lr('float32').numpy()
+
+                    with self.profiler.phase('log'):
+                        # Log the action counts and reset them
+                        for i in range(num_actions):
+                            self.logger.log_tabular("train/actions/" + str(i), action_counts[i])
+                            action_counts[i] = 0
+                        self._log_after_epoch(epoch, current_task_timestep, global_timestep, info, lr)
+                self.profiler.end_epoch()
+                self.profiler.begin_epoch(epoch + 1)
                 episode_start = time.time()
 
             current_task_timestep += 1
             if done:
                 episode_start = time.time()
+
+        self.profiler.end_epoch()
+        if self.async_updates:
+            self._stop_learner()
+        self._close_evaluators()
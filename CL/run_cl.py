@@ -20,12 +20,14 @@ from CL.methods.owl import OWL_SAC
 from CL.methods.packnet import PackNet_SAC
 from CL.methods.vcl import VCL_SAC, VclMlpActor
 from CL.replay.buffers import BufferType
+from CL.rl.evaluation import EnvMetadata
 from CL.rl.models import MlpActor
 from CL.rl.sac import SAC
 from CL.utils.logging import EpochLogger, WandBLogger
 from CL.utils.running import get_activation_from_str
-from COOM.env.builder import make_envs, build_multi_discrete_actions
+from COOM.env.builder import make_env_fns, build_multi_discrete_actions
 from COOM.env.continual import ContinualLearningEnv
+from COOM.env.registry import EnvRegistry
 from COOM.utils.config import Sequence, Scenario, sequence_scenarios, sequence_tasks, default_wrapper_config, \
     scenario_config
 from config import update_wrapper_config, get_arg_parser
@@ -89,6 +91,8 @@ def main(parser: argparse.ArgumentParser):
         render_sleep=args.render_sleep,
         resolution=args.resolution,
         variable_queue_length=args.variable_queue_length,
+        native_capture=args.native_capture,
+        grayscale=args.grayscale,
         action_space_fn=build_multi_discrete_actions,
     )
     if args.test_only:
@@ -96,14 +100,27 @@ def main(parser: argparse.ArgumentParser):
     scenario_kwargs = [{key: vars(args)[key] for key in scenario_config[scenario]['args']} for scenario in scenarios]
     wrapper_config = update_wrapper_config(default_wrapper_config, args)
     wrapper_config['record_dir'] = record_dir
+    if args.compact_replay:
+        # The raw frames are rescaled and normalized by the agent instead
+        wrapper_config['rescale'] = wrapper_config['normalize_observation'] = False
+
+    # The training and the test environments can lease the game instances from a common pool
+    env_registry = EnvRegistry() if args.share_envs else None
 
     # Create the test tasks
-    test_tasks = make_envs(test_scenarios, test_tasks, args.random_order, task_idx,
-                           scenario_kwargs, doom_kwargs, wrapper_config)
+    test_env_fns = make_env_fns(test_scenarios, test_tasks, args.random_order, task_idx,
+                                scenario_kwargs, doom_kwargs, wrapper_config)
+    if env_registry is not None:
+        test_tasks = env_registry.view(test_env_fns)
+    elif args.parallel_test or (args.background_test and not args.test_only):
+        # The test episodes are played in worker processes, so only the metadata of the test tasks is required
+        test_tasks = [EnvMetadata(env_fn) for env_fn in test_env_fns]
+    else:
+        test_tasks = [env_fn() for env_fn in test_env_fns]
 
     # Create the continual learning environment
     cl_env = ContinualLearningEnv(sequence, args.steps_per_env, args.start_from, args.random_order,
-                                  scenario_kwargs, doom_kwargs, wrapper_config)
+                                  scenario_kwargs, doom_kwargs, wrapper_config, args.warm_pool_size, env_registry)
 
     num_heads = num_tasks if args.multihead_archs else 1
     policy_kwargs = dict(
@@ -124,6 +141,10 @@ def main(parser: argparse.ArgumentParser):
         test=args.test,
         test_only=args.test_only,
         num_test_eps=args.test_episodes,
+        test_env_fns=test_env_fns,
+        parallel_test=args.parallel_test,
+        background_test=args.background_test,
+        env_registry=env_registry,
         logger=logger,
         scenarios=scenarios,
         cl_method=cl_method,
@@ -140,6 +161,14 @@ def main(parser: argparse.ArgumentParser):
         actor_cl=actor_cl,
         policy_kwargs=policy_kwargs,
         buffer_type=BufferType(args.buffer_type),
+        compact_replay=args.compact_replay,
+        deduplicate_frames=args.deduplicate_frames,
+        prefetch_batches=args.prefetch_batches,
+        batch_augmentation=args.batch_augmentation,
+        frame_channels=1 if args.grayscale else 3,
+        in_graph_updates=args.in_graph_updates,
+        shared_encoder=args.shared_encoder,
+        async_updates=args.async_updates,
         reset_buffer_on_task_change=args.reset_buffer_on_task_change,
         reset_optimizer_on_task_change=args.reset_optimizer_on_task_change,
         lr=args.lr,
@@ -157,12 +186,17 @@ def main(parser: argparse.ArgumentParser):
         model_path=args.model_path,
         timestamp=timestamp,
         exploration_kind=args.exploration_kind,
+        profile_epochs=args.profile_epochs,
     )
 
     sac_class, sac_arg_names = CLMethod[cl_method.upper()].value
     cl_args = [vars(args)[arg] for arg in sac_arg_names]
     sac = sac_class(*cl_args, **sac_kwargs)
     sac.run()
+    cl_env.close()
+    if env_registry is not None:
+        env_registry.close()
+    logger.close()
 
 
 if __name__ == "__main__":
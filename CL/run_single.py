@@ -4,10 +4,12 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 import argparse
 from datetime import datetime
+from functools import partial
 
 import tensorflow as tf
 
 from CL.replay.buffers import BufferType
+from CL.rl.evaluation import EnvMetadata
 from CL.rl.sac import SAC
 from CL.utils.logging import EpochLogger, WandBLogger
 from CL.utils.running import get_activation_from_str
@@ -56,17 +58,29 @@ def main(parser: argparse.ArgumentParser):
         render_sleep=args.render_sleep,
         resolution=args.resolution,
         variable_queue_length=args.variable_queue_length,
+        native_capture=args.native_capture,
+        grayscale=args.grayscale,
         action_space_fn=build_multi_discrete_actions,
     )
     wrapper_conf = update_wrapper_config(default_wrapper_config, args)
     wrapper_conf['record_dir'] = record_dir
+    if args.compact_replay:
+        # The raw frames are rescaled and normalized by the agent instead
+        wrapper_conf['rescale'] = wrapper_conf['normalize_observation'] = False
 
     # Create the environment
     env = make_env(scenario_enum, args.envs[0], task_idx, scenario_kwargs, doom_kwargs, wrapper_conf)
-    test_envs = [make_env(scenario_enum, task, task_idx, scenario_kwargs, doom_kwargs, wrapper_conf)
-                 for task in args.test_envs]
+    test_env_fns = [partial(make_env, scenario_enum, task, task_idx, scenario_kwargs, doom_kwargs, wrapper_conf)
+                    for task in args.test_envs]
+    if args.parallel_test or (args.background_test and not args.test_only):
+        # The test episodes are played in worker processes, so only the metadata of the test tasks is required
+        test_envs = [EnvMetadata(env_fn) for env_fn in test_env_fns]
+    else:
+        test_envs = [env_fn() for env_fn in test_env_fns]
     if not test_envs and args.test_only:
         test_envs = [env]
+        test_env_fns = [partial(make_env, scenario_enum, args.envs[0], task_idx, scenario_kwargs, doom_kwargs,
+                                wrapper_conf)]
 
     policy_kwargs = dict(
         hidden_sizes=args.hidden_sizes,
@@ -102,9 +116,22 @@ def main(parser: argparse.ArgumentParser):
         timestamp=timestamp,
         test_only=args.test_only,
         num_test_eps=args.test_episodes,
+        test_env_fns=test_env_fns,
+        parallel_test=args.parallel_test,
+        background_test=args.background_test,
         buffer_type=BufferType(args.buffer_type),
+        compact_replay=args.compact_replay,
+        deduplicate_frames=args.deduplicate_frames,
+        prefetch_batches=args.prefetch_batches,
+        batch_augmentation=args.batch_augmentation,
+        frame_channels=1 if args.grayscale else 3,
+        in_graph_updates=args.in_graph_updates,
+        shared_encoder=args.shared_encoder,
+        async_updates=args.async_updates,
+        profile_epochs=args.profile_epochs,
     )
     sac.run()
+    logger.close()
 
 
 if __name__ == "__main__":
@@ -3,6 +3,7 @@
 Some simple logging functionality, inspired by rllab's logging.
 
 Logs to a tab-separated-values file (path/to/output_directory/progress.txt)
+and optionally to memory-mappable .npy columns (path/to/output_directory/progress/)
 
 """
 import argparse
@@ -11,7 +12,9 @@ import json
 import logging
 import os
 import os.path as osp
+import threading
 import time
+from collections import deque
 from typing import List
 
 import numpy as np
@@ -42,6 +45,73 @@ def colorize(string, color, bold=False, highlight=False):
     return "\x1b[%sm%s\x1b[0m" % (";".join(attr), string)
 
 
+class NpyColumnWriter:
+    """
+    Appends the logged rows to a directory with a .npy file per column.
+
+    Each file holds a float64 array with a value per row. Its header is
+    updated after the values are appended, so the file is a valid array of
+    the rows written so far at any time. It can be memory-mapped with
+    ``np.load(path, mmap_mode='r')``, also while the training is running.
+    The key of every column and the name of its file are listed in
+    ``schema.json``. The rows before a column first appeared, and the rows
+    without a numeric value for it, are NaN.
+    """
+
+    def __init__(self, output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.columns = {}
+        self.files = {}
+        self.num_rows = 0
+
+    @staticmethod
+    def _write_header(file, length):
+        file.seek(0)
+        np.lib.format.write_array_header_1_0(file, {"descr": "<f8", "fortran_order": False, "shape": (length,)})
+
+    @staticmethod
+    def _to_float(val):
+        try:
+            return float(val)
+        except (TypeError, ValueError):
+            return np.nan
+
+    def _add_column(self, key):
+        file_name = f"column_{len(self.columns):04d}.npy"
+        file = open(osp.join(self.output_dir, file_name), "w+b")
+        self._write_header(file, self.num_rows)
+        np.full(self.num_rows, np.nan).tofile(file)
+        self.columns[key] = file_name
+        self.files[key] = file
+
+    def _write_schema(self):
+        path = osp.join(self.output_dir, "schema.json")
+        with open(path + ".tmp", "w") as out:
+            json.dump({"dtype": "float64", "columns": self.columns}, out, indent=4)
+        os.replace(path + ".tmp", path)
+
+    def write(self, rows):
+        """Appends a batch of (headers, row, step) tuples."""
+        new_keys = [key for headers, _, _ in rows for key in headers if key not in self.columns]
+        for key in dict.fromkeys(new_keys):
+            self._add_column(key)
+        if new_keys:
+            self._write_schema()
+
+        for key, file in self.files.items():
+            file.seek(0, os.SEEK_END)
+            np.array([self._to_float(row.get(key)) for _, row, _ in rows], dtype=np.float64).tofile(file)
+        self.num_rows += len(rows)
+        for file in self.files.values():
+            self._write_header(file, self.num_rows)
+            file.flush()
+
+    def close(self):
+        for file in self.files.values():
+            file.close()
+
+
 class Logger:
     """
     A general-purpose logger.
@@ -59,6 +129,7 @@ class Logger:
             output_fname="progress.tsv",
             exp_name=None,
             with_mrunner=False,
+            queue_size=100,
     ):
         """
         Initialize a Logger.
@@ -77,6 +148,15 @@ class Logger:
                 will know to group them. (Use case: if you run the same
                 hyperparameter configuration with multiple random seeds, you
                 should give them all the same ``exp_name``.)
+
+            queue_size (int): Number of rows which can wait to be written by
+                each of the background workers. When the worker of the remote
+                outputs, i.e. Neptune, falls behind further, the oldest waiting
+                rows are dropped for the remote outputs only, and counted in
+                the ``logger/dropped_remote_rows`` column. The local outputs
+                never drop rows, so ``dump_tabular`` waits for their worker
+                instead. If 0, the rows are written synchronously by
+                ``dump_tabular``.
         """
         self.logger_output = logger_output
 
@@ -90,7 +170,10 @@ class Logger:
         self.output_file = None
         if "tsv" in self.logger_output:
             self.output_file = open(osp.join(self.output_dir, output_fname), "w")
-            atexit.register(self.output_file.close)
+
+        self.npy_writer = None
+        if "npy" in self.logger_output:
+            self.npy_writer = NpyColumnWriter(osp.join(self.output_dir, "progress"))
 
         if "neptune" in self.logger_output:
             if with_mrunner:
@@ -116,6 +199,27 @@ class Logger:
         self.log_current_row = {}
         self.exp_name = exp_name
 
+        # The rows are written to the local outputs and sent to the remote ones by background workers, off the
+        # training thread. Only the remote outputs, whose requests may stall, can drop rows to keep up.
+        self.queue_size = queue_size
+        self.dropped_remote_rows = 0
+        self._pending_rows = deque()
+        self._pending_remote_rows = deque()
+        self._rows_condition = threading.Condition()
+        self._closed = False
+        self._writer_error = None
+        self._writers = []
+        if queue_size > 0:
+            self._writers.append(threading.Thread(target=self._writer_loop, args=(self._pending_rows, self._write_rows),
+                                                  name='LoggingWorker', daemon=True))
+            if "neptune" in self.logger_output:
+                self._writers.append(threading.Thread(target=self._writer_loop,
+                                                      args=(self._pending_remote_rows, self._send_rows),
+                                                      name='RemoteLoggingWorker', daemon=True))
+        for writer in self._writers:
+            writer.start()
+        atexit.register(self.close)
+
     def log(self, msg, color="green"):
         """Print a colorized message to stdout."""
         # Add a formatted date time to the message
@@ -190,25 +294,65 @@ class Logger:
         """
         Write all of the diagnostics from the current iteration.
 
-        Writes both to stdout, and to the output file.
+        Writes both to stdout, and to the output file. Unless the logger is
+        synchronous, the row is only queued here and written in the
+        background.
         """
-        vals = []
-        key_lens = [len(key) for key in self.log_headers]
-        max_key_len = max(15, max(key_lens))
-        keystr = "%" + "%d" % max_key_len
-        fmt = "| " + keystr + "s | %15s |"
-        n_slashes = 22 + max_key_len
-        print("-" * n_slashes)
-        step = self.log_current_row.get("total_env_steps")
-        scalar_start = time.time()
-        for key in self.log_headers:
-            val = self.log_current_row.get(key, 0.0)
-            valstr = "%8.3g" % val if hasattr(val, "__float__") else val
-            print(fmt % (key, valstr))
-            vals.append(val)
-
-            # Log to Neptune
+        if "neptune" in self.logger_output:
+            self.log_tabular("logger/dropped_remote_rows", self.dropped_remote_rows)
+        row = (list(self.log_headers), dict(self.log_current_row), self.log_current_row.get("total_env_steps"))
+        self.log_current_row.clear()
+        if not self._writers:
+            self._write_rows([row])
+            if "neptune" in self.logger_output:
+                self._send_rows([row])
+            return
+
+        if self._writer_error is not None:
+            raise RuntimeError("The logging worker has failed") from self._writer_error
+        with self._rows_condition:
+            self._rows_condition.wait_for(
+                lambda: len(self._pending_rows) < self.queue_size or self._writer_error is not None
+            )
+            if self._writer_error is not None:
+                raise RuntimeError("The logging worker has failed") from self._writer_error
+            self._pending_rows.append(row)
+            dropped = False
             if "neptune" in self.logger_output:
+                dropped = len(self._pending_remote_rows) >= self.queue_size
+                if dropped:
+                    self._pending_remote_rows.popleft()
+                    self.dropped_remote_rows += 1
+                self._pending_remote_rows.append(row)
+            self._rows_condition.notify_all()
+        if dropped:
+            print(colorize(f"Warning: The remote logging worker is falling behind, dropped {self.dropped_remote_rows} "
+                           f"row(s)", "red", bold=True))
+
+    def _writer_loop(self, pending_rows, write_rows):
+        """Writes the queued rows in batches until the logger is closed and all of them have been written."""
+        while True:
+            with self._rows_condition:
+                self._rows_condition.wait_for(lambda: pending_rows or self._closed)
+                if not pending_rows:
+                    return
+                rows = list(pending_rows)
+                pending_rows.clear()
+                # Wakes up dump_tabular if it waits for the queue to drain
+                self._rows_condition.notify_all()
+            try:
+                write_rows(rows)
+            except BaseException as e:
+                with self._rows_condition:
+                    self._writer_error = e
+                    self._rows_condition.notify_all()
+                return
+
+    def _send_rows(self, rows):
+        """Sends the rows to Neptune, retrying every metric several times."""
+        for headers, row, step in rows:
+            for key in headers:
+                val = row.get(key, 0.0)
                 # Try several times.
                 for _ in range(10):
                     try:
@@ -217,25 +361,125 @@ class Logger:
                         time.sleep(5)
                     else:
                         break
-            if "tensorboard" in self.logger_output:
-                tf.summary.scalar(key, data=val, step=step)
 
-        print("Scalar logging time: ", time.time() - scalar_start)
+    def _write_rows(self, rows):
+        """Prints the rows and writes them to the local outputs, flushing every output once per batch."""
+        for headers, row, step in rows:
+            key_lens = [len(key) for key in headers]
+            max_key_len = max(15, max(key_lens))
+            keystr = "%" + "%d" % max_key_len
+            fmt = "| " + keystr + "s | %15s |"
+            n_slashes = 22 + max_key_len
+            lines = ["-" * n_slashes]
+            for key in headers:
+                val = row.get(key, 0.0)
+                valstr = "%8.3g" % val if hasattr(val, "__float__") else val
+                lines.append(fmt % (key, valstr))
+            lines.append("-" * n_slashes)
+            # A single print, so that the table is not interleaved with the messages of the training thread
+            print("\n".join(lines), flush=True)
 
         if "tensorboard" in self.logger_output:
-            flush_start = time.time()
-            tf.summary.flush()
-            print(f"Flushed tensorboard in {time.time() - flush_start:.2f} seconds")
-        print("-" * n_slashes, flush=True)
+            # The default writer set in the constructor is local to the training thread
+            with self.tb_writer.as_default():
+                for headers, row, step in rows:
+                    for key in headers:
+                        tf.summary.scalar(key, data=row.get(key, 0.0), step=step)
+            self.tb_writer.flush()
+
         if self.output_file is not None:
-            write_out_start = time.time()
-            if self.first_row:
-                self.output_file.write("\t".join(self.log_headers) + "\n")
-            self.output_file.write("\t".join(map(str, vals)) + "\n")
+            lines = []
+            for headers, row, _ in rows:
+                if self.first_row:
+                    lines.append("\t".join(headers))
+                    self.first_row = False
+                lines.append("\t".join(str(row.get(key, 0.0)) for key in headers))
+            self.output_file.write("\n".join(lines) + "\n")
             self.output_file.flush()
-            print(f"Wrote to output file in {time.time() - write_out_start:.2f} seconds")
-        self.log_current_row.clear()
-        self.first_row = False
+
+        if self.npy_writer is not None:
+            self.npy_writer.write(rows)
+
+    def close(self):
+        """
+        Waits for the queued rows to be written and closes the outputs.
+
+        Called at exit as well, so calling it explicitly is optional.
+        """
+        if self._closed:
+            return
+        with self._rows_condition:
+            self._closed = True
+            self._rows_condition.notify_all()
+        for writer in self._writers:
+            writer.join()
+        self._writers = []
+        if self._writer_error is not None:
+            print(colorize(f"Warning: The logging worker has failed: {self._writer_error!r}", "red", bold=True))
+        if self.dropped_remote_rows:
+            print(colorize(f"Warning: {self.dropped_remote_rows} row(s) were not sent to the remote outputs", "red"))
+        if self.output_file is not None and not self.output_file.closed:
+            self.output_file.close()
+        if self.npy_writer is not None:
+            self.npy_writer.close()
+        if "tensorboard" in self.logger_output:
+            self.tb_writer.flush()
+
+
+class StreamingStatistics:
+    """
+    Mean, standard deviation, minimum and maximum of a stream of values, kept in constant memory.
+
+    Every stored value, either a scalar or an array of any shape, contributes all of its elements. Arrays are first
+    reduced to their own moments, on the device in the case of TensorFlow tensors, and then merged into the running
+    moments with the parallel variant of Welford's algorithm.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    @staticmethod
+    def _moments(value):
+        """Returns the number of elements of a value, their mean, sum of squared deviations, minimum and maximum."""
+        if isinstance(value, tf.Tensor):
+            values = tf.reshape(tf.cast(value, tf.float64), [-1])
+            count = values.shape.num_elements()
+            if count == 0:
+                return 0, 0.0, 0.0, np.inf, -np.inf
+            mean = tf.reduce_mean(values)
+            # A single transfer from the device per stored tensor
+            reduced = tf.stack([mean, tf.reduce_sum(tf.square(values - mean)), tf.reduce_min(values),
+                                tf.reduce_max(values)]).numpy()
+            return (count, *reduced.tolist())
+        values = np.asarray(value, dtype=np.float64)
+        if values.size == 1:
+            value = values.item()
+            return 1, value, 0.0, value, value
+        if values.size == 0:
+            return 0, 0.0, 0.0, np.inf, -np.inf
+        mean = values.mean()
+        return values.size, mean, float(np.square(values - mean).sum()), values.min(), values.max()
+
+    def update(self, value):
+        count, mean, m2, minimum, maximum = self._moments(value)
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+        self.min = min(self.min, minimum)
+        self.max = max(self.max, maximum)
+
+    def stats(self):
+        if self.count == 0:
+            return [np.nan, np.nan, np.nan, np.nan]
+        return [self.mean, np.sqrt(self.m2 / self.count), self.min, self.max]
 
 
 class EpochLogger(Logger):
@@ -271,13 +515,13 @@ class EpochLogger(Logger):
         """
         Save something into the epoch_logger's current state.
 
-        Provide an arbitrary number of keyword arguments with numerical
-        values.
+        Provide a dictionary of numerical values. Every element of the NumPy
+        arrays and TensorFlow tensors among them is accumulated.
         """
         for k, v in d.items():
-            if not (k in self.epoch_dict.keys()):
-                self.epoch_dict[k] = []
-            self.epoch_dict[k].append(v)
+            if k not in self.epoch_dict:
+                self.epoch_dict[k] = StreamingStatistics()
+            self.epoch_dict[k].update(v)
 
     def log_tabular(self, key, val=None, with_min_and_max=False, average_only=False):
         """
@@ -308,17 +552,16 @@ class EpochLogger(Logger):
             if with_min_and_max:
                 super().log_tabular(key + "/max", stats[3])
                 super().log_tabular(key + "/min", stats[2])
-        self.epoch_dict[key] = []
+        self.epoch_dict.pop(key, None)
 
     def get_stats(self, key):
         """
         Lets an algorithm ask the logger for mean/std/min/max of a diagnostic.
         """
-        v = self.epoch_dict.get(key)
-        if not v:
+        statistics = self.epoch_dict.get(key)
+        if statistics is None:
             return [np.nan, np.nan, np.nan, np.nan]
-        vals = np.concatenate(v) if isinstance(v[0], np.ndarray) and len(v[0].shape) > 0 else v
-        return [np.mean(vals), np.std(vals), np.min(vals), np.max(vals)]
+        return statistics.stats()
 
 
 class WandBLogger:
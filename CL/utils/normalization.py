@@ -0,0 +1,52 @@
+from typing import Tuple
+
+import numpy as np
+from gymnasium.wrappers.normalize import RunningMeanStd
+
+
+class ObservationNormalizer:
+    """Agent-side counterpart of the Rescale and NormalizeObservation wrappers.
+
+    Keeps running statistics of individual frames and converts raw uint8 observations to normalized float32 arrays
+    only when they are fed to the networks. This allows storing the raw frames in the replay buffer.
+    Both the stacked [n_stack, h, w, c] and the channel-concatenated [h, w, n_stack * c] layouts are supported,
+    as well as batches of either of them.
+    """
+
+    def __init__(self, obs_shape: Tuple[int, ...], frame_channels: int = 3, epsilon: float = 1e-8) -> None:
+        if len(obs_shape) == 4:
+            self.frame_shape = tuple(obs_shape[1:])
+            self.n_stack = 1  # The frame statistics are broadcast over the stacking axis
+        else:
+            self.frame_shape = tuple(obs_shape[:2]) + (frame_channels,)
+            self.n_stack = obs_shape[2] // frame_channels
+        self.stacked = len(obs_shape) == 4
+        self.frame_channels = frame_channels
+        self.epsilon = epsilon
+        self.obs_rms = RunningMeanStd(shape=self.frame_shape)
+        self._mean, self._std = None, None
+
+    @staticmethod
+    def rescale(obs: np.ndarray) -> np.ndarray:
+        return np.asarray(obs, dtype=np.float32) / 255. * 2 - 1
+
+    def latest_frame(self, obs: np.ndarray) -> np.ndarray:
+        obs = np.asarray(obs)
+        return obs[-1] if self.stacked else obs[..., -self.frame_channels:]
+
+    def update(self, obs: np.ndarray) -> None:
+        """Updates the statistics with the most recent frame of a single observation."""
+        self.obs_rms.update(self.rescale(self.latest_frame(obs))[np.newaxis])
+        self._mean, self._std = None, None
+
+    def statistics(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the mean and standard deviation broadcastable to a single observation."""
+        if self._mean is None:
+            self._mean = np.tile(self.obs_rms.mean, self.n_stack).astype(np.float32)
+            self._std = np.tile(np.sqrt(self.obs_rms.var + self.epsilon), self.n_stack).astype(np.float32)
+        return self._mean, self._std
+
+    def normalize(self, obs: np.ndarray) -> np.ndarray:
+        """Rescales and normalizes a single observation or a batch of observations."""
+        mean, std = self.statistics()
+        return (self.rescale(obs) - mean) / std
@@ -0,0 +1,85 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, TypeVar
+
+import tensorflow as tf
+
+T = TypeVar('T')
+
+PHASES = ['act', 'env_step', 'store', 'sample', 'learn', 'priority_update', 'test', 'checkpoint', 'log']
+
+
+class PhaseProfiler:
+    """Measures the wall-clock time spent in the phases of the training loop.
+
+    The time of every phase is accumulated over the current epoch and over the whole run, and both are written to the
+    row of the epoch by log_tabular. The row is written during the log phase, whose time is therefore reported in the
+    row of the following epoch. In the asynchronous mode the sample, learn and priority update phases run in the
+    learner thread concurrently with the others, so the phase times of an epoch may add up to more than its duration.
+
+    Optionally, a TensorFlow profiler trace is captured during the selected epochs, which can be inspected in the
+    profile tab of TensorBoard.
+
+    Args:
+        trace_epochs: Epochs to capture a TensorFlow profiler trace of, counted from 1.
+        trace_dir: Directory to store the traces in, e.g. the TensorBoard log directory.
+    """
+
+    def __init__(self, trace_epochs: Optional[List[int]] = None, trace_dir: Optional[str] = None) -> None:
+        self.trace_epochs = set(trace_epochs or [])
+        self.trace_dir = trace_dir
+        self.tracing = False
+        self.lock = threading.Lock()
+        self.epoch_times = dict.fromkeys(PHASES, 0.0)
+        self.total_times = dict.fromkeys(PHASES, 0.0)
+        self.epoch_start = time.perf_counter()
+
+    def add(self, phase: str, duration: float) -> None:
+        with self.lock:
+            self.epoch_times[phase] += duration
+            self.total_times[phase] += duration
+
+    @contextmanager
+    def phase(self, phase: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - start)
+
+    def iterate(self, phase: str, iterable: Iterable[T]) -> Iterator[T]:
+        """Yields the items of the iterable, attributing the time spent waiting for each of them to the phase."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.add(phase, time.perf_counter() - start)
+            yield item
+
+    def begin_epoch(self, epoch: int) -> None:
+        """Starts the timing of an epoch and the capture of its trace, if it is selected."""
+        self.epoch_start = time.perf_counter()
+        if epoch in self.trace_epochs and not self.tracing:
+            tf.profiler.experimental.start(self.trace_dir)
+            self.tracing = True
+
+    def end_epoch(self) -> None:
+        if self.tracing:
+            tf.profiler.experimental.stop()
+            self.tracing = False
+
+    def log_tabular(self, logger) -> None:
+        """Logs the epoch and cumulative times of the phases in seconds, and resets the epoch times."""
+        with self.lock:
+            epoch_times, self.epoch_times = self.epoch_times, dict.fromkeys(PHASES, 0.0)
+            total_times = dict(self.total_times)
+        logger.log_tabular("profile/epoch", time.perf_counter() - self.epoch_start)
+        for phase in PHASES:
+            logger.log_tabular(f"profile/{phase}", epoch_times[phase])
+        for phase in PHASES:
+            logger.log_tabular(f"profile/total/{phase}", total_times[phase])
@@ -2,7 +2,7 @@ import argparse
 import random
 import string
 from datetime import datetime
-from typing import Union, Callable, Type, Dict, Optional
+from typing import Union, Callable, Type, Dict, List, Optional
 
 import gymnasium
 import numpy as np
@@ -68,6 +68,17 @@ def reset_weights(model: tf.keras.Model, model_cl: Type[tf.keras.Model], model_k
     model.set_weights(dummy_model.get_weights())
 
 
+def unique_variables(variables: List[tf.Variable]) -> List[tf.Variable]:
+    """Removes the duplicates of variables shared by several models, preserving the order."""
+    refs = set()
+    unique = []
+    for v in variables:
+        if v.ref() not in refs:
+            refs.add(v.ref())
+            unique.append(v)
+    return unique
+
+
 def get_readable_timestamp() -> str:
     return datetime.now().strftime("%Y_%m_%d__%H_%M_%S")
 
@@ -0,0 +1,64 @@
+import argparse
+import json
+import time
+from typing import Dict, List
+
+from COOM.env.builder import make_env, build_multi_discrete_actions
+from COOM.utils.config import Scenario, default_wrapper_config
+
+CAPTURE_MODES = {
+    'transpose': {},
+    'native': {'native_capture': True},
+    'grayscale': {'native_capture': True, 'grayscale': True},
+}
+
+
+def benchmark(scenario: Scenario, task: str, mode: str, steps: int, wrapper_config: Dict, seed: int) -> Dict:
+    doom_kwargs = {'env': task, 'render': False, 'seed': seed, 'action_space_fn': build_multi_discrete_actions,
+                   **CAPTURE_MODES[mode]}
+    env = make_env(scenario, task, doom_kwargs=doom_kwargs, wrapper_config=wrapper_config)
+    env.reset()
+    start = time.perf_counter()
+    for _ in range(steps):
+        _, _, done, truncated, _ = env.step(env.action_space.sample())
+        if done or truncated:
+            env.reset()
+    elapsed = time.perf_counter() - start
+    result = {'scenario': scenario.name.lower(), 'task': task, 'mode': mode,
+              'resolution': f'{env.unwrapped.game_res[1]}X{env.unwrapped.game_res[0]}',
+              'obs_shape': list(env.observation_space.shape), 'steps_per_sec': steps / elapsed}
+    env.close()
+    return result
+
+
+def main(args: argparse.Namespace):
+    wrapper_config = {**default_wrapper_config, 'frame_height': args.frame_height, 'frame_width': args.frame_width,
+                      'frame_stack': args.frame_stack, 'rescale': not args.raw, 'normalize_observation': not args.raw}
+    results: List[Dict] = []
+    print(f"{'scenario':>16} {'mode':>10} {'resolution':>10} {'steps/s':>10}")
+    for scenario in args.scenarios:
+        for mode in args.modes:
+            result = benchmark(Scenario[scenario.upper()], args.task, mode, args.steps, wrapper_config, args.seed)
+            results.append(result)
+            print(f"{scenario:>16} {mode:>10} {result['resolution']:>10} {result['steps_per_sec']:>10.1f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the environment throughput with different capture modes")
+    parser.add_argument('--scenarios', type=str, nargs='+', default=[scenario.name.lower() for scenario in Scenario],
+                        choices=[scenario.name.lower() for scenario in Scenario], help="Scenarios to benchmark")
+    parser.add_argument("--task", type=str, default='default', help="Name of the environment in the scenarios")
+    parser.add_argument('--modes', type=str, nargs='+', default=list(CAPTURE_MODES), choices=list(CAPTURE_MODES),
+                        help="Capture modes to compare")
+    parser.add_argument("--steps", type=int, default=2000, help="Number of timed steps per scenario and mode")
+    parser.add_argument('--frame_height', type=int, default=84, help='Height of the frame')
+    parser.add_argument('--frame_width', type=int, default=84, help='Width of the frame')
+    parser.add_argument('--frame_stack', type=int, default=4, help='Number of frames to stack')
+    parser.add_argument('--raw', default=False, action='store_true',
+                        help='Skip the rescaling and normalization, as with a compact replay buffer')
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the environments")
+    parser.add_argument('--output', type=str, default=None, help="Optional path of a JSON file to store the results")
+    main(parser.parse_args())
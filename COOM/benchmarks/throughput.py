@@ -0,0 +1,225 @@
+import argparse
+import inspect
+import itertools
+import json
+import platform
+import subprocess
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import gymnasium
+import numpy as np
+from gymnasium import RewardWrapper
+from gymnasium.wrappers import FrameStack, NormalizeObservation
+
+from COOM.env.builder import make_env, make_vector_env, build_multi_discrete_actions
+from COOM.utils.config import Scenario, scenario_config, default_wrapper_config, CD_scenarios, CD_tasks
+from COOM.wrappers.observation import Augment, ObservationPipeline, Resize, Rescale, RGBStack
+
+WRAPPER_PRESETS = {
+    'default': {},
+    'raw': {'rescale': False, 'normalize_observation': False},  # As with a compact replay buffer
+    'fused': {'fused_pipeline': True},
+    'compiled': {'fused_pipeline': True, 'compile_rewards': True},
+    'unwrapped': {'resize': False, 'rescale': False, 'normalize_observation': False, 'frame_stack': 0},
+}
+
+STAGES = ['engine', 'transpose', 'resize', 'rescale', 'normalize', 'stack', 'pipeline', 'augment', 'reward']
+
+# The fields identifying a benchmark configuration, used to match the results of different reports
+CONFIG_KEYS = ['scenario', 'task', 'resolution', 'frame_skip', 'wrappers', 'num_envs']
+
+
+def _stage(layer: gymnasium.Wrapper) -> str:
+    """Maps a wrapper to the stage of the observation and reward processing it performs."""
+    stages = [(RewardWrapper, 'reward'), (ObservationPipeline, 'pipeline'), (Resize, 'resize'), (Rescale, 'rescale'),
+              (NormalizeObservation, 'normalize'), (FrameStack, 'stack'), (RGBStack, 'stack'), (Augment, 'augment')]
+    for wrapper_class, stage in stages:
+        if isinstance(layer, wrapper_class):
+            return stage
+    return type(layer).__name__.lower()
+
+
+class StageTimer:
+    """
+    Measures the time spent in every layer of a wrapped environment during the steps.
+
+    The step of every wrapper and of the DoomEnv is replaced by a timed version on the instance. The time of a layer
+    excludes the time of the layers it wraps. The time the DoomEnv spends converting the screen buffer is reported as
+    the transpose stage, and the rest of its step, i.e. the game tics and the statistics bookkeeping, as the engine.
+    """
+
+    def __init__(self, env: gymnasium.Env):
+        self.layers = []
+        while isinstance(env, gymnasium.Wrapper):
+            self.layers.append(env)
+            env = env.env
+        self.layers.append(env)
+        self.inclusive = np.zeros(len(self.layers))
+        self.transpose = 0.0
+        self._in_step = False
+        for i, layer in enumerate(self.layers):
+            layer.step = self._timed(layer.step, i)
+        get_frame = env._get_frame
+
+        def timed_get_frame(state):
+            start = time.perf_counter()
+            frame = get_frame(state)
+            if self._in_step:
+                self.transpose += time.perf_counter() - start
+            return frame
+
+        env._get_frame = timed_get_frame
+
+    def _timed(self, step: Callable, index: int) -> Callable:
+        def timed_step(action):
+            self._in_step = True
+            start = time.perf_counter()
+            result = step(action)
+            self.inclusive[index] += time.perf_counter() - start
+            self._in_step = False
+            return result
+
+        return timed_step
+
+    def stages(self, steps: int) -> Dict[str, float]:
+        """Returns the mean time per step of every stage in milliseconds."""
+        exclusive = self.inclusive - np.append(self.inclusive[1:], 0.0)
+        stages = defaultdict(float)
+        for layer, duration in zip(self.layers[:-1], exclusive[:-1]):
+            stages[_stage(layer)] += duration
+        stages['engine'] = exclusive[-1] - self.transpose
+        stages['transpose'] = self.transpose
+        return {stage: round(float(duration) / steps * 1e3, 4) for stage, duration in stages.items()}
+
+
+def _tasks(scenario: Scenario, tasks: List[str], cd_tasks: bool) -> List[str]:
+    """Returns the given tasks, and the Cross-Domain variants if requested, which exist for the scenario."""
+    scenario_dir = Path(inspect.getfile(scenario_config[scenario]['class'])).parent
+    if cd_tasks and scenario in CD_scenarios:
+        tasks = tasks + [task for task in CD_tasks if task not in tasks]
+    return [task for task in tasks if (scenario_dir / f'{task}.wad').exists()]
+
+
+def benchmark(scenario: Scenario, task: str, resolution: Optional[str], frame_skip: int, wrappers: str,
+              num_envs: int, steps: int, seed: int, native_capture: bool) -> Dict[str, Any]:
+    doom_kwargs = {'env': task, 'render': False, 'seed': seed, 'frame_skip': frame_skip, 'resolution': resolution,
+                   'native_capture': native_capture, 'action_space_fn': build_multi_discrete_actions}
+    wrapper_config = {**default_wrapper_config, **WRAPPER_PRESETS[wrappers]}
+    result = {'scenario': scenario.name.lower(), 'task': task, 'resolution': resolution or 'default',
+              'frame_skip': frame_skip, 'wrappers': wrappers, 'num_envs': num_envs}
+
+    if num_envs == 1:
+        env = make_env(scenario, task, doom_kwargs=doom_kwargs, wrapper_config=wrapper_config)
+        env.action_space.seed(seed)
+        timer = StageTimer(env)
+        episodes = 0
+        env.reset()
+        start = time.perf_counter()
+        for _ in range(steps):
+            _, _, done, truncated, _ = env.step(env.action_space.sample())
+            if done or truncated:
+                env.reset()
+                episodes += 1
+        elapsed = time.perf_counter() - start
+        result.update(steps_per_sec=steps / elapsed, episodes=episodes, stages_ms=timer.stages(steps))
+    else:
+        # The stages run in the worker processes, so only the overall throughput is measured
+        env = make_vector_env(scenario, task, num_envs, doom_kwargs=doom_kwargs, wrapper_config=wrapper_config,
+                              statistics_mode=None)
+        env.action_space.seed(seed)
+        env.reset()
+        start = time.perf_counter()
+        for _ in range(steps):
+            env.step([env.action_space.sample() for _ in range(num_envs)])
+        elapsed = time.perf_counter() - start
+        result.update(steps_per_sec=steps * num_envs / elapsed, stages_ms={})
+    env.close()
+    return result
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _key(result: Dict[str, Any]) -> Tuple:
+    return tuple(result[key] for key in CONFIG_KEYS)
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str) -> None:
+    """Prints the speedup of every configuration over its result in a baseline report."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    baseline_results = {_key(result): result for result in baseline['results']}
+    print(f"\nComparison with {baseline_path} (commit {baseline.get('commit')})")
+    for result in results:
+        reference = baseline_results.get(_key(result))
+        if reference is None:
+            continue
+        speedup = result['steps_per_sec'] / reference['steps_per_sec']
+        print(f"{' '.join(str(value) for value in _key(result)):>60} {speedup:>8.2f}x")
+
+
+def main(args: argparse.Namespace):
+    results = []
+    print(f"{'scenario':>16} {'task':>10} {'resolution':>10} {'skip':>4} {'wrappers':>10} {'envs':>4} {'steps/s':>10}"
+          f"  stages (ms/step)")
+    for scenario_name in args.scenarios:
+        scenario = Scenario[scenario_name.upper()]
+        grid = itertools.product(_tasks(scenario, args.tasks, args.cd_tasks), args.resolutions, args.frame_skips,
+                                 args.wrappers, args.num_envs)
+        for task, resolution, frame_skip, wrappers, num_envs in grid:
+            result = benchmark(scenario, task, None if resolution == 'default' else resolution, frame_skip, wrappers,
+                               num_envs, args.steps, args.seed, args.native_capture)
+            results.append(result)
+            stages = ' '.join(f'{stage}={result["stages_ms"][stage]:.3f}' for stage in STAGES
+                              if stage in result['stages_ms'])
+            print(f"{scenario_name:>16} {task:>10} {resolution:>10} {frame_skip:>4} {wrappers:>10} {num_envs:>4} "
+                  f"{result['steps_per_sec']:>10.1f}  {stages}")
+
+    report = {
+        'commit': _commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'platform': {'python': platform.python_version(), 'machine': platform.machine(),
+                     'processor': platform.processor()},
+        'config': vars(args),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the environment throughput and the cost of each stage")
+    parser.add_argument('--scenarios', type=str, nargs='+', default=[scenario.name.lower() for scenario in Scenario],
+                        choices=[scenario.name.lower() for scenario in Scenario], help="Scenarios to benchmark")
+    parser.add_argument('--tasks', type=str, nargs='+', default=['default', 'hard'],
+                        help="Tasks to benchmark in every scenario, where available")
+    parser.add_argument('--cd_tasks', default=False, action='store_true',
+                        help="Also benchmark the Cross-Domain variants of the scenarios which have them")
+    parser.add_argument('--resolutions', type=str, nargs='+', default=['default'],
+                        choices=['default', '800X600', '640X480', '320X240', '160X120'],
+                        help="Screen resolutions. The default is the one of the scenario configuration")
+    parser.add_argument('--frame_skips', type=int, nargs='+', default=[4], help="Frame skips")
+    parser.add_argument('--wrappers', type=str, nargs='+', default=['default'], choices=list(WRAPPER_PRESETS),
+                        help="Wrapper configurations")
+    parser.add_argument('--num_envs', type=int, nargs='+', default=[1],
+                        help="Vector widths. A width of 1 runs a single environment in process and measures the stages")
+    parser.add_argument('--native_capture', default=False, action='store_true',
+                        help="Capture the frames in the channel-last format")
+    parser.add_argument("--steps", type=int, default=2000, help="Number of timed steps per configuration")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the environments and the actions")
+    parser.add_argument('--output', type=str, default=None, help="Optional path of a JSON file to store the report")
+    parser.add_argument('--baseline', type=str, default=None,
+                        help="Optional path of a previous report to compare the throughput against")
+    main(parser.parse_args())
@@ -1,12 +1,16 @@
 import itertools
-from typing import Dict, List
+from functools import partial
+from typing import Callable, Dict, List, Optional
 
 from gymnasium.wrappers import NormalizeObservation, FrameStack, RecordVideo
 
 from COOM.env.scenario import DoomEnv
+from COOM.env.vector import VectorDoomEnv
 from COOM.utils.config import Sequence, sequence_scenarios, sequence_tasks, scenario_config, Scenario, \
     default_wrapper_config
-from COOM.wrappers.observation import Augment, Resize, Rescale, RGBStack
+from COOM.wrappers.observation import Augment, ObservationPipeline, Resize, Rescale, RGBStack
+from COOM.wrappers.recording import ActionRecorder
+from COOM.wrappers.reward import CompiledRewardWrapper
 
 
 def make_sequence(sequence: Sequence,
@@ -30,10 +34,27 @@ def make_sequence(sequence: Sequence,
         List[DoomEnv]: A list of Doom environment instances.
     """
 
+    env_fns = make_sequence_fns(sequence, random_order, scenarios_kwargs, doom_kwargs, wrapper_config, task_idx)
+    return [env_fn() for env_fn in env_fns]
+
+
+def make_sequence_fns(sequence: Sequence,
+                      random_order: bool = False,
+                      scenarios_kwargs: List[Dict[str, any]] = None,
+                      doom_kwargs: Dict[str, any] = None,
+                      wrapper_config: Dict[str, any] = None,
+                      task_idx: int = None) -> List[Callable[..., DoomEnv]]:
+    """
+    Creates picklable functions, which build the environments of the given sequence on demand.
+
+    Returns:
+        List[Callable[..., DoomEnv]]: A list of functions creating the Doom environments.
+    """
+
     # Retrieve scenarios and tasks based on the sequence
     scenarios = sequence_scenarios[sequence]
     tasks = sequence_tasks[sequence]
-    return make_envs(scenarios, tasks, random_order, task_idx, scenarios_kwargs, doom_kwargs, wrapper_config)
+    return make_env_fns(scenarios, tasks, random_order, task_idx, scenarios_kwargs, doom_kwargs, wrapper_config)
 
 
 def make_envs(scenarios: List[Scenario],
@@ -43,6 +64,24 @@ def make_envs(scenarios: List[Scenario],
               scenarios_kwargs: List[Dict[str, any]] = None,
               doom_kwargs: Dict[str, any] = None,
               wrapper_config: Dict[str, any] = None) -> List[DoomEnv]:
+    env_fns = make_env_fns(scenarios, tasks, random_order, task_idx, scenarios_kwargs, doom_kwargs, wrapper_config)
+    return [env_fn() for env_fn in env_fns]
+
+
+def make_env_fns(scenarios: List[Scenario],
+                 tasks: List[str],
+                 random_order: bool = False,
+                 task_idx: int = None,
+                 scenarios_kwargs: List[Dict[str, any]] = None,
+                 doom_kwargs: Dict[str, any] = None,
+                 wrapper_config: Dict[str, any] = None) -> List[Callable[..., DoomEnv]]:
+    """
+    Creates picklable functions, which build the same environments as make_envs, e.g. in worker processes.
+    The functions accept an optional seed, so that several differently seeded instances of an environment can be made.
+
+    Returns:
+        List[Callable[..., DoomEnv]]: A list of functions creating the Doom environments.
+    """
 
     # Optionally shuffle scenarios and tasks for randomization
     if random_order:
@@ -54,8 +93,8 @@ def make_envs(scenarios: List[Scenario],
     scenarios_kwargs = scenarios_kwargs or [{} for _ in range(len(scenarios))]
     doom_kwargs = doom_kwargs or {}
 
-    # Create and wrap environments
-    envs = []
+    # Create the functions which create and wrap the environments
+    env_fns = []
     for i, pair in enumerate(itertools.product(zip(scenarios, scenarios_kwargs), tasks)):
         # If task_idx is specified, use that otherwise use the current index.
         task_id = task_idx if task_idx is not None else i
@@ -63,9 +102,8 @@ def make_envs(scenarios: List[Scenario],
         task = pair[1]
         scenario = scenario_and_kwargs[0]
         scenario_kwargs = scenario_and_kwargs[1]
-        env = make_env(scenario, task, task_id, scenario_kwargs, doom_kwargs, wrapper_config)
-        envs.append(env)
-    return envs
+        env_fns.append(partial(make_env, scenario, task, task_id, scenario_kwargs, doom_kwargs, wrapper_config))
+    return env_fns
 
 
 def make_env(scenario: Scenario,
@@ -73,7 +111,8 @@ def make_env(scenario: Scenario,
              task_idx: int = 0,
              scenario_kwargs: Dict[str, any] = None,
              doom_kwargs: Dict[str, any] = None,
-             wrapper_config: Dict[str, any] = None) -> DoomEnv:
+             wrapper_config: Dict[str, any] = None,
+             seed: Optional[int] = None) -> DoomEnv:
     """
     Creates a single Doom environment instance with specified configurations.
 
@@ -84,6 +123,7 @@ def make_env(scenario: Scenario,
         scenario_kwargs (Dict[str, any]): Additional kwargs for the scenario.
         doom_kwargs (Dict[str, any]): Common kwargs for Doom environments.
         wrapper_config (Dict[str, any]): Configuration for environment wrappers.
+        seed (Optional[int]): Seed of the environment, overriding the one in doom_kwargs.
 
     Returns:
         DoomEnv: An instance of the Doom environment.
@@ -93,13 +133,52 @@ def make_env(scenario: Scenario,
     scenario_class = scenario_config[scenario]['class']
     scenario_kwargs = scenario_kwargs or {}
     doom_kwargs = doom_kwargs or {'env': task, 'task_idx': task_idx, 'action_space_fn': build_multi_discrete_actions}
+    if seed is not None:
+        doom_kwargs = {**doom_kwargs, 'seed': seed}
+    wrapper_config = wrapper_config or default_wrapper_config
+    if doom_kwargs.get('native_capture', False) and wrapper_config.get('resize', False):
+        # Let the game render the frames as close to the size they are resized to as possible
+        doom_kwargs = {**doom_kwargs, 'capture_size': (wrapper_config['frame_height'], wrapper_config['frame_width'])}
     env = scenario_class(doom_kwargs, **scenario_kwargs)
 
     # Apply wrappers to the environment
-    env = wrap_env(env, wrapper_config or default_wrapper_config)
+    env = wrap_env(env, wrapper_config)
     return env
 
 
+def make_vector_env(scenario: Scenario,
+                    task: str = 'default',
+                    num_envs: int = 4,
+                    task_idx: int = 0,
+                    scenario_kwargs: Dict[str, any] = None,
+                    doom_kwargs: Dict[str, any] = None,
+                    wrapper_config: Dict[str, any] = None,
+                    **vector_kwargs) -> VectorDoomEnv:
+    """
+    Creates a pool of identical Doom environments running in parallel worker processes.
+    Every instance is seeded differently, so that the workers do not produce the same episodes.
+
+    Args:
+        scenario (Scenario): The specific Doom scenario to create.
+        task (str): The task name within the scenario.
+        num_envs (int): The number of parallel environment instances.
+        task_idx (int): The index of the task within the scenario.
+        scenario_kwargs (Dict[str, any]): Additional kwargs for the scenario.
+        doom_kwargs (Dict[str, any]): Common kwargs for Doom environments.
+        wrapper_config (Dict[str, any]): Configuration for environment wrappers.
+        **vector_kwargs: Additional kwargs for the VectorDoomEnv.
+
+    Returns:
+        VectorDoomEnv: The vectorized environment.
+    """
+    doom_kwargs = doom_kwargs or {'env': task, 'task_idx': task_idx, 'action_space_fn': build_multi_discrete_actions,
+                                  'render': False}
+    seed = doom_kwargs.get('seed', 0)
+    env_fns = [partial(make_env, scenario, task, task_idx, scenario_kwargs, {**doom_kwargs, 'seed': seed + i},
+                       wrapper_config) for i in range(num_envs)]
+    return VectorDoomEnv(env_fns, **vector_kwargs)
+
+
 def wrap_env(env: DoomEnv, wrap_conf: Dict[str, any]):
     """
     Applies a series of wrappers to the Doom environment based on the provided configuration.
@@ -115,25 +194,43 @@ def wrap_env(env: DoomEnv, wrap_conf: Dict[str, any]):
     # Apply reward wrappers based on the sparse_rewards configuration
     sparse_rewards = wrap_conf.get('sparse_rewards', False)
     reward_wrappers = env.reward_wrappers_sparse() if sparse_rewards else env.reward_wrappers_dense()
-    for wrapper in reward_wrappers:
-        env = wrapper.wrapper_class(env, **wrapper.kwargs)
+    if wrap_conf.get('compile_rewards', False):
+        env = CompiledRewardWrapper(env, reward_wrappers)
+    else:
+        for wrapper in reward_wrappers:
+            env = wrapper.wrapper_class(env, **wrapper.kwargs)
 
     # Apply various observation and utility wrappers
     if wrap_conf.get('augment', False):
         env = Augment(env, wrap_conf['augmentation'])
     if wrap_conf.get('resize', False):
         assert wrap_conf.get('frame_height', None) is not None and wrap_conf.get('frame_width', None) is not None
-        env = Resize(env, wrap_conf['frame_height'], wrap_conf['frame_width'])
-    if wrap_conf.get('rescale', False):
-        env = Rescale(env)
-    if wrap_conf.get('normalize_observation', False):
-        env = NormalizeObservation(env)
-    if wrap_conf.get('frame_stack', False):
-        env = FrameStack(env, wrap_conf['frame_stack'])
-    if wrap_conf.get('lstm', False):
-        env = RGBStack(env)
+    if wrap_conf.get('fused_pipeline', False):
+        # A single wrapper with preallocated buffers performs all the observation transformations below
+        resize = wrap_conf.get('resize', False)
+        env = ObservationPipeline(env,
+                                  height=wrap_conf['frame_height'] if resize else None,
+                                  width=wrap_conf['frame_width'] if resize else None,
+                                  rescale=wrap_conf.get('rescale', False),
+                                  normalize=wrap_conf.get('normalize_observation', False),
+                                  num_stack=wrap_conf.get('frame_stack', False) or 0,
+                                  concat_frames=wrap_conf.get('lstm', False))
+    else:
+        if wrap_conf.get('resize', False):
+            env = Resize(env, wrap_conf['frame_height'], wrap_conf['frame_width'])
+        if wrap_conf.get('rescale', False):
+            env = Rescale(env)
+        if wrap_conf.get('normalize_observation', False):
+            env = NormalizeObservation(env)
+        if wrap_conf.get('frame_stack', False):
+            env = FrameStack(env, wrap_conf['frame_stack'])
+        if wrap_conf.get('lstm', False):
+            env = RGBStack(env)
     if wrap_conf.get('record', False):
         env = RecordVideo(env, wrap_conf['record_dir'], episode_trigger=env.video_schedule, name_prefix=f'{env.name}')
+    if wrap_conf.get('record_actions', False):
+        env = ActionRecorder(env, wrap_conf['record_dir'], episode_trigger=env.video_schedule,
+                             name_prefix=f'{env.name}')
     return env
 
 
@@ -1,23 +1,51 @@
-from typing import Any, Dict, List, Tuple, Optional, Union
+from collections.abc import Sequence as SequenceABC
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple, Optional, Union
 
 import gymnasium
 import numpy as np
 from numpy import ndarray
 
 from COOM.env.base import BaseEnv
-from COOM.env.builder import make_sequence
+from COOM.env.builder import make_sequence_fns
+from COOM.env.registry import EnvRegistry
 from COOM.env.scenario import DoomEnv
 from COOM.utils.config import Sequence
 
 
+class _LazyEnvs(SequenceABC):
+    """Read-only list view of the environments of a ContinualLearningEnv, which creates them when accessed."""
+
+    def __init__(self, cl_env: 'ContinualLearningEnv'):
+        self.cl_env = cl_env
+
+    def __len__(self) -> int:
+        return self.cl_env.num_tasks
+
+    def __getitem__(self, idx: int) -> DoomEnv:
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(f"Task index {idx} out of range")
+        return self.cl_env.get_env(idx)
+
+
 class ContinualLearningEnv(BaseEnv):
     """
     A class for creating a continual learning environment composed of a sequence of Doom environments,
     suitable for task-incremental learning.
 
+    The environments are created lazily, when a task is activated or accessed for the first time, and the game
+    of a finished task can be shut down with close_task. Only the active environment is thus running at a time.
+    Optionally, a bounded warm pool of the upcoming environments is created in a background thread, so that
+    switching to the next task does not wait for its game to start.
+
     Attributes:
         steps_per_env (int): The number of steps to be executed in each environment before switching to the next.
-        envs (List[DoomEnv]): A list of Doom environment instances created based on the specified sequence.
+        env_fns (List[Callable[..., DoomEnv]]): Functions creating the environments of the sequence.
+        envs (Sequence[DoomEnv]): A list view of the Doom environments, creating them on access.
         _num_tasks (int): The total number of tasks (environments) in the continual learning setup.
         steps (int): The total number of steps across all environments.
         cur_seq_idx (int): The current index of the active environment in the sequence.
@@ -31,6 +59,11 @@ class ContinualLearningEnv(BaseEnv):
         scenario_config (List[Dict[str, any]], optional): A list of dictionaries with specific keyword arguments for each scenario in the sequence.
         doom_config (Dict[str, any], optional): Common keyword arguments applicable to all Doom environments in the sequence.
         wrapper_config (Dict[str, any], optional): Configuration for observation and reward wrappers to be applied to each environment.
+        warm_pool_size (int, optional): Number of upcoming environments to create in advance. Defaults to 0.
+        registry (EnvRegistry, optional): A pool to lease the environments from, instead of creating and closing
+            them, e.g. to share them with the evaluation. Defaults to None.
+        env_fns (List[Callable[..., BaseEnv]], optional): Functions creating the environments, which replace those of
+            the sequence, e.g. to benchmark the agents on stub environments. Defaults to None.
     """
 
     def __init__(self,
@@ -41,20 +74,76 @@ class ContinualLearningEnv(BaseEnv):
                  scenario_config: List[Dict[str, any]] = None,
                  doom_config: Dict[str, any] = None,
                  wrapper_config: Dict[str, any] = None,
+                 warm_pool_size: int = 0,
+                 registry: Optional[EnvRegistry] = None,
+                 env_fns: Optional[List[Callable[..., BaseEnv]]] = None,
                  ):
         self.steps_per_env = steps_per_env
-        self.envs = make_sequence(sequence, random_order, scenario_config, doom_config, wrapper_config)
-        self._num_tasks = len(self.envs)
+        self.env_fns = env_fns if env_fns is not None else make_sequence_fns(sequence, random_order, scenario_config,
+                                                                             doom_config, wrapper_config)
+        self._num_tasks = len(self.env_fns)
         self.steps = steps_per_env * self.num_tasks
         self.cur_seq_idx = start_from
         self.cur_step = 0
+        self.warm_pool_size = warm_pool_size
+        self.registry = registry
+        self._envs: Dict[int, DoomEnv] = {}
+        self._warming: Dict[int, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='WarmPool') if warm_pool_size > 0 \
+            else None
+        self._fill_warm_pool()
+
+    def _fill_warm_pool(self) -> None:
+        """Starts creating the environments of the tasks following the active one in the background."""
+        if self._executor is None:
+            return
+        last_task = min(self.cur_seq_idx + self.warm_pool_size, self.num_tasks - 1)
+        for task_idx in range(self.cur_seq_idx + 1, last_task + 1):
+            if task_idx not in self._envs and task_idx not in self._warming:
+                self._warming[task_idx] = self._executor.submit(self._create_env, task_idx)
+
+    def _create_env(self, task_idx: int) -> DoomEnv:
+        env_fn = self.env_fns[task_idx]
+        return env_fn() if self.registry is None else self.registry.acquire(env_fn)
+
+    def get_env(self, task_idx: int) -> DoomEnv:
+        """
+        Returns the environment of the given task, creating it if necessary.
+
+        Args:
+            task_idx (int): Index of the task in the sequence.
+
+        Returns:
+            DoomEnv: The environment of the task.
+        """
+        if task_idx not in self._envs:
+            future = self._warming.pop(task_idx, None)
+            self._envs[task_idx] = future.result() if future is not None else self._create_env(task_idx)
+        return self._envs[task_idx]
+
+    def close_task(self, task_idx: int) -> None:
+        """
+        Closes the environment of the given task, if it has been created. It is created anew when accessed again.
+        An environment leased from a registry is given back to it instead.
+
+        Args:
+            task_idx (int): Index of the task in the sequence.
+        """
+        future = self._warming.pop(task_idx, None)
+        env = future.result() if future is not None else self._envs.pop(task_idx, None)
+        if env is None:
+            return
+        if self.registry is None:
+            env.close()
+        else:
+            self.registry.release(self.env_fns[task_idx], env)
 
     def _check_steps_bound(self) -> None:
         if self.cur_step >= self.steps:
             raise RuntimeError("Steps limit exceeded for ContinualLearningEnv!")
 
     def get_active_env(self) -> DoomEnv:
-        return self.tasks[self.cur_seq_idx]
+        return self.get_env(self.cur_seq_idx)
 
     @property
     def name(self) -> str:
@@ -74,19 +163,19 @@ class ContinualLearningEnv(BaseEnv):
 
     @property
     def action_space(self) -> gymnasium.spaces.Discrete:
-        return self.tasks[0].action_space
+        return self.get_active_env().action_space
 
     @property
     def observation_space(self) -> gymnasium.Space:
-        return self.tasks[0].observation_space
+        return self.get_active_env().observation_space
 
     @property
-    def tasks(self):
-        return self.envs
+    def envs(self) -> SequenceABC:
+        return _LazyEnvs(self)
 
-    @tasks.setter
-    def tasks(self, envs):
-        self.envs = envs
+    @property
+    def tasks(self) -> SequenceABC:
+        return self.envs
 
     def step(self, action: int) -> Tuple[np.ndarray, float, bool, bool, Dict[str, Any]]:
         self._check_steps_bound()
@@ -101,6 +190,7 @@ class ContinualLearningEnv(BaseEnv):
 
             if self.cur_seq_idx < self.num_tasks - 1:
                 self.cur_seq_idx += 1
+                self._fill_warm_pool()
 
         return obs, reward, done, truncated, info
 
@@ -110,10 +200,16 @@ class ContinualLearningEnv(BaseEnv):
     def reset(self, *, seed: Optional[int] = None, options: Optional[dict] = None, ) -> Tuple[Union[ndarray, ndarray],
                                                                                               Dict[str, Any]]:
         self._check_steps_bound()
-        return self.get_active_env().reset()
+        return self.get_active_env().reset(seed=seed, options=options)
 
     def get_statistics(self, mode: str = '') -> Dict[str, float]:
         return self.get_active_env().get_statistics(mode)
 
     def clear_episode_statistics(self) -> None:
         return self.get_active_env().clear_episode_statistics()
+
+    def close(self) -> None:
+        for task_idx in list(self._envs) + list(self._warming):
+            self.close_task(task_idx)
+        if self._executor is not None:
+            self._executor.shutdown()
@@ -0,0 +1,173 @@
+import threading
+from collections import defaultdict
+from collections.abc import Sequence as SequenceABC
+from functools import partial
+from typing import Any, Callable, Dict, Hashable, List, Set
+
+from COOM.env.base import BaseEnv
+
+
+def _freeze(obj: Any) -> Hashable:
+    """Converts the containers of an object into hashable equivalents, so that equal configurations are equal keys."""
+    if isinstance(obj, dict):
+        return tuple(sorted(((key, _freeze(value)) for key, value in obj.items()), key=lambda item: repr(item[0])))
+    if isinstance(obj, (list, tuple)):
+        return tuple(_freeze(value) for value in obj)
+    if isinstance(obj, set):
+        return frozenset(_freeze(value) for value in obj)
+    return obj
+
+
+class _RegisteredEnvs(SequenceABC):
+    """Read-only list view of the environments of the given functions, which are created in the pool when accessed."""
+
+    def __init__(self, registry: 'EnvRegistry', env_fns: List[Callable[..., BaseEnv]]):
+        self.registry = registry
+        self.env_fns = env_fns
+
+    def __len__(self) -> int:
+        return len(self.env_fns)
+
+    def __getitem__(self, idx: int) -> BaseEnv:
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        return self.registry.register(self.env_fns[idx])
+
+
+class EnvRegistry:
+    """
+    A pool of environment instances, which are shared between the training and the evaluation.
+
+    Environments are identified by the functions creating them. Partial functions are compared by their arguments,
+    so the functions built separately for the training sequence and for the test environments, e.g. by
+    make_sequence_fns and make_env_fns, refer to the same pooled instance when they describe the same scenario, task
+    and wrapper configuration. The pool keeps a single instance per configuration, which is created on first use.
+
+    An instance is leased by acquire until it is given back with release. An exclusive lease of an instance which is
+    already in use forks a state-isolated spare instance, e.g. to evaluate the agent on the task which is being
+    trained, and the spare is closed again when it is released. A shared lease borrows the instance even if it is in
+    use, in which case its users have to coordinate the stepping and resetting of the environment themselves.
+    """
+
+    def __init__(self):
+        self._instances: Dict[Hashable, List[BaseEnv]] = defaultdict(list)
+        self._leases: Dict[int, int] = defaultdict(int)
+        # Keys whose instance is being created, so that concurrent users wait for it instead of creating another one
+        self._creating: Set[Hashable] = set()
+        self._lock = threading.Condition()
+
+    @staticmethod
+    def key(env_fn: Callable[..., BaseEnv]) -> Hashable:
+        """
+        Returns the key of the pool of instances created by the given function.
+
+        Args:
+            env_fn (Callable): The function creating the environment.
+
+        Returns:
+            Hashable: The key identifying equally configured environments.
+        """
+        if isinstance(env_fn, partial):
+            return env_fn.func, _freeze(env_fn.args), _freeze(env_fn.keywords)
+        return env_fn
+
+    def register(self, env_fn: Callable[..., BaseEnv]) -> BaseEnv:
+        """
+        Returns an instance of the environment without leasing it, creating one if the pool is empty.
+        The instance may be acquired by another user at any time, so it should only be used for its metadata.
+
+        Args:
+            env_fn (Callable): The function creating the environment.
+
+        Returns:
+            BaseEnv: An instance of the environment.
+        """
+        key = self.key(env_fn)
+        with self._lock:
+            self._lock.wait_for(lambda: key not in self._creating)
+            if self._instances[key]:
+                return self._instances[key][0]
+            self._creating.add(key)
+        return self._create(key, env_fn, lease=False)
+
+    def view(self, env_fns: List[Callable[..., BaseEnv]]) -> SequenceABC:
+        """
+        Returns a list view of the environments of the given functions, which are only created when accessed.
+
+        Args:
+            env_fns (List[Callable]): The functions creating the environments.
+
+        Returns:
+            Sequence[BaseEnv]: The environments, to be used for their metadata.
+        """
+        return _RegisteredEnvs(self, env_fns)
+
+    def _create(self, key: Hashable, env_fn: Callable[..., BaseEnv], lease: bool) -> BaseEnv:
+        """Creates an instance of the environment for the key, which the caller has marked as being created."""
+        try:
+            env = env_fn()
+            with self._lock:
+                self._instances[key].append(env)
+                if lease:
+                    self._leases[id(env)] += 1
+        finally:
+            with self._lock:
+                self._creating.discard(key)
+                self._lock.notify_all()
+        return env
+
+    def acquire(self, env_fn: Callable[..., BaseEnv], exclusive: bool = True) -> BaseEnv:
+        """
+        Leases an instance of the environment, creating it if the pool has none.
+
+        Args:
+            env_fn (Callable): The function creating the environment.
+            exclusive (bool): Whether the instance must not be in use by anyone else. If the instance of the pool is
+                leased already, an exclusive lease forks a new instance, while a shared lease borrows the leased one.
+
+        Returns:
+            BaseEnv: An instance of the environment.
+        """
+        key = self.key(env_fn)
+        with self._lock:
+            self._lock.wait_for(lambda: key not in self._creating)
+            instances = self._instances[key]
+            idle = [env for env in instances if self._leases[id(env)] == 0]
+            if idle or (instances and not exclusive):
+                env = idle[0] if idle else instances[0]
+                self._leases[id(env)] += 1
+                return env
+            self._creating.add(key)
+        return self._create(key, env_fn, lease=True)
+
+    def release(self, env_fn: Callable[..., BaseEnv], env: BaseEnv) -> None:
+        """
+        Gives a leased instance back to the pool. A spare instance, i.e. one of several of the same configuration,
+        is closed once it is no longer leased by anyone.
+
+        Args:
+            env_fn (Callable): The function the instance has been acquired with.
+            env (BaseEnv): The leased instance.
+        """
+        key = self.key(env_fn)
+        with self._lock:
+            self._leases[id(env)] -= 1
+            if self._leases[id(env)] > 0 or len(self._instances[key]) == 1:
+                return
+            del self._leases[id(env)]
+            self._instances[key].remove(env)
+        env.close()
+
+    def num_instances(self) -> int:
+        """Returns the number of environment instances currently held by the registry."""
+        with self._lock:
+            return sum(len(instances) for instances in self._instances.values())
+
+    def close(self) -> None:
+        """Closes all the instances of the pool."""
+        with self._lock:
+            for instances in self._instances.values():
+                for env in instances:
+                    env.close()
+            self._instances.clear()
+            self._leases.clear()
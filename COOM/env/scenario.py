@@ -1,15 +1,121 @@
-from collections import deque
+import math
 from pathlib import Path
-from typing import Dict, Tuple, Any, List, Optional, Callable
+from typing import Dict, Tuple, Any, List, Optional, Callable, Iterator, Sequence
 
 import cv2
 import gymnasium
 import numpy as np
 import vizdoom as vzd
-from vizdoom import ScreenResolution, GameVariable
+from vizdoom import ScreenFormat, ScreenResolution, GameVariable
 
 from COOM.env.base import BaseEnv
-from COOM.utils.utils import get_screen_resolution
+from COOM.utils.utils import get_screen_resolution, get_capture_resolution
+
+
+class GameVariableBuffer:
+    """
+    A fixed-size ring buffer of the game variables of the most recent steps, preallocated as a single numpy array.
+
+    It supports the subset of the deque interface used by the scenarios and the reward wrappers: appending, clearing,
+    len, iteration and indexing from either end. Indexing returns a view of the stored row, which is overwritten once
+    the buffer wraps around, so the values have to be read before further steps are taken.
+
+    Args:
+        maxlen (int): Number of steps kept in the buffer.
+    """
+
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+        self._data: Optional[np.ndarray] = None  # Allocated on the first append, when the number of variables is known
+        self._start = 0
+        self._len = 0
+
+    def append(self, game_variables: Sequence[float]) -> None:
+        if self._data is None:
+            self._data = np.zeros((self.maxlen, len(game_variables)), dtype=np.float64)
+        self._data[(self._start + self._len) % self.maxlen] = game_variables
+        if self._len < self.maxlen:
+            self._len += 1
+        else:
+            self._start = (self._start + 1) % self.maxlen
+
+    def clear(self) -> None:
+        self._start = 0
+        self._len = 0
+
+    def _position(self, index: int) -> int:
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError('Game variable buffer index out of range')
+        return (self._start + index) % self.maxlen
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        return self._data[self._position(index)]
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        for i in range(self._len):
+            yield self[i]
+
+    def column(self, var_index: int) -> np.ndarray:
+        """
+        Returns the values of a single game variable from the oldest to the most recent step.
+
+        Args:
+            var_index (int): Index of the game variable.
+
+        Returns:
+            np.ndarray: The values of the variable in chronological order.
+        """
+        if not self._len:
+            return np.empty(0, dtype=np.float64)
+        return self._data[(self._start + np.arange(self._len)) % self.maxlen, var_index]
+
+    def distance(self, x_index: int, y_index: int) -> float:
+        """
+        Calculates the Euclidean distance between the oldest and the most recent location in the buffer.
+
+        Args:
+            x_index (int): Index of the game variable holding the x coordinate.
+            y_index (int): Index of the game variable holding the y coordinate.
+
+        Returns:
+            float: The distance traversed over the steps kept in the buffer.
+        """
+        first, last = self[0], self[-1]
+        return math.hypot(last[x_index] - first[x_index], last[y_index] - first[y_index])
+
+
+class StatisticAccumulator:
+    """
+    Incrementally accumulates a per-step statistic of an episode, so that its mean is available in constant time
+    without keeping the history of values.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+
+    def append(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.last = value
+
+    def mean(self) -> float:
+        """Returns the mean of the accumulated values, or NaN if there are none, as np.mean of an empty list."""
+        return self.total / self.count if self.count else float('nan')
+
+    def clear(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+
+    def __len__(self) -> int:
+        return self.count
 
 
 class DoomEnv(BaseEnv):
@@ -33,7 +139,7 @@ class DoomEnv(BaseEnv):
         _action_space (gymnasium.spaces.Discrete): The action space of the environment.
         _observation_space (gymnasium.spaces.Box): The observation space of the environment.
         user_variables (Dict[GameVariable, float]): Custom variables for tracking game state.
-        game_variable_buffer (deque): A buffer for storing recent game variables for statistics.
+        game_variable_buffer (GameVariableBuffer): A buffer for storing recent game variables for statistics.
 
     Args:
         env (str): Name of the specific Doom environment scenario.
@@ -48,6 +154,11 @@ class DoomEnv(BaseEnv):
         test_only (bool): Whether the environment is being used for testing only.
         resolution (str): Predefined resolution for the game screen.
         variable_queue_length (int): Length of the game variable buffer.
+        native_capture (bool): Whether ViZDoom should provide the screen buffer in the channel-last format, so that
+            the frames do not have to be transposed. The format of the scenario configuration is channel-first.
+        grayscale (bool): Whether to capture single channel grayscale frames. Requires native_capture.
+        capture_size (Tuple[int, int]): Height and width the observations are going to be resized to. With native
+            capture, the smallest screen resolution fitting them is used, unless a resolution is given explicitly.
     """
 
     def __init__(self,
@@ -62,8 +173,12 @@ class DoomEnv(BaseEnv):
                  render_sleep: float = 0.0,
                  test_only: bool = False,
                  resolution: str = None,
-                 variable_queue_length: int = 5):
+                 variable_queue_length: int = 5,
+                 native_capture: bool = False,
+                 grayscale: bool = False,
+                 capture_size: Optional[Tuple[int, int]] = None):
         super().__init__()
+        assert native_capture or not grayscale, "Grayscale frames require the native capture"
         self.env_name = env
         self.task_idx = task_idx
         self.scenario = self.__module__.split('.')[-1]
@@ -91,10 +206,16 @@ class DoomEnv(BaseEnv):
             self.frame_skip = 1
         elif resolution:  # Use a particular predefined resolution
             self.game.set_screen_resolution(get_screen_resolution(resolution))
+        elif native_capture and capture_size is not None:  # Render no more pixels than the observations keep
+            self.game.set_screen_resolution(get_capture_resolution(*capture_size))
+        self.native_capture = native_capture
+        self.grayscale = grayscale
+        if native_capture:
+            self.game.set_screen_format(ScreenFormat.GRAY8 if grayscale else ScreenFormat.RGB24)
         self.game.init()
 
         # Define the observation space
-        self.game_res = (self.game.get_screen_height(), self.game.get_screen_width(), 3)
+        self.game_res = (self.game.get_screen_height(), self.game.get_screen_width(), 1 if grayscale else 3)
         self._observation_space = gymnasium.spaces.Box(low=0, high=255, shape=self.game_res, dtype=np.uint8)
 
         # Define the action space
@@ -105,7 +226,7 @@ class DoomEnv(BaseEnv):
         self.user_variables = {var: 0.0 for var in self.user_vars}
 
         # Initialize the game variable queue
-        self.game_variable_buffer = deque(maxlen=variable_queue_length)
+        self.game_variable_buffer = GameVariableBuffer(variable_queue_length)
 
     @property
     def task(self) -> str:
@@ -149,13 +270,16 @@ class DoomEnv(BaseEnv):
         Resets the environment to its initial state and returns the initial observation.
 
         Args:
-            seed (Optional[int]): Seed for random number generator.
+            seed (Optional[int]): Seed of the game for the new episode. If None, the game keeps drawing from the
+                random number generator seeded at creation.
             options (Optional[dict]): Additional options for environment reset.
 
         Returns:
             observation (np.ndarray): Initial state observation of the environment.
             info (Dict[str, Any]): Additional information about the initial state.
         """
+        if seed is not None:
+            self.game.set_seed(seed)
         try:
             self.game.new_episode()
         except vzd.ViZDoomIsNotRunningException:
@@ -163,9 +287,15 @@ class DoomEnv(BaseEnv):
             self.game.init()
             self.game.new_episode()
         self.clear_episode_statistics()
-        state = self.game.get_state().screen_buffer
-        state = np.transpose(state, [1, 2, 0])
-        return state, {}
+        return self._get_frame(self.game.get_state()), {}
+
+    def _get_frame(self, state: Optional[vzd.GameState]) -> np.ndarray:
+        """Returns the screen buffer of the state in the channel-last layout of the observation space."""
+        if not state:
+            return np.zeros(self.game_res, dtype=np.uint8)
+        if not self.native_capture:
+            return np.transpose(state.screen_buffer, [1, 2, 0])
+        return state.screen_buffer.reshape(self.game_res)
 
     def step(self, action: int) -> Tuple[np.ndarray, float, bool, bool, Dict[str, Any]]:
         """
@@ -191,7 +321,7 @@ class DoomEnv(BaseEnv):
         truncated = False
         info = {}
 
-        observation = np.transpose(state.screen_buffer, [1, 2, 0]) if state else np.float32(np.zeros(self.game_res))
+        observation = self._get_frame(state)
         if not done:
             self.game_variable_buffer.append(state.game_variables)
         if self.render_enabled:
@@ -237,12 +367,12 @@ class DoomEnv(BaseEnv):
         """
         return {}
 
-    def store_statistics(self, game_vars: deque) -> None:
+    def store_statistics(self, game_vars: GameVariableBuffer) -> None:
         """
         Stores statistics based on the game variables.
 
         Args:
-            game_vars (deque): A deque containing game variables for statistics.
+            game_vars (GameVariableBuffer): A buffer containing the game variables of the recent steps.
         """
         pass
 
@@ -297,14 +427,13 @@ class DoomEnv(BaseEnv):
         Returns:
             img (List[np.ndarray] or np.ndarray): Rendered image of the environment state.
         """
-        state = self.game.get_state()
-        img = np.transpose(state.screen_buffer, [1, 2, 0]) if state else np.uint8(np.zeros(self.game_res))
+        img = self._get_frame(self.game.get_state())
         if mode == 'human':
             if not self.render_enabled:
                 return [img]
             try:
                 # Render the image to the screen with swapped red and blue channels
-                cv2.imshow('DOOM', img[:, :, [2, 1, 0]])
+                cv2.imshow('DOOM', img if self.grayscale else img[:, :, [2, 1, 0]])
                 cv2.waitKey(1)
             except Exception as e:
                 print(f'Screen rendering unsuccessful: {e}')
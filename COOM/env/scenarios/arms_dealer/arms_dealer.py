@@ -1,11 +1,7 @@
-from collections import deque
-
-import numpy as np
 from typing import Dict, List
 from vizdoom import GameVariable
 
-from COOM.env.scenario import DoomEnv
-from COOM.utils.utils import distance_traversed
+from COOM.env.scenario import DoomEnv, GameVariableBuffer, StatisticAccumulator
 from COOM.wrappers.reward import WrapperHolder, ConstantRewardWrapper, MovementRewardWrapper, \
     UserVariableRewardWrapper
 
@@ -33,15 +29,15 @@ class ArmsDealer(DoomEnv):
         self.penalty_passivity = penalty_passivity
         self.reward_weapon = reward_weapon_ad
         self.reward_delivery = reward_delivery
-        self.distance_buffer = []
+        self.distance_buffer = StatisticAccumulator()
 
     @property
     def user_vars(self) -> List[GameVariable]:
         return [GameVariable.USER1, GameVariable.USER2]
 
-    def store_statistics(self, game_var_buf: deque) -> None:
+    def store_statistics(self, game_var_buf: GameVariableBuffer) -> None:
         if len(game_var_buf) > 1:
-            distance = distance_traversed(game_var_buf, 0, 1)
+            distance = game_var_buf.distance(0, 1)
             self.distance_buffer.append(distance)
 
     def get_success_metric(self) -> float:
@@ -69,7 +65,7 @@ class ArmsDealer(DoomEnv):
     def extra_statistics(self, mode: str = '') -> Dict[str, float]:
         return {f'{mode}/weapons_acquired': self.user_variables[GameVariable.USER1],
                 f'{mode}/arms_dealt': self.user_variables[GameVariable.USER2],
-                f'{mode}/movement': np.mean(self.distance_buffer).round(3)}
+                f'{mode}/movement': round(self.distance_buffer.mean(), 3)}
 
     def clear_episode_statistics(self) -> None:
         super().clear_episode_statistics()
@@ -1,10 +1,6 @@
-from collections import deque
-
-import numpy as np
 from typing import Dict, List
 
-from COOM.env.scenario import DoomEnv
-from COOM.utils.utils import distance_traversed
+from COOM.env.scenario import DoomEnv, GameVariableBuffer, StatisticAccumulator
 from COOM.wrappers.reward import WrapperHolder, GameVariableRewardWrapper, MovementRewardWrapper
 
 
@@ -25,14 +21,14 @@ class Chainsaw(DoomEnv):
         super().__init__(**doom_kwargs)
         self.reward_scaler_traversal = reward_scaler_traversal
         self.reward_kill = reward_kill_chain
-        self.distance_buffer = []
+        self.distance_buffer = StatisticAccumulator()
         self.hits_taken = 0
 
-    def store_statistics(self, game_var_buf: deque) -> None:
+    def store_statistics(self, game_var_buf: GameVariableBuffer) -> None:
         if len(game_var_buf) < 2:
             return
 
-        distance = distance_traversed(game_var_buf, 2, 3)
+        distance = game_var_buf.distance(2, 3)
         self.distance_buffer.append(distance)
 
         current_vars = game_var_buf[-1]
@@ -66,7 +62,7 @@ class Chainsaw(DoomEnv):
         variables = self.game_variable_buffer[-1]
         return {f'{mode}/health': variables[0],
                 f'{mode}/kills': variables[1],
-                f'{mode}/movement': np.mean(self.distance_buffer).round(3),
+                f'{mode}/movement': round(self.distance_buffer.mean(), 3),
                 f'{mode}/hits_taken': self.hits_taken}
 
     def clear_episode_statistics(self) -> None:
@@ -1,10 +1,6 @@
-from collections import deque
-
-import numpy as np
 from typing import List, Dict
 
-from COOM.env.scenario import DoomEnv
-from COOM.utils.utils import distance_traversed
+from COOM.env.scenario import DoomEnv, GameVariableBuffer, StatisticAccumulator
 from COOM.wrappers.reward import WrapperHolder, GameVariableRewardWrapper, \
     PlatformReachedRewardWrapper, ConstantRewardWrapper, CumulativeVariableRewardWrapper
 
@@ -34,13 +30,13 @@ class FloorIsLava(DoomEnv):
         self.reward_frame_survived = reward_frame_survived
         self.reward_scaler_traversal = reward_scaler_traversal
         self.reward_platform_reached = reward_platform_reached
-        self.distance_buffer = []
+        self.distance_buffer = StatisticAccumulator()
         self.frames_survived = 0
 
-    def store_statistics(self, game_var_buf: deque) -> None:
+    def store_statistics(self, game_var_buf: GameVariableBuffer) -> None:
         self.frames_survived += 1
         if len(game_var_buf) > 1:
-            distance = distance_traversed(game_var_buf, 1, 2)
+            distance = game_var_buf.distance(1, 2)
             self.distance_buffer.append(distance)
 
     def get_success_metric(self) -> float:
@@ -65,7 +61,7 @@ class FloorIsLava(DoomEnv):
         return 700  # Frames until the lava scorches the player
 
     def extra_statistics(self, mode: str = '') -> Dict[str, float]:
-        return {f'{mode}/movement': np.mean(self.distance_buffer).round(3)}
+        return {f'{mode}/movement': round(self.distance_buffer.mean(), 3)}
 
     def clear_episode_statistics(self) -> None:
         super().clear_episode_statistics()
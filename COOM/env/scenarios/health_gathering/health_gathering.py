@@ -1,9 +1,6 @@
-import numpy as np
-from collections import deque
 from typing import List, Dict
 
-from COOM.env.scenario import DoomEnv
-from COOM.utils.utils import distance_traversed
+from COOM.env.scenario import DoomEnv, GameVariableBuffer, StatisticAccumulator
 from COOM.wrappers.reward import WrapperHolder, ConstantRewardWrapper, GameVariableRewardWrapper
 
 
@@ -26,16 +23,16 @@ class HealthGathering(DoomEnv):
         self.reward_frame_survived = reward_frame_survived
         self.reward_health_kit = reward_health_hg
         self.penalty_health_loss = penalty_health_hg
-        self.distance_buffer = []
+        self.distance_buffer = StatisticAccumulator()
         self.frames_survived = 0
         self.kits_obtained = 0
 
-    def store_statistics(self, game_var_buf: deque) -> None:
+    def store_statistics(self, game_var_buf: GameVariableBuffer) -> None:
         self.frames_survived += 1
         if len(game_var_buf) < 2:
             return
 
-        distance = distance_traversed(game_var_buf, 1, 2)
+        distance = game_var_buf.distance(1, 2)
         self.distance_buffer.append(distance)
 
         current_vars = game_var_buf[-1]
@@ -65,7 +62,7 @@ class HealthGathering(DoomEnv):
 
     def extra_statistics(self, mode: str = '') -> Dict[str, float]:
         return {f'{mode}/kits_obtained': self.kits_obtained,
-                f'{mode}/movement': np.mean(self.distance_buffer).round(3)}
+                f'{mode}/movement': round(self.distance_buffer.mean(), 3)}
 
     def clear_episode_statistics(self) -> None:
         super().clear_episode_statistics()
@@ -1,10 +1,6 @@
-from collections import deque
-
-import numpy as np
 from typing import List, Dict
 
-from COOM.env.scenario import DoomEnv
-from COOM.utils.utils import distance_traversed
+from COOM.env.scenario import DoomEnv, GameVariableBuffer, StatisticAccumulator
 from COOM.wrappers.reward import MovementRewardWrapper, WrapperHolder, GameVariableRewardWrapper, \
     ConstantRewardWrapper
 
@@ -33,17 +29,17 @@ class HideAndSeek(DoomEnv):
         self.reward_frame_survived = reward_frame_survived
         self.reward_scaler_traversal = reward_scaler_traversal
         self.penalty_health_loss = penalty_health_has
-        self.distance_buffer = []
+        self.distance_buffer = StatisticAccumulator()
         self.frames_survived = 0
         self.kits_obtained = 0
         self.hits_taken = 0
 
-    def store_statistics(self, game_var_buf: deque) -> None:
+    def store_statistics(self, game_var_buf: GameVariableBuffer) -> None:
         self.frames_survived += 1
         if len(game_var_buf) < 2:
             return
 
-        distance = distance_traversed(game_var_buf, 1, 2)
+        distance = game_var_buf.distance(1, 2)
         self.distance_buffer.append(distance)
 
         current_vars = game_var_buf[-1]
@@ -79,7 +75,7 @@ class HideAndSeek(DoomEnv):
             return {}
         variables = self.game_variable_buffer[-1]
         return {f'{mode}/health': variables[0],
-                f'{mode}/movement': np.mean(self.distance_buffer).round(3),
+                f'{mode}/movement': round(self.distance_buffer.mean(), 3),
                 f'{mode}/hits_taken': self.hits_taken,
                 f'{mode}/kits_obtained': self.kits_obtained}
 
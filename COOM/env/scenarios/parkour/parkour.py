@@ -1,10 +1,6 @@
-from collections import deque
-
-import numpy as np
 from typing import Dict, List
 
-from COOM.env.scenario import DoomEnv
-from COOM.utils.utils import distance_traversed
+from COOM.env.scenario import DoomEnv, GameVariableBuffer, StatisticAccumulator
 from COOM.wrappers.reward import WrapperHolder, LocationVariableRewardWrapper
 
 
@@ -15,13 +11,13 @@ class Parkour(DoomEnv):
         self.reward_scaler_traversal = reward_scaler_traversal
         self.frames = 0
         self.current_height = 0
-        self.distance_buffer = []
+        self.distance_buffer = StatisticAccumulator()
 
-    def store_statistics(self, game_var_buf: deque) -> None:
+    def store_statistics(self, game_var_buf: GameVariableBuffer) -> None:
         self.frames += 1
         self.current_height = game_var_buf[-1][2]
         if len(game_var_buf) > 1:
-            distance = distance_traversed(game_var_buf, 0, 1)
+            distance = game_var_buf.distance(0, 1)
             self.distance_buffer.append(distance)
 
     def get_success_metric(self) -> float:
@@ -40,7 +36,7 @@ class Parkour(DoomEnv):
 
     def extra_statistics(self, mode: str = '') -> Dict[str, float]:
         return {f'{mode}/height': self.get_success_metric(),
-                f'{mode}/movement': np.mean(self.distance_buffer).round(3)}
+                f'{mode}/movement': round(self.distance_buffer.mean(), 3)}
 
     def clear_episode_statistics(self) -> None:
         super().clear_episode_statistics()
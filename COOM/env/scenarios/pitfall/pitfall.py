@@ -1,9 +1,7 @@
-from collections import deque
-
 from typing import Dict, List
 from vizdoom import DEAD
 
-from COOM.env.scenario import DoomEnv
+from COOM.env.scenario import DoomEnv, GameVariableBuffer, StatisticAccumulator
 from COOM.wrappers.reward import WrapperHolder, ProportionalVariableRewardWrapper, BooleanVariableRewardWrapper, \
     GoalRewardWrapper
 
@@ -35,9 +33,9 @@ class Pitfall(DoomEnv):
         self.frames = 0
         self.total_dist = 0
         self.current_dist = 0
-        self.distance_buffer = []
+        self.distance_buffer = StatisticAccumulator()
 
-    def store_statistics(self, game_var_buf: deque) -> None:
+    def store_statistics(self, game_var_buf: GameVariableBuffer) -> None:
         self.frames += 1
         self.current_dist = game_var_buf[-1][0]
         self.total_dist += self.current_dist
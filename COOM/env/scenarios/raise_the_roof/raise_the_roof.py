@@ -1,11 +1,7 @@
-from collections import deque
-
-import numpy as np
 from typing import List, Dict
 from vizdoom import GameVariable
 
-from COOM.env.scenario import DoomEnv
-from COOM.utils.utils import distance_traversed
+from COOM.env.scenario import DoomEnv, GameVariableBuffer, StatisticAccumulator
 from COOM.wrappers.reward import MovementRewardWrapper, WrapperHolder, ConstantRewardWrapper, \
     UserVariableRewardWrapper
 
@@ -32,17 +28,17 @@ class RaiseTheRoof(DoomEnv):
         self.reward_scaler_traversal = reward_scaler_traversal
         self.reward_frame_survived = reward_frame_survived
         self.reward_switch_pressed = reward_switch_pressed
-        self.distance_buffer = []
+        self.distance_buffer = StatisticAccumulator()
         self.frames_survived = 0
 
     @property
     def user_vars(self) -> List[GameVariable]:
         return [GameVariable.USER2]
 
-    def store_statistics(self, game_var_buf: deque) -> None:
+    def store_statistics(self, game_var_buf: GameVariableBuffer) -> None:
         self.frames_survived += 1
         if len(game_var_buf) > 1:
-            distance = distance_traversed(game_var_buf, 0, 1)
+            distance = game_var_buf.distance(0, 1)
             self.distance_buffer.append(distance)
 
     def get_success_metric(self) -> float:
@@ -67,7 +63,7 @@ class RaiseTheRoof(DoomEnv):
         return 640.0  # Frames until getting crushed
 
     def extra_statistics(self, mode: str = '') -> Dict[str, float]:
-        return {f'{mode}/movement': np.mean(self.distance_buffer).round(3),
+        return {f'{mode}/movement': round(self.distance_buffer.mean(), 3),
                 f'{mode}/switches_pressed': self.user_variables[GameVariable.USER2]}
 
     def clear_episode_statistics(self) -> None:
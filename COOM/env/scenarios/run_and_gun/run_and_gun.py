@@ -1,10 +1,6 @@
-from collections import deque
-
-import numpy as np
 from typing import List, Dict
 
-from COOM.env.scenario import DoomEnv
-from COOM.utils.utils import distance_traversed
+from COOM.env.scenario import DoomEnv, GameVariableBuffer, StatisticAccumulator
 from COOM.wrappers.reward import GameVariableRewardWrapper, MovementRewardWrapper, WrapperHolder
 
 
@@ -25,15 +21,15 @@ class RunAndGun(DoomEnv):
         super().__init__(**doom_kwargs)
         self.reward_scaler_traversal = reward_scaler_traversal
         self.reward_kill = reward_kill_rag
-        self.distance_buffer = []
+        self.distance_buffer = StatisticAccumulator()
         self.hits_taken = 0
         self.ammo_used = 0
 
-    def store_statistics(self, game_var_buf: deque) -> None:
+    def store_statistics(self, game_var_buf: GameVariableBuffer) -> None:
         if len(game_var_buf) < 2:
             return
 
-        distance = distance_traversed(game_var_buf, 3, 4)
+        distance = game_var_buf.distance(3, 4)
         self.distance_buffer.append(distance)
 
         current_vars = game_var_buf[-1]
@@ -70,7 +66,7 @@ class RunAndGun(DoomEnv):
         return {f'{mode}/health': variables[0],
                 f'{mode}/kills': variables[1],
                 f'{mode}/ammo': self.ammo_used,
-                f'{mode}/movement': np.mean(self.distance_buffer).round(3),
+                f'{mode}/movement': round(self.distance_buffer.mean(), 3),
                 f'{mode}/hits_taken': self.hits_taken}
 
     def clear_episode_statistics(self) -> None:
@@ -0,0 +1,248 @@
+import multiprocessing as mp
+import traceback
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import gymnasium
+import numpy as np
+
+
+def _worker(index: int, env_fn: Callable[[], gymnasium.Env], pipe, parent_pipe, autoreset: bool,
+            statistics_mode: Optional[str]) -> None:
+    """
+    Runs a single environment in a worker process and serves the commands received through the pipe.
+    Observations are written into the worker's slot of the shared memory array instead of being pickled.
+    """
+    parent_pipe.close()
+    env = None
+    shm = None
+    observations = None
+    try:
+        env = env_fn()
+        pipe.send(('ok', (env.observation_space, env.action_space)))
+        while True:
+            command, data = pipe.recv()
+            if command == 'attach':
+                name, shape, dtype = data
+                shm = shared_memory.SharedMemory(name=name)
+                observations = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+                pipe.send(('ok', None))
+            elif command == 'reset':
+                obs, info = env.reset(**data)
+                observations[index] = obs
+                pipe.send(('ok', info))
+            elif command == 'step':
+                obs, reward, done, truncated, info = env.step(data)
+                if done or truncated:
+                    if statistics_mode is not None:
+                        info['final_statistics'] = env.get_statistics(statistics_mode)
+                    if autoreset:
+                        info['final_observation'] = np.asarray(obs, dtype=observations.dtype)
+                        obs, _ = env.reset()
+                observations[index] = obs
+                pipe.send(('ok', (reward, done, truncated, info)))
+            elif command == 'call':
+                name, args, kwargs = data
+                pipe.send(('ok', getattr(env, name)(*args, **kwargs)))
+            elif command == 'get_attr':
+                pipe.send(('ok', getattr(env, data)))
+            elif command == 'close':
+                pipe.send(('ok', None))
+                break
+            else:
+                raise RuntimeError(f'Unknown command {command} received by worker {index}')
+    except KeyboardInterrupt:
+        pass
+    except Exception:
+        pipe.send(('error', traceback.format_exc()))
+    finally:
+        if env is not None:
+            env.close()
+        if shm is not None:
+            del observations
+            shm.close()
+        pipe.close()
+
+
+class VectorDoomEnv:
+    """
+    Runs several Doom environments in parallel worker processes.
+
+    Every worker owns one environment instance and writes its observations into a preallocated shared memory
+    array, so the frames never have to be pickled between processes. Only the actions, rewards, flags and info
+    dictionaries travel through the pipes. The environments are stepped concurrently, so the throughput scales
+    with the number of available cores.
+
+    Attributes:
+        num_envs (int): Number of environments running in parallel.
+        observation_space (gymnasium.Space): Observation space of a single environment.
+        action_space (gymnasium.Space): Action space of a single environment.
+        observations (np.ndarray): Shared array of shape [num_envs, *obs_shape] holding the latest observations.
+
+    Args:
+        env_fns (Sequence[Callable]): Picklable functions creating the environments, one per worker.
+        obs_dtype (np.dtype): Data type of the shared observation array. Defaults to float32, which matches the
+            output of the default wrapper stack. Use uint8 if the environments return raw frames.
+        autoreset (bool): Whether to reset an environment as soon as its episode ends. The last observation of the
+            finished episode is then provided as `final_observation` in its info dictionary.
+        statistics_mode (Optional[str]): If set, the episode statistics are collected with this mode under
+            `final_statistics` in the info dictionary when an episode ends, before the environment is reset.
+        context (str): The multiprocessing start method. Defaults to spawn, since forking a process which has
+            already initialized a game engine or the TensorFlow runtime is unsafe.
+    """
+
+    def __init__(self,
+                 env_fns: Sequence[Callable[[], gymnasium.Env]],
+                 obs_dtype: np.dtype = np.float32,
+                 autoreset: bool = True,
+                 statistics_mode: Optional[str] = 'train',
+                 context: str = 'spawn'):
+        self.num_envs = len(env_fns)
+        self.obs_dtype = np.dtype(obs_dtype)
+        self.closed = False
+        self._shm = None
+
+        ctx = mp.get_context(context)
+        self.parent_pipes, self.processes = [], []
+        for index, env_fn in enumerate(env_fns):
+            parent_pipe, child_pipe = ctx.Pipe()
+            process = ctx.Process(target=_worker, name=f'VectorDoomEnv-{index}', daemon=True,
+                                  args=(index, env_fn, child_pipe, parent_pipe, autoreset, statistics_mode))
+            process.start()
+            child_pipe.close()
+            self.parent_pipes.append(parent_pipe)
+            self.processes.append(process)
+
+        # Allocate the shared observation array once the workers have reported their spaces
+        spaces = self._receive_all(range(self.num_envs))
+        self.observation_space, self.action_space = spaces[0]
+        shape = (self.num_envs,) + tuple(self.observation_space.shape)
+        self._shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * self.obs_dtype.itemsize)
+        self.observations = np.ndarray(shape, dtype=self.obs_dtype, buffer=self._shm.buf)
+        self._send_all(range(self.num_envs), 'attach', (self._shm.name, shape, self.obs_dtype))
+        self._receive_all(range(self.num_envs))
+
+    def _indices(self, indices: Optional[Sequence[int]]) -> List[int]:
+        return list(range(self.num_envs)) if indices is None else list(indices)
+
+    def _send_all(self, indices: Sequence[int], command: str, data: Any = None) -> None:
+        for i in indices:
+            self.parent_pipes[i].send((command, data))
+
+    def _receive_all(self, indices: Sequence[int]) -> List[Any]:
+        results, errors = [], []
+        for i in indices:
+            status, result = self.parent_pipes[i].recv()
+            if status == 'error':
+                errors.append(f'Worker {i}:\n{result}')
+            results.append(result)
+        if errors:
+            self.close(terminate=True)
+            raise RuntimeError('\n'.join(errors))
+        return results
+
+    def reset(self, indices: Optional[Sequence[int]] = None, **kwargs) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """
+        Resets the environments and returns their initial observations.
+
+        Args:
+            indices (Optional[Sequence[int]]): Environments to reset. Defaults to all of them.
+            **kwargs: Keyword arguments passed on to the reset of every environment.
+
+        Returns:
+            observations (np.ndarray): Copy of the initial observations of the selected environments.
+            infos (List[Dict[str, Any]]): The info dictionaries of the selected environments.
+        """
+        indices = self._indices(indices)
+        self._send_all(indices, 'reset', kwargs)
+        infos = self._receive_all(indices)
+        return self.observations[indices], infos
+
+    def step(self, actions: Sequence[int], indices: Optional[Sequence[int]] = None) -> Tuple[
+        np.ndarray, np.ndarray, np.ndarray, np.ndarray, List[Dict[str, Any]]]:
+        """
+        Performs one action in each of the selected environments concurrently.
+
+        Args:
+            actions (Sequence[int]): One action per selected environment.
+            indices (Optional[Sequence[int]]): Environments to step. Defaults to all of them.
+
+        Returns:
+            observations (np.ndarray): Copy of the current observations of the selected environments.
+            rewards (np.ndarray): The rewards achieved by the actions.
+            dones (np.ndarray): Whether the episodes have ended.
+            truncated (np.ndarray): Whether the episodes were truncated.
+            infos (List[Dict[str, Any]]): The info dictionaries of the selected environments.
+        """
+        indices = self._indices(indices)
+        assert len(actions) == len(indices), 'Exactly one action is required per environment'
+        for i, action in zip(indices, actions):
+            self.parent_pipes[i].send(('step', int(action)))
+        rewards, dones, truncated, infos = zip(*self._receive_all(indices))
+        return (self.observations[indices], np.array(rewards, dtype=np.float32), np.array(dones, dtype=bool),
+                np.array(truncated, dtype=bool), list(infos))
+
+    def call(self, name: str, *args, indices: Optional[Sequence[int]] = None, **kwargs) -> List[Any]:
+        """
+        Calls a method of the selected environments and returns the results.
+
+        Args:
+            name (str): The name of the method.
+            indices (Optional[Sequence[int]]): Environments to call the method on. Defaults to all of them.
+
+        Returns:
+            List[Any]: The return values of the method, one per selected environment.
+        """
+        indices = self._indices(indices)
+        self._send_all(indices, 'call', (name, args, kwargs))
+        return self._receive_all(indices)
+
+    def get_attr(self, name: str, indices: Optional[Sequence[int]] = None) -> List[Any]:
+        """
+        Retrieves an attribute from the selected environments.
+
+        Args:
+            name (str): The name of the attribute.
+            indices (Optional[Sequence[int]]): Environments to query. Defaults to all of them.
+
+        Returns:
+            List[Any]: The value of the attribute in each selected environment.
+        """
+        indices = self._indices(indices)
+        self._send_all(indices, 'get_attr', name)
+        return self._receive_all(indices)
+
+    def close(self, terminate: bool = False) -> None:
+        """
+        Shuts down the worker processes and releases the shared memory.
+
+        Args:
+            terminate (bool): Whether to kill the workers instead of asking them to shut down.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if not terminate:
+            for pipe in self.parent_pipes:
+                try:
+                    pipe.send(('close', None))
+                    pipe.recv()
+                except (BrokenPipeError, EOFError):
+                    pass
+        for process in self.processes:
+            if terminate:
+                process.terminate()
+            process.join()
+        for pipe in self.parent_pipes:
+            pipe.close()
+        if self._shm is not None:
+            self.observations = None
+            self._shm.close()
+            self._shm.unlink()
+
+    def __len__(self) -> int:
+        return self.num_envs
+
+    def __del__(self):
+        if not getattr(self, 'closed', True):
+            self.close()
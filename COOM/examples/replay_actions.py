@@ -0,0 +1,40 @@
+import argparse
+from pathlib import Path
+
+import cv2
+
+from COOM.wrappers.recording import load_action_trace, replay_action_trace
+
+
+def main(args: argparse.Namespace):
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for path in args.traces:
+        trace = load_action_trace(path)
+        video_path = output_dir / f'{Path(path).stem}.mp4'
+        fps = args.fps or 35 / (1 if args.smooth else trace['frame_skip'])  # ViZDoom runs at 35 tics per second
+        writer = None
+        frames = 0
+        for frame in replay_action_trace(trace, args.resolution, args.smooth):
+            if writer is None:
+                writer = cv2.VideoWriter(str(video_path), cv2.VideoWriter_fourcc(*'mp4v'), fps,
+                                         (frame.shape[1], frame.shape[0]))
+            writer.write(frame[:, :, [2, 1, 0]])  # OpenCV expects BGR frames
+            frames += 1
+        if writer is not None:
+            writer.release()
+        print(f"{trace['scenario']}-{trace['task']} episode {trace['episode_id']}: {len(trace['actions'])} actions, "
+              f"{frames} frames written to {video_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the episodes recorded as action traces into videos")
+    parser.add_argument('traces', type=str, nargs='+', help="Paths of the .npz action traces")
+    parser.add_argument('--output_dir', type=str, default='videos', help="Directory to save the videos in")
+    parser.add_argument('--resolution', type=str, default='800X600',
+                        choices=['800X600', '640X480', '320X240', '160X120'], help="Screen resolution of the videos")
+    parser.add_argument('--smooth', default=False, action='store_true',
+                        help="Render a frame for every tic instead of one per action")
+    parser.add_argument('--fps', type=float, default=None,
+                        help="Frame rate of the videos. Defaults to the real-time speed of the game")
+    main(parser.parse_args())
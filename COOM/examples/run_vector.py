@@ -0,0 +1,42 @@
+import argparse
+import time
+
+import numpy as np
+
+from COOM.env.builder import make_vector_env, build_multi_discrete_actions
+from COOM.utils.config import Scenario
+
+
+def main(args: argparse.Namespace):
+    scenario = Scenario[args.scenario.upper()]
+    doom_kwargs = {'env': args.task, 'render': False, 'seed': args.seed,
+                   'action_space_fn': build_multi_discrete_actions}
+    env = make_vector_env(scenario, args.task, args.num_envs, doom_kwargs=doom_kwargs)
+    env.reset()
+    episodes = 0
+    successes = []
+    start = time.time()
+    for steps in range(args.steps):
+        actions = [env.action_space.sample() for _ in range(env.num_envs)]
+        state, reward, done, truncated, infos = env.step(actions)
+        for info in infos:
+            if 'final_statistics' in info:
+                episodes += 1
+                successes.append(info['final_statistics']['train/success'])
+    elapsed = time.time() - start
+    print(f"{args.steps * env.num_envs} steps in {elapsed:.2f}s ({args.steps * env.num_envs / elapsed:.1f} steps/s). "
+          f"Episodes: {episodes}. Success: {np.mean(successes) if successes else 0:.2f}")
+    env.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Continual Doom")
+    parser.add_argument('--scenario', type=str, default='health_gathering',
+                        choices=['health_gathering', 'run_and_gun', 'chainsaw', 'raise_the_roof', 'floor_is_lava',
+                                 'hide_and_seek', 'arms_dealer', 'pitfall'])
+    parser.add_argument("--task", type=str, default='hard',
+                        help="Name of the environments in the scenario(s) to run")
+    parser.add_argument("--num_envs", type=int, default=4, help="Number of environments to run in parallel")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first environment")
+    parser.add_argument("--steps", type=int, default=1000, help="Number of vectorized steps to perform")
+    main(parser.parse_args())
@@ -117,7 +117,10 @@ default_wrapper_config = {
     'normalize_observation': True,
     'frame_stack': 4,
     'lstm': False,
+    'fused_pipeline': False,
     'record': False,
+    'record_actions': False,
     'record_dir': 'videos',
     'sparse_rewards': False,
+    'compile_rewards': False,
 }
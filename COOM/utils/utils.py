@@ -1,7 +1,4 @@
-from collections import deque
-
 import numpy as np
-from scipy import spatial
 from vizdoom import ScreenResolution
 
 resolutions = {'800X600': ScreenResolution.RES_800X600,
@@ -16,12 +13,16 @@ def get_screen_resolution(resolution: str) -> ScreenResolution:
     return resolutions[resolution]
 
 
-def distance_traversed(game_var_buf: deque, x_index: int, y_index: int) -> float:
-    coordinates_curr = [game_var_buf[-1][x_index],
-                        game_var_buf[-1][y_index]]
-    coordinates_past = [game_var_buf[0][x_index],
-                        game_var_buf[0][y_index]]
-    return spatial.distance.euclidean(coordinates_curr, coordinates_past)
+def get_capture_resolution(height: int, width: int) -> ScreenResolution:
+    """Returns the ViZDoom resolution with the fewest pixels, which is at least as high and as wide as the frame."""
+    candidates = []
+    for name, resolution in ScreenResolution.__members__.items():
+        res_width, res_height = map(int, name[len('RES_'):].split('X'))
+        if res_width >= width and res_height >= height:
+            candidates.append((res_width * res_height, resolution))
+    if not candidates:
+        raise ValueError(f'No screen resolution fits a {height}x{width} frame')
+    return min(candidates, key=lambda candidate: candidate[0])[1]
 
 
 def combine_frames(obs):
@@ -2,7 +2,8 @@ import cv2
 import gymnasium
 import numpy as np
 from gymnasium.spaces import Box
-from typing import Tuple, Dict, Any
+from gymnasium.wrappers.normalize import RunningMeanStd
+from typing import Tuple, Dict, Any, Optional
 
 from COOM.env.scenario import DoomEnv
 from COOM.utils.utils import combine_frames
@@ -15,8 +16,8 @@ class Rescale(gymnasium.Wrapper):
     def __init__(self, env):
         gymnasium.Wrapper.__init__(self, env)
 
-    def reset(self) -> Tuple[np.ndarray, Dict[str, Any]]:
-        state, info = self.env.reset()
+    def reset(self, **kwargs) -> Tuple[np.ndarray, Dict[str, Any]]:
+        state, info = self.env.reset(**kwargs)
         return state / 255. * 2 - 1, info
 
     def step(self, action: int) -> Tuple[np.ndarray, float, bool, bool, Dict[str, Any]]:
@@ -25,23 +26,156 @@ class Rescale(gymnasium.Wrapper):
 
 
 class Resize(gymnasium.Wrapper):
-    """Resize the observation space."""
+    """Resize the observation space. The frames are passed through if the game already renders them at the size."""
 
     def __init__(self, env, height=84, width=84):
         gymnasium.Wrapper.__init__(self, env)
         assert height > 0 and width > 0, f"Invalid shape: {height}x{width}"
         self.shape = (height, width)
+        self.passthrough = self.observation_space.shape[:2] == self.shape
 
         obs_shape = self.shape + self.observation_space.shape[2:]
         self.observation_space = Box(low=0, high=255, shape=obs_shape, dtype=np.uint8)
 
-    def reset(self) -> Tuple[np.ndarray, Dict[str, Any]]:
-        state, info = self.env.reset()
-        return cv2.resize(state, self.shape), info
+    def resize(self, state: np.ndarray) -> np.ndarray:
+        if self.passthrough:
+            return state
+        # OpenCV expects the size as (width, height) and drops a single channel axis
+        return cv2.resize(state, self.shape[::-1]).reshape(self.observation_space.shape)
+
+    def reset(self, **kwargs) -> Tuple[np.ndarray, Dict[str, Any]]:
+        state, info = self.env.reset(**kwargs)
+        return self.resize(state), info
 
     def step(self, action: int) -> Tuple[np.ndarray, float, bool, bool, Dict[str, Any]]:
         state, reward, done, truncated, info = self.env.step(action)
-        return cv2.resize(state, self.shape), reward, done, truncated, info
+        return self.resize(state), reward, done, truncated, info
+
+
+class ObservationPipeline(gymnasium.Wrapper):
+    """Fused equivalent of the Resize, Rescale, NormalizeObservation, FrameStack and RGBStack wrappers.
+
+    Every stage writes into buffers allocated once, instead of creating new arrays on each step. The normalization
+    statistics are updated in place with the same operations as the RunningMeanStd of gymnasium, in float64, so the
+    observations match the ones of the wrapper chain up to the conversion to the output dtype, which the networks
+    perform anyway. The stacked observations are written into a few rotating output buffers. An observation is
+    therefore only valid until num_buffers further observations have been produced, and has to be copied to be kept
+    for longer. The default of two buffers covers the transitions stored by the agents.
+
+    Args:
+        env (gymnasium.Env): The environment producing channel-last uint8 frames.
+        height (Optional[int]): Height to resize the frames to. No resizing if None.
+        width (Optional[int]): Width to resize the frames to. No resizing if None.
+        rescale (bool): Whether to rescale the frames to [-1, 1], as Rescale.
+        normalize (bool): Whether to normalize the frames with running statistics, as NormalizeObservation.
+        num_stack (int): Number of frames to stack, as FrameStack. No stacking if 0.
+        concat_frames (bool): Whether to concatenate the stacked frames along the channels, as RGBStack.
+        epsilon (float): Stability parameter of the normalization.
+        dtype (np.dtype): Data type of the observations, if they are rescaled or normalized.
+        num_buffers (int): Number of rotating output buffers.
+    """
+
+    def __init__(self, env: gymnasium.Env, height: Optional[int] = None, width: Optional[int] = None,
+                 rescale: bool = True, normalize: bool = True, num_stack: int = 4, concat_frames: bool = False,
+                 epsilon: float = 1e-8, dtype: np.dtype = np.float32, num_buffers: int = 2):
+        super(ObservationPipeline, self).__init__(env)
+        frame_shape = tuple(self.observation_space.shape)
+        self.resize_shape = None
+        if height is not None and width is not None and frame_shape[:2] != (height, width):
+            self.resize_shape = (height, width)
+            frame_shape = (height, width) + frame_shape[2:]
+            self._resized = np.empty(frame_shape, dtype=np.uint8)
+            # OpenCV drops a single channel axis
+            self._resize_dst = self._resized.reshape(self.resize_shape) if frame_shape[2:] == (1,) else self._resized
+        self.rescale = rescale
+        self.normalize = normalize
+        self.num_stack = num_stack
+        self.epsilon = epsilon
+        self.obs_rms = RunningMeanStd(shape=frame_shape)
+
+        # Scratch buffers of the float64 computations
+        self._frame = np.empty(frame_shape, dtype=np.float64)
+        self._delta = np.empty(frame_shape, dtype=np.float64)
+        self._scratch = np.empty(frame_shape, dtype=np.float64)
+
+        n_frames = max(num_stack, 1)
+        if num_stack and concat_frames:
+            obs_shape = frame_shape[:2] + (frame_shape[2] * num_stack,)
+        elif num_stack:
+            obs_shape = (num_stack,) + frame_shape
+        else:
+            obs_shape = frame_shape
+        out_dtype = dtype if rescale or normalize else np.uint8
+        self._buffers = [np.zeros(obs_shape, dtype=out_dtype) for _ in range(num_buffers)]
+        # Views of the output buffers indexed by the position of the frame in the stack
+        if num_stack and concat_frames:
+            self._stacks = [np.moveaxis(buffer.reshape(frame_shape[:2] + (num_stack, frame_shape[2])), 2, 0)
+                            for buffer in self._buffers]
+        else:
+            self._stacks = [buffer.reshape((n_frames,) + frame_shape) for buffer in self._buffers]
+        self._current = 0
+
+        if rescale or normalize:
+            self.observation_space = Box(low=-np.inf, high=np.inf, shape=obs_shape, dtype=out_dtype)
+        else:
+            self.observation_space = Box(low=0, high=255, shape=obs_shape, dtype=np.uint8)
+
+    def _update_statistics(self, frame: np.ndarray) -> None:
+        """Performs RunningMeanStd.update with a batch of a single frame in place."""
+        rms, delta, scratch = self.obs_rms, self._delta, self._scratch
+        np.subtract(frame, rms.mean, out=delta)
+        tot_count = rms.count + 1
+        np.divide(delta, tot_count, out=scratch)
+        rms.mean += scratch
+        rms.var *= rms.count
+        np.square(delta, out=scratch)
+        scratch *= rms.count
+        scratch /= tot_count
+        rms.var += scratch
+        rms.var /= tot_count
+        rms.count = tot_count
+
+    def _process(self, obs: np.ndarray) -> np.ndarray:
+        """Resizes, rescales and normalizes a frame. Returns either the uint8 or the float64 scratch frame."""
+        if self.resize_shape is not None:
+            # OpenCV expects the size as (width, height)
+            cv2.resize(obs, self.resize_shape[::-1], dst=self._resize_dst)
+            obs = self._resized
+        if not (self.rescale or self.normalize):
+            return obs
+        frame = self._frame
+        if self.rescale:
+            np.divide(obs, 255., out=frame)
+            frame *= 2
+            frame -= 1
+        else:
+            np.copyto(frame, obs)
+        if self.normalize:
+            self._update_statistics(frame)
+            frame -= self.obs_rms.mean
+            np.add(self.obs_rms.var, self.epsilon, out=self._scratch)
+            np.sqrt(self._scratch, out=self._scratch)
+            frame /= self._scratch
+        return frame
+
+    def _push(self, frame: np.ndarray, fill: bool) -> np.ndarray:
+        previous = self._stacks[self._current]
+        self._current = (self._current + 1) % len(self._buffers)
+        stack = self._stacks[self._current]
+        if fill:
+            stack[:] = frame
+        else:
+            stack[:-1] = previous[1:]
+            stack[-1] = frame
+        return self._buffers[self._current]
+
+    def reset(self, **kwargs) -> Tuple[np.ndarray, Dict[str, Any]]:
+        obs, info = self.env.reset(**kwargs)
+        return self._push(self._process(obs), fill=True), info
+
+    def step(self, action: int) -> Tuple[np.ndarray, float, bool, bool, Dict[str, Any]]:
+        obs, reward, done, truncated, info = self.env.step(action)
+        return self._push(self._process(obs), fill=False), reward, done, truncated, info
 
 
 class RGBStack(gymnasium.Wrapper):
@@ -54,8 +188,8 @@ class RGBStack(gymnasium.Wrapper):
             low=0, high=255, shape=(obs_shape[1], obs_shape[2], obs_shape[0] * obs_shape[3]), dtype=np.uint8
         )
 
-    def reset(self) -> Tuple[np.ndarray, Dict[str, Any]]:
-        state, info = self.env.reset()
+    def reset(self, **kwargs) -> Tuple[np.ndarray, Dict[str, Any]]:
+        state, info = self.env.reset(**kwargs)
         state = combine_frames(state)
         return state, info
 
@@ -73,8 +207,8 @@ class Augment(gymnasium.Wrapper):
         assert augmentation.upper() in Augmentation.__members__, f"Unknown augmentation: {augmentation}"
         self.augmentation = Augmentation[augmentation.upper()].value
 
-    def reset(self) -> Tuple[np.ndarray, Dict[str, Any]]:
-        obs, info = self.env.reset()
+    def reset(self, **kwargs) -> Tuple[np.ndarray, Dict[str, Any]]:
+        obs, info = self.env.reset(**kwargs)
         obs = self.augmentation(obs)
         return obs, info
 
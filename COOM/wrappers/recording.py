@@ -0,0 +1,145 @@
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import gymnasium
+import numpy as np
+
+from COOM.utils.config import Scenario, scenario_config
+
+
+class ActionRecorder(gymnasium.Wrapper):
+    """
+    Records episodes as action traces, a cheap alternative to RecordVideo.
+
+    Instead of rendering and encoding the frames during the training, only what is needed to re-simulate an episode is
+    stored: the scenario, the task, the frame skip, the action set, the seed the episode is started with and the
+    sequence of actions taken. Every recorded episode is written to a compressed .npz file of a few kilobytes once it
+    is finished. The episodes can be rendered offline with replay_action_trace.
+
+    To make the episodes reproducible, every reset seeds the game. Unless a seed is passed to reset, the episode
+    seeds are drawn from a generator seeded with the seed of the game, so the runs remain deterministic.
+
+    Args:
+        env (gymnasium.Env): The environment to record, which has to wrap a DoomEnv.
+        record_dir (str): Directory to store the action traces in.
+        episode_trigger (Callable): Function deciding whether an episode with the given id is recorded.
+            Defaults to recording every episode.
+        name_prefix (str): Prefix of the names of the trace files.
+    """
+
+    def __init__(self, env: gymnasium.Env, record_dir: str, episode_trigger: Callable[[int], bool] = None,
+                 name_prefix: str = 'episode'):
+        super().__init__(env)
+        self.record_dir = Path(record_dir)
+        self.record_dir.mkdir(parents=True, exist_ok=True)
+        self.episode_trigger = episode_trigger or (lambda episode_id: True)
+        self.name_prefix = name_prefix
+        doom_env = env.unwrapped
+        self.trace_metadata = {
+            'scenario': doom_env.scenario,
+            'task': doom_env.task,
+            'frame_skip': doom_env.frame_skip,
+            'available_actions': np.asarray(doom_env.available_actions),
+        }
+        self.seed_generator = np.random.default_rng(doom_env.game.get_seed())
+        self.episode_id = -1
+        self.episode_seed = None
+        self.recording = False
+        self.actions = []
+
+    def reset(self, *, seed: Optional[int] = None,
+              options: Optional[dict] = None) -> Tuple[np.ndarray, Dict[str, Any]]:
+        self._write_trace()
+        self.episode_id += 1
+        # ViZDoom seeds are unsigned 32-bit integers
+        self.episode_seed = int(seed) if seed is not None else int(self.seed_generator.integers(2 ** 31 - 1))
+        self.recording = self.episode_trigger(self.episode_id)
+        self.actions = []
+        return self.env.reset(seed=self.episode_seed, options=options)
+
+    def step(self, action: int) -> Tuple[np.ndarray, float, bool, bool, Dict[str, Any]]:
+        obs, reward, done, truncated, info = self.env.step(action)
+        if self.recording:
+            self.actions.append(int(action))
+            if done or truncated:
+                self._write_trace()
+        return obs, reward, done, truncated, info
+
+    def _write_trace(self) -> None:
+        """Stores the trace of the current episode, if it is recorded and has not been stored yet."""
+        if not self.recording or not self.actions:
+            return
+        path = self.record_dir / f'{self.name_prefix}-episode-{self.episode_id}.npz'
+        np.savez_compressed(path, seed=self.episode_seed, episode_id=self.episode_id,
+                            actions=np.asarray(self.actions, dtype=np.uint16), **self.trace_metadata)
+        self.recording = False
+        self.actions = []
+
+    def close(self):
+        self._write_trace()
+        super().close()
+
+
+def load_action_trace(path: str) -> Dict[str, Any]:
+    """
+    Loads an action trace stored by ActionRecorder.
+
+    Args:
+        path (str): Path of the trace file.
+
+    Returns:
+        Dict[str, Any]: The scenario, task, frame skip, action set, seed, episode id and actions of the episode.
+    """
+    with np.load(path) as data:
+        trace = {key: data[key] for key in data.files}
+    for key in ['scenario', 'task']:
+        trace[key] = str(trace[key])
+    for key in ['frame_skip', 'seed', 'episode_id']:
+        trace[key] = int(trace[key])
+    return trace
+
+
+def replay_action_trace(trace: Dict[str, Any], resolution: str = '800X600',
+                        smooth: bool = False) -> Iterator[np.ndarray]:
+    """
+    Re-simulates a recorded episode and yields its frames.
+
+    Args:
+        trace (Dict[str, Any]): The action trace, as returned by load_action_trace.
+        resolution (str): Screen resolution to render the frames in. The resolution does not affect the dynamics.
+        smooth (bool): Whether to yield a frame for every tic instead of one per action. Every action is then held
+            for the skipped frames by advancing the game one tic at a time.
+
+    Returns:
+        Iterator[np.ndarray]: The frames of the episode in the channel-last RGB layout.
+    """
+    available_actions = trace['available_actions'].tolist()
+    doom_kwargs = {
+        'env': trace['task'],
+        'action_space_fn': lambda: available_actions,
+        'frame_skip': trace['frame_skip'],
+        'seed': trace['seed'],
+        'render': False,
+        'resolution': resolution,
+    }
+    env = scenario_config[Scenario[trace['scenario'].upper()]]['class'](doom_kwargs)
+    try:
+        frame, _ = env.reset(seed=trace['seed'])
+        yield frame
+        for action in trace['actions']:
+            if smooth:
+                env.game.set_action(available_actions[action])
+                for _ in range(trace['frame_skip']):
+                    env.game.advance_action(1)
+                    if env.game.is_episode_finished():
+                        return
+                    yield env.render()[0]
+                if env.game.is_player_dead():
+                    return
+            else:
+                frame, _, done, truncated, _ = env.step(action)
+                if done or truncated:
+                    return
+                yield frame
+    finally:
+        env.close()
@@ -1,4 +1,4 @@
-from typing import Callable
+from typing import Callable, List, Optional
 
 import numpy as np
 from gymnasium import RewardWrapper
@@ -15,7 +15,66 @@ class WrapperHolder:
         self.kwargs = kwargs
 
 
-class ConstantRewardWrapper(RewardWrapper):
+def latest_game_variables(game_variable_buffer):
+    """Returns the game variables of the current and the previous step, or None for those not stored yet."""
+    size = len(game_variable_buffer)
+    vars_cur = game_variable_buffer[-1] if size > 0 else None
+    vars_prev = game_variable_buffer[-2] if size > 1 else None
+    return vars_cur, vars_prev
+
+
+class VariableRewardWrapper(RewardWrapper):
+    """
+    Base class of the reward wrappers, which shape the reward based on the game variables of the current and the
+    previous step. The shaping itself is implemented by shape, so that a chain of these wrappers can also be evaluated
+    by a single CompiledRewardWrapper.
+    """
+
+    def __init__(self, env):
+        super(VariableRewardWrapper, self).__init__(env)
+        self.doom_env = env.unwrapped
+
+    def reward(self, reward):
+        vars_cur, vars_prev = latest_game_variables(self.doom_env.game_variable_buffer)
+        return self.shape(reward, vars_cur, vars_prev)
+
+    def shape(self, reward: float, vars_cur: Optional[np.ndarray], vars_prev: Optional[np.ndarray]) -> float:
+        """
+        Shapes the reward of the current step.
+
+        Args:
+            reward (float): The reward returned by the environment or the previous wrapper of the chain.
+            vars_cur (Optional[np.ndarray]): The game variables of the current step, if any have been stored.
+            vars_prev (Optional[np.ndarray]): The game variables of the previous step, if any have been stored.
+
+        Returns:
+            float: The shaped reward.
+        """
+        raise NotImplementedError
+
+
+class CompiledRewardWrapper(RewardWrapper):
+    """
+    Evaluates a chain of reward wrappers within a single wrapper layer. The game variables are fetched from the
+    environment once per step and passed to the shaping of every wrapper of the chain in the order the wrappers would
+    have been applied, so the rewards are identical to those of the stacked wrappers.
+    """
+
+    def __init__(self, env, wrappers: List[WrapperHolder]):
+        super(CompiledRewardWrapper, self).__init__(env)
+        self.doom_env = env.unwrapped
+        self.terms = [holder.wrapper_class(env, **holder.kwargs) for holder in wrappers]
+        for term in self.terms:
+            assert isinstance(term, VariableRewardWrapper), f"{type(term).__name__} can not be compiled"
+
+    def reward(self, reward):
+        vars_cur, vars_prev = latest_game_variables(self.doom_env.game_variable_buffer)
+        for term in self.terms:
+            reward = term.shape(reward, vars_cur, vars_prev)
+        return reward
+
+
+class ConstantRewardWrapper(VariableRewardWrapper):
     """
     Reward the agent with a constant reward.
     """
@@ -24,11 +83,11 @@ class ConstantRewardWrapper(RewardWrapper):
         super(ConstantRewardWrapper, self).__init__(env)
         self.rew = reward
 
-    def reward(self, reward):
+    def shape(self, reward, vars_cur, vars_prev):
         return reward + self.rew
 
 
-class BooleanVariableRewardWrapper(RewardWrapper):
+class BooleanVariableRewardWrapper(VariableRewardWrapper):
     """
     Reward the agent if a game variable is true.
     """
@@ -38,14 +97,14 @@ class BooleanVariableRewardWrapper(RewardWrapper):
         self.rew = reward
         self.game_var = game_var
 
-    def reward(self, reward):
-        game_variable = self.env.game.get_game_variable(self.game_var)
+    def shape(self, reward, vars_cur, vars_prev):
+        game_variable = self.doom_env.game.get_game_variable(self.game_var)
         if game_variable:
             reward += self.rew
         return reward
 
 
-class GameVariableRewardWrapper(RewardWrapper):
+class GameVariableRewardWrapper(VariableRewardWrapper):
     """
     Reward the agent for a change in a game variable. The agent is considered to have changed a game variable if its
     value differs from the previous frame value.
@@ -57,11 +116,9 @@ class GameVariableRewardWrapper(RewardWrapper):
         self.var_index = var_index
         self.decrease = decrease
 
-    def reward(self, reward):
-        if len(self.game_variable_buffer) < 2:
+    def shape(self, reward, vars_cur, vars_prev):
+        if vars_prev is None:
             return reward
-        vars_cur = self.game_variable_buffer[-1]
-        vars_prev = self.game_variable_buffer[-2]
 
         var_cur = vars_cur[self.var_index]
         var_prev = vars_prev[self.var_index]
@@ -71,7 +128,7 @@ class GameVariableRewardWrapper(RewardWrapper):
         return reward
 
 
-class CumulativeVariableRewardWrapper(RewardWrapper):
+class CumulativeVariableRewardWrapper(VariableRewardWrapper):
     """
     Cumulatively reward the agent for a change in a game variable. The agent is considered to have changed a game
     variable if its value is higher than it was in the previous frame.
@@ -85,11 +142,9 @@ class CumulativeVariableRewardWrapper(RewardWrapper):
         self.maintain = maintain
         self.cum_rew = 0
 
-    def reward(self, reward):
-        if len(self.game_variable_buffer) < 2:
+    def shape(self, reward, vars_cur, vars_prev):
+        if vars_prev is None:
             return reward
-        vars_cur = self.game_variable_buffer[-1]
-        vars_prev = self.game_variable_buffer[-2]
 
         var_cur = vars_cur[self.var_index]
         var_prev = vars_prev[self.var_index]
@@ -102,7 +157,7 @@ class CumulativeVariableRewardWrapper(RewardWrapper):
         return reward
 
 
-class ProportionalVariableRewardWrapper(RewardWrapper):
+class ProportionalVariableRewardWrapper(VariableRewardWrapper):
     """
     Proportionally reward the agent for a change in a game variable. The agent is considered to have changed a game
     variable if its value is higher than it was in the previous frame.
@@ -115,13 +170,13 @@ class ProportionalVariableRewardWrapper(RewardWrapper):
         self.keep_lb = keep_lb
         self.lower_bound = -np.inf
 
-    def reward(self, reward):
-        if len(self.game_variable_buffer) < 2:
+    def shape(self, reward, vars_cur, vars_prev):
+        if vars_prev is None:
             self.lower_bound = -np.inf
             return reward
 
-        var_cur = self.game_variable_buffer[-1][self.var_index]
-        var_prev = self.game_variable_buffer[-2][self.var_index]
+        var_cur = vars_cur[self.var_index]
+        var_prev = vars_prev[self.var_index]
 
         if not self.keep_lb or self.keep_lb and var_cur > self.lower_bound:
             reward = self.scaler * (var_cur - var_prev)
@@ -129,7 +184,7 @@ class ProportionalVariableRewardWrapper(RewardWrapper):
         return reward
 
 
-class UserVariableRewardWrapper(RewardWrapper):
+class UserVariableRewardWrapper(VariableRewardWrapper):
     """
     Reward the agent for a change in a user variable. The agent is considered to have changed a user variable if its
     value is higher than it was in the previous frame.
@@ -143,16 +198,16 @@ class UserVariableRewardWrapper(RewardWrapper):
         self.decrease = decrease
         self.update_callback = update_callback
 
-    def reward(self, reward):
-        var_cur = self.game.get_game_variable(self.game_var)
-        var_prev = self.get_and_update_user_var(self.game_var)
+    def shape(self, reward, vars_cur, vars_prev):
+        var_cur = self.doom_env.game.get_game_variable(self.game_var)
+        var_prev = self.doom_env.get_and_update_user_var(self.game_var)
 
         if not self.decrease and var_cur > var_prev or self.decrease and var_cur < var_prev:
             reward += self.rew
         return reward
 
 
-class MovementRewardWrapper(RewardWrapper):
+class MovementRewardWrapper(VariableRewardWrapper):
     """
     Reward the agent for moving. Movement is measured as the distance between the agent's current location and its
     location in the previous frame.
@@ -162,15 +217,16 @@ class MovementRewardWrapper(RewardWrapper):
         super(MovementRewardWrapper, self).__init__(env)
         self.scaler = scaler
 
-    def reward(self, reward):
-        if len(self.distance_buffer) < 2:
+    def shape(self, reward, vars_cur, vars_prev):
+        distance_buffer = self.doom_env.distance_buffer
+        if len(distance_buffer) < 2:
             return reward
-        distance = self.distance_buffer[-1]
+        distance = distance_buffer.last
         reward += distance * self.scaler  # Increase the reward for movement linearly
         return reward
 
 
-class LocationVariableRewardWrapper(RewardWrapper):
+class LocationVariableRewardWrapper(VariableRewardWrapper):
     """
     Reward the agent for traversing a certain distance. The agent is considered to have traversed a distance if its
     location is further away from the starting location than it was in the previous frame.
@@ -183,13 +239,10 @@ class LocationVariableRewardWrapper(RewardWrapper):
         self.x_start = x_start
         self.y_start = y_start
 
-    def reward(self, reward):
-        if len(self.game_variable_buffer) < 2:
+    def shape(self, reward, vars_cur, vars_prev):
+        if vars_prev is None:
             return reward
 
-        vars_cur = self.game_variable_buffer[-1]
-        vars_prev = self.game_variable_buffer[-2]
-
         x_cur = vars_cur[self.x_index]
         y_cur = vars_cur[self.y_index]
         x_prev = vars_prev[self.x_index]
@@ -197,10 +250,10 @@ class LocationVariableRewardWrapper(RewardWrapper):
 
         x_diff = max(0, abs(x_cur - self.x_start) - abs(x_prev - self.x_start))
         y_diff = max(0, abs(y_cur - self.y_start) - abs(y_prev - self.y_start))
-        return self.reward_scaler_traversal * (x_diff + y_diff)
+        return self.doom_env.reward_scaler_traversal * (x_diff + y_diff)
 
 
-class PlatformReachedRewardWrapper(RewardWrapper):
+class PlatformReachedRewardWrapper(VariableRewardWrapper):
     """
     Reward the agent for reaching a platform. The agent is considered to be on a platform if its height is higher than
     the highest height it was on in the last n frames.
@@ -211,21 +264,20 @@ class PlatformReachedRewardWrapper(RewardWrapper):
         self.z_var_index = z_var_index
         self.rew = reward
 
-    def reward(self, reward):
-        if len(self.game_variable_buffer) < 2:
+    def shape(self, reward, vars_cur, vars_prev):
+        if vars_prev is None:
             return reward
-        vars_cur = self.game_variable_buffer[-1]
 
         height_cur = vars_cur[self.z_var_index]
-        heights_prev = [game_vars[self.z_var_index] for game_vars in self.game_variable_buffer]
+        heights_prev = self.doom_env.game_variable_buffer.column(self.z_var_index)[:-1]
 
         # Check whether the agent was on lava in the last n frames and is now on a platform
-        if height_cur > max(heights_prev[:-1]):
+        if height_cur > heights_prev.max():
             reward += self.rew
         return reward
 
 
-class GoalRewardWrapper(RewardWrapper):
+class GoalRewardWrapper(VariableRewardWrapper):
     """
     Reward the agent for reaching a goal. The agent is considered to have reached the goal if the value of a game
     variable is higher than a given threshold.
@@ -237,8 +289,9 @@ class GoalRewardWrapper(RewardWrapper):
         self.goal = goal
         self.var_index = var_index
 
-    def reward(self, reward):
-        vars_cur = self.game_variable_buffer[-1]
+    def shape(self, reward, vars_cur, vars_prev):
+        if vars_cur is None:
+            return reward
         var_cur = vars_cur[self.var_index]
 
         if var_cur > self.goal:
@@ -1,7 +1,7 @@
 import argparse
 import json
 import os
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 import numpy as np
 from matplotlib import pyplot as plt
@@ -367,6 +367,31 @@ def get_data_per_env(envs: List[str], iterations: int, method: str, metric: str,
     return seed_data
 
 
+def load_progress(log_dir: str) -> Dict[str, np.ndarray]:
+    """Memory-maps the columns of a run logged with the npy output of the CL module, trimmed to the complete rows."""
+    progress_dir = os.path.join(log_dir, 'progress')
+    with open(os.path.join(progress_dir, 'schema.json'), 'r') as f:
+        schema = json.load(f)
+    columns = {key: np.load(os.path.join(progress_dir, file_name), mmap_mode='r')
+               for key, file_name in schema['columns'].items()}
+    # The columns of a row are appended one after another, so those of an interrupted run can differ in length
+    num_rows = min((len(column) for column in columns.values()), default=0)
+    return {key: column[:num_rows] for key, column in columns.items()}
+
+
+def get_data_from_logs(log_dirs: List[str], key: str, iterations: int) -> np.ndarray:
+    data = np.empty((len(log_dirs), iterations))
+    data[:] = np.nan
+    for k, log_dir in enumerate(log_dirs):
+        column = load_progress(log_dir).get(key)
+        if column is None:
+            print(f'Metric {key} was not logged in {log_dir}')
+            continue
+        num_rows = min(len(column), iterations)
+        data[k, :num_rows] = column[:num_rows]
+    return data
+
+
 def calculate_performance(data: np.ndarray):
     data = data.mean(axis=3)
     data = np.triu(data)